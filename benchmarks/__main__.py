@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.load import compare, format_report, load_report, run_load
+
+
+def seed_database(args: argparse.Namespace) -> None:
+    from benchmarks.seed import seed
+
+    counts = seed(
+        users=args.users,
+        posts=args.posts,
+        comments=args.comments,
+        likes=args.likes,
+        skew=args.skew,
+        seed=args.seed,
+    )
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
+
+
+def run_benchmark(args: argparse.Namespace) -> None:
+    report = asyncio.run(
+        run_load(
+            users=args.users,
+            posts=args.posts,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            url=args.url,
+            serve_port=args.serve_port,
+            seed=args.seed,
+        )
+    )
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def serialization(args: argparse.Namespace) -> None:
+    from benchmarks.serialization import run_serialization
+
+    rows_per_second = asyncio.run(run_serialization(args.rows, args.repeat))
+    for path, rate in rows_per_second.items():
+        print(f"{path:<16} {rate:>12,} rows/s")
+
+
+def compare_runs(args: argparse.Namespace) -> None:
+    regressions = compare(
+        load_report(args.baseline), load_report(args.current), args.threshold
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(required=True)
+
+    seed_parser = subparsers.add_parser(
+        "seed", help="Fill an empty database with benchmark data"
+    )
+    seed_parser.add_argument("--users", type=int, default=1_000)
+    seed_parser.add_argument("--posts", type=int, default=10_000)
+    seed_parser.add_argument("--comments", type=int, default=50_000)
+    seed_parser.add_argument("--likes", type=int, default=100_000)
+    seed_parser.add_argument(
+        "--skew", type=float, default=1.1, help="Zipf exponent of likes per post"
+    )
+    seed_parser.add_argument("--seed", type=int, default=0)
+    seed_parser.set_defaults(handler=seed_database)
+
+    run_parser = subparsers.add_parser("run", help="Drive the API with virtual users")
+    run_parser.add_argument("--users", type=int, default=1_000)
+    run_parser.add_argument("--posts", type=int, default=10_000)
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--duration", type=float, default=30)
+    target = run_parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Benchmark an already running server")
+    target.add_argument(
+        "--serve-port", type=int, help="Start uvicorn on this port and benchmark it"
+    )
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="Write the JSON report to this file")
+    run_parser.set_defaults(handler=run_benchmark)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Fail if a run regressed against a baseline"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Allowed relative change in p95 latency, throughput and error rate",
+    )
+    compare_parser.set_defaults(handler=compare_runs)
+
+    serialization_parser = subparsers.add_parser(
+        "serialization", help="Compare feed serialization paths in rows/sec"
+    )
+    serialization_parser.add_argument("--rows", type=int, default=10_000)
+    serialization_parser.add_argument("--repeat", type=int, default=5)
+    serialization_parser.set_defaults(handler=serialization)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import asyncio
+import contextlib
+import json
+import random
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, bench_email
+
+# Endpoint label -> relative weight in the request mix.
+DEFAULT_MIX = {
+    "GET /post?sorting=new": 30,
+    "GET /post?sorting=old": 10,
+    "GET /post?sorting=most_likes": 20,
+    "GET /post/{id}": 30,
+    "POST /like": 8,
+    "POST /token": 2,
+}
+
+# A 409 from /like means the virtual user already liked that post, which is
+# an expected outcome under load rather than an error.
+OK_STATUSES = {200, 201, 304, 409}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "duration_s": round(elapsed, 3),
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        rng: random.Random,
+        user_id: int,
+        posts: int,
+    ) -> None:
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.user_id = user_id
+        self.posts = posts
+        self.token: str | None = None
+
+    async def timed(
+        self, endpoint: str, request: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response | None:
+        started_at = time.perf_counter()
+        try:
+            response = await request()
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - started_at, False)
+            return None
+        self.recorder.record(
+            endpoint,
+            time.perf_counter() - started_at,
+            response.status_code in OK_STATUSES,
+        )
+        return response
+
+    async def login(self) -> None:
+        response = await self.timed(
+            "POST /token",
+            lambda: self.client.post(
+                "/token",
+                data={
+                    "username": bench_email(self.user_id),
+                    "password": BENCH_PASSWORD,
+                },
+            ),
+        )
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+    async def step(self, endpoint: str) -> None:
+        if endpoint == "POST /token" or self.token is None:
+            await self.login()
+        elif endpoint.startswith("GET /post?"):
+            sorting = endpoint.rsplit("=", 1)[1]
+            await self.timed(
+                endpoint, lambda: self.client.get("/post", params={"sorting": sorting})
+            )
+        elif endpoint == "GET /post/{id}":
+            post_id = self.rng.randint(1, self.posts)
+            await self.timed(endpoint, lambda: self.client.get(f"/post/{post_id}"))
+        elif endpoint == "POST /like":
+            post_id = self.rng.randint(1, self.posts)
+            await self.timed(
+                endpoint,
+                lambda: self.client.post(
+                    "/like",
+                    json={"post_id": post_id},
+                    headers={"Authorization": f"Bearer {self.token}"},
+                ),
+            )
+
+    async def run(self, deadline: float, mix: dict[str, int]) -> None:
+        endpoints, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await self.step(self.rng.choices(endpoints, weights=weights)[0])
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_server(port: int):
+    import uvicorn
+
+    from socialmediaapi.main import app
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+@contextlib.asynccontextmanager
+async def open_client(url: str | None):
+    # Without a URL the app is driven in-process through ASGITransport, with
+    # its lifespan run around the benchmark so the pools are connected.
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+            yield client
+        return
+
+    from socialmediaapi.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=30
+        ) as client:
+            yield client
+
+
+async def run_load(
+    users: int,
+    posts: int,
+    concurrency: int,
+    duration: float,
+    url: str | None = None,
+    serve_port: int | None = None,
+    mix: dict[str, int] | None = None,
+    seed: int = 0,
+) -> dict:
+    mix = mix or DEFAULT_MIX
+    recorder = Recorder()
+    async with contextlib.AsyncExitStack() as stack:
+        if serve_port:
+            url = await stack.enter_async_context(uvicorn_server(serve_port))
+        client = await stack.enter_async_context(open_client(url))
+        virtual_users = [
+            VirtualUser(
+                client,
+                recorder,
+                random.Random(seed + index),
+                user_id=index % users + 1,
+                posts=posts,
+            )
+            for index in range(concurrency)
+        ]
+        started_at = time.perf_counter()
+        deadline = started_at + duration
+        await asyncio.gather(*(user.run(deadline, mix) for user in virtual_users))
+        elapsed = time.perf_counter() - started_at
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "users": users,
+        "posts": posts,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "target": url or "asgi",
+        "mix": mix,
+    }
+    return report
+
+
+def error_rate(row: dict) -> float:
+    return row["errors"] / row["requests"] if row["requests"] else 0.0
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    # A regression is a p95 or error rate that grew, or a throughput that
+    # shrank, by more than threshold (a fraction) on any endpoint. Errors on an
+    # endpoint that had none are always a regression, as is an endpoint the
+    # current run never reached.
+    regressions = []
+    for endpoint, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(endpoint)
+        if after is None:
+            regressions.append(f"{endpoint}: missing from the current run")
+            continue
+        if before["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{endpoint}: p95 {before['p95_ms']}ms -> {after['p95_ms']}ms"
+            )
+        if before["rps"] and after["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{endpoint}: rps {before['rps']} -> {after['rps']}")
+        errors_before, errors_after = error_rate(before), error_rate(after)
+        if errors_after > errors_before * (1 + threshold):
+            regressions.append(
+                f"{endpoint}: error rate {errors_before:.2%} -> {errors_after:.2%}"
+            )
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        (
+            f"{'endpoint':<32} {'requests':>9} {'errors':>7} {'rps':>9} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+    ]
+    for endpoint, row in report["endpoints"].items():
+        lines.append(
+            f"{endpoint:<32} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9} "
+            f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}"
+        )
+    lines.append(
+        f"{report['requests']} requests in {report['duration_s']}s, "
+        f"{report['rps']} req/s"
+    )
+    return "\n".join(lines)
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,138 @@
+import itertools
+import random
+from collections import Counter
+
+import sqlalchemy
+
+from socialmediaapi.database import (
+    comments_table,
+    get_engine,
+    likes_table,
+    post_table,
+    users_table,
+)
+from socialmediaapi.migrations import migrate
+from socialmediaapi.security import get_password_hash
+
+BENCH_PASSWORD = "benchmark-password"
+INSERT_CHUNK_SIZE = 5_000
+
+
+def bench_email(user_id: int) -> str:
+    return f"bench{user_id}@example.com"
+
+
+class SkewedPicker:
+    # Zipf-distributed choice over a shuffled id range, so that a handful of
+    # posts collect most of the likes and comments, as on real feeds.
+    def __init__(self, rng: random.Random, count: int, skew: float) -> None:
+        self.rng = rng
+        self.ids = list(range(1, count + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = list(
+            itertools.accumulate(1 / rank**skew for rank in range(1, count + 1))
+        )
+
+    def __call__(self) -> int:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+
+def skewed_likes(
+    rng: random.Random, pick_post: SkewedPicker, users: int, likes: int
+) -> set[tuple[int, int]]:
+    likes = min(likes, users * len(pick_post.ids))
+    pairs: set[tuple[int, int]] = set()
+    attempts = 0
+    while len(pairs) < likes and attempts < likes * 20:
+        attempts += 1
+        pairs.add((pick_post(), rng.randint(1, users)))
+    return pairs
+
+
+def insert_chunked(conn, table: sqlalchemy.Table, rows) -> None:
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, INSERT_CHUNK_SIZE)):
+        conn.execute(table.insert(), chunk)
+
+
+def seed(
+    users: int,
+    posts: int,
+    comments: int,
+    likes: int,
+    skew: float = 1.1,
+    seed: int = 0,
+) -> dict:
+    # Ids are assigned explicitly so that the load test can address rows
+    # without reading them back. The database is expected to be empty.
+    rng = random.Random(seed)
+    engine = get_engine()
+    migrate(engine)
+    password = get_password_hash(BENCH_PASSWORD)
+    pick_post = SkewedPicker(rng, posts, skew)
+    like_pairs = skewed_likes(rng, pick_post, users, likes)
+    like_counts = Counter(post_id for post_id, _ in like_pairs)
+
+    with engine.begin() as conn:
+        insert_chunked(
+            conn,
+            users_table,
+            (
+                {
+                    "id": user_id,
+                    "email": bench_email(user_id),
+                    "password": password,
+                    "confirmed": True,
+                }
+                for user_id in range(1, users + 1)
+            ),
+        )
+        insert_chunked(
+            conn,
+            post_table,
+            (
+                {
+                    "id": post_id,
+                    "body": f"Benchmark post {post_id}",
+                    "user_id": rng.randint(1, users),
+                    "like_count": like_counts[post_id],
+                }
+                for post_id in range(1, posts + 1)
+            ),
+        )
+        insert_chunked(
+            conn,
+            comments_table,
+            (
+                {
+                    "id": comment_id,
+                    "body": f"Benchmark comment {comment_id}",
+                    "post_id": pick_post(),
+                    "user_id": rng.randint(1, users),
+                }
+                for comment_id in range(1, comments + 1)
+            ),
+        )
+        insert_chunked(
+            conn,
+            likes_table,
+            (
+                {"post_id": post_id, "user_id": user_id}
+                for post_id, user_id in sorted(like_pairs)
+            ),
+        )
+        if engine.dialect.name == "postgresql":
+            for table in (users_table, post_table, comments_table):
+                conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"(SELECT MAX(id) FROM {table.name}))"
+                    )
+                )
+
+    return {
+        "users": users,
+        "posts": posts,
+        "comments": comments,
+        "likes": len(like_pairs),
+    }
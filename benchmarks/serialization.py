@@ -0,0 +1,56 @@
+import json
+import time
+
+import databases
+from pydantic import TypeAdapter
+
+from socialmediaapi.models.post import UserPostWithLikes
+from socialmediaapi.routers.post import FEED_FIELDS, encode_rows
+
+# Generates feed-shaped rows without touching the application database.
+FEED_ROWS_QUERY = """
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {rows})
+SELECT i AS id, 'Benchmark post ' || i AS body, i / 10 AS user_id, i / 3 AS likes
+FROM n
+"""
+
+
+async def fetch_feed_rows(rows: int) -> list:
+    database = databases.Database("sqlite:///:memory:")
+    await database.connect()
+    try:
+        return await database.fetch_all(FEED_ROWS_QUERY.format(rows=rows))
+    finally:
+        await database.disconnect()
+
+
+def response_model_path(rows: list) -> bytes:
+    # What FastAPI does for a response_model: validate every record from
+    # attributes, dump it to JSON-compatible data, then encode with json.
+    adapter = TypeAdapter(list[UserPostWithLikes])
+    data = adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def best_of(func, rows: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(rows)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+async def run_serialization(rows: int, repeat: int) -> dict:
+    records = await fetch_feed_rows(rows)
+    assert json.loads(response_model_path(records)) == json.loads(
+        encode_rows(records, FEED_FIELDS)
+    )
+    paths = {
+        "response_model": response_model_path,
+        "encode_rows": lambda records: encode_rows(records, FEED_FIELDS),
+    }
+    return {
+        name: round(rows / best_of(func, records, repeat))
+        for name, func in paths.items()
+    }
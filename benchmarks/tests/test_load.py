@@ -0,0 +1,52 @@
+from benchmarks.load import compare, percentile
+
+
+def run(**endpoints) -> dict:
+    return {"endpoints": endpoints}
+
+
+def row(p95_ms: float = 10, rps: float = 100, requests: int = 1000, errors: int = 0):
+    return {"p95_ms": p95_ms, "rps": rps, "requests": requests, "errors": errors}
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.50) == 51
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 1) == 100
+    assert percentile([], 0.95) == 0
+
+
+def test_compare_within_threshold():
+    baseline = run(feed=row())
+    current = run(feed=row(p95_ms=10.9, rps=91))
+
+    assert compare(baseline, current, 0.1) == []
+
+
+def test_compare_latency_and_throughput_regressions():
+    baseline = run(feed=row())
+    current = run(feed=row(p95_ms=12, rps=80))
+
+    assert compare(baseline, current, 0.1) == [
+        "feed: p95 10ms -> 12ms",
+        "feed: rps 100 -> 80",
+    ]
+
+
+def test_compare_error_rate_regression():
+    baseline = run(feed=row(errors=100), like=row())
+    current = run(feed=row(errors=120), like=row(errors=1))
+
+    assert compare(baseline, current, 0.1) == [
+        "feed: error rate 10.00% -> 12.00%",
+        "like: error rate 0.00% -> 0.10%",
+    ]
+
+
+def test_compare_missing_endpoint():
+    baseline = run(feed=row(), like=row())
+    current = run(feed=row())
+
+    assert compare(baseline, current, 0.1) == ["like: missing from the current run"]
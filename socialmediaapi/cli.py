@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import signal
+
+from socialmediaapi.database import database, get_engine
+from socialmediaapi.export import EXPORT_BATCH_SIZE, export_ndjson
+from socialmediaapi.logging_conf import configure_logging
+from socialmediaapi.mailer import mail_dispatcher
+from socialmediaapi.maintenance import RECONCILE_BATCH_SIZE, reconcile_like_counts
+from socialmediaapi.migrations import migrate
+from socialmediaapi.scores import score_scheduler
+from socialmediaapi.search import rebuild_search_index
+from socialmediaapi.timeline import timeline_fanout
+
+
+async def run_migrations(args: argparse.Namespace) -> None:
+    applied = migrate(get_engine())
+    if applied:
+        print(f"Applied migrations {', '.join(map(str, applied))}")
+    else:
+        print("Database schema is up to date")
+
+
+async def rebuild_search(args: argparse.Namespace) -> None:
+    rebuild_search_index(get_engine())
+    print("Rebuilt search indexes")
+
+
+async def reconcile_likes(args: argparse.Namespace) -> None:
+    await database.connect()
+    try:
+        repaired = await reconcile_like_counts(batch_size=args.batch_size)
+    finally:
+        await database.disconnect()
+    print(f"Repaired like_count on {repaired} posts")
+
+
+async def mail_worker(args: argparse.Namespace) -> None:
+    await database.connect()
+    try:
+        if args.once:
+            sent = 0
+            while claimed := await mail_dispatcher.dispatch_pending():
+                sent += claimed
+            await mail_dispatcher.close()
+            print(f"Dispatched {sent} emails")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await mail_dispatcher.run(stop)
+    finally:
+        await database.disconnect()
+
+
+async def score_worker(args: argparse.Namespace) -> None:
+    await database.connect()
+    try:
+        if args.once:
+            rescored = await score_scheduler.update_scores()
+            print(f"Rescored {rescored} posts")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await score_scheduler.run(stop)
+    finally:
+        await database.disconnect()
+
+
+async def fanout_worker(args: argparse.Namespace) -> None:
+    await database.connect()
+    try:
+        if args.once:
+            posts = 0
+            while fanned_out := await timeline_fanout.fan_out_pending():
+                posts += fanned_out
+            print(f"Fanned out {posts} posts")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await timeline_fanout.run(stop)
+    finally:
+        await database.disconnect()
+
+
+async def export(args: argparse.Namespace) -> None:
+    since = {
+        "post": args.since_post_id,
+        "comment": args.since_comment_id,
+        "like": args.since_like_id,
+    }
+    # Written to a file rather than stdout, which the console log handler uses.
+    # File calls run on a thread so that they do not stall the event loop.
+    await database.connect()
+    try:
+        output = await asyncio.to_thread(open, args.output, "wb")
+        try:
+            async for chunk in export_ndjson(since, batch_size=args.batch_size):
+                await asyncio.to_thread(output.write, chunk)
+        finally:
+            await asyncio.to_thread(output.close)
+    finally:
+        await database.disconnect()
+    print(f"Exported to {args.output}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m socialmediaapi.cli")
+    subparsers = parser.add_subparsers(required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="Apply pending schema migrations"
+    )
+    migrate_parser.set_defaults(handler=run_migrations)
+
+    reconcile_parser = subparsers.add_parser(
+        "reconcile-likes",
+        help="Recompute posts.like_count from the likes table",
+    )
+    reconcile_parser.add_argument(
+        "--batch-size", type=int, default=RECONCILE_BATCH_SIZE
+    )
+    reconcile_parser.set_defaults(handler=reconcile_likes)
+
+    search_parser = subparsers.add_parser(
+        "rebuild-search", help="Rebuild the full-text search indexes"
+    )
+    search_parser.set_defaults(handler=rebuild_search)
+
+    mail_parser = subparsers.add_parser(
+        "mail-worker", help="Send queued emails from the outbox"
+    )
+    mail_parser.add_argument(
+        "--once", action="store_true", help="Drain the due emails and exit"
+    )
+    mail_parser.set_defaults(handler=mail_worker)
+
+    score_parser = subparsers.add_parser(
+        "score-worker", help="Keep hot and top_24h post scores up to date"
+    )
+    score_parser.add_argument(
+        "--once", action="store_true", help="Rescore recently liked posts and exit"
+    )
+    score_parser.set_defaults(handler=score_worker)
+
+    fanout_parser = subparsers.add_parser(
+        "fanout-worker", help="Copy new posts into their followers' timelines"
+    )
+    fanout_parser.add_argument(
+        "--once", action="store_true", help="Fan out the pending posts and exit"
+    )
+    fanout_parser.set_defaults(handler=fanout_worker)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Stream posts, comments and likes as NDJSON"
+    )
+    export_parser.add_argument("output", help="NDJSON file to write")
+    export_parser.add_argument("--since-post-id", type=int, default=0)
+    export_parser.add_argument("--since-comment-id", type=int, default=0)
+    export_parser.add_argument("--since-like-id", type=int, default=0)
+    export_parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    export_parser.set_defaults(handler=export)
+
+    args = parser.parse_args(argv)
+    configure_logging()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,12 +13,64 @@ class BaseConfig(BaseSettings):
 class GlobalConfig(BaseConfig):
     DATABASE_URL: Optional[str] = None
     DB_FORCE_ROLL_BACK: bool = False
+    READ_DATABASE_URLS: Optional[str] = None
+    READ_REPLICA_TIMEOUT_SECONDS: float = 5
+    READ_REPLICA_RETRY_SECONDS: float = 30
+    READ_REPLICA_CACHE_TTL_SECONDS: float = 2
+    DB_AUTO_MIGRATE: bool = True
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 10
+    DB_STATEMENT_TIMEOUT_SECONDS: float = 30
+    DB_CONNECTION_MAX_LIFETIME_SECONDS: float = 300
+    DB_SQLITE_BUSY_TIMEOUT_SECONDS: float = 5
+    QUERY_PROFILER_ENABLED: bool = False
+    QUERY_PROFILER_MAX_QUERIES: int = 10
+    QUERY_PROFILER_REPEAT_THRESHOLD: int = 3
+    SLOW_QUERY_SECONDS: float = 0.5
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_REDIS_URL: Optional[str] = None
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 300
+    RESPONSE_CACHE_LIKE_STALENESS_SECONDS: float = 5
+    SCORE_SCHEDULER_IN_PROCESS: bool = True
+    SCORE_INTERVAL_SECONDS: float = 60
+    SCORE_BATCH_SIZE: int = 1_000
+    SEARCH_MAX_RESULTS: int = 1_000
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 10_000
+    TIMELINE_FANOUT_BATCH_SIZE: int = 1_000
+    TIMELINE_BACKFILL_POSTS: int = 50
+    TIMELINE_MAX_POSTS: int = 800
+    TIMELINE_FANOUT_IN_PROCESS: bool = True
+    TIMELINE_FANOUT_INTERVAL_SECONDS: float = 1.0
+    WATERMARK_SETTLE_TIMEOUT_SECONDS: float = 10
+    EXPORT_WATERMARK_TIMEOUT_SECONDS: float = 10
     LOGTAIL_API_KEY: Optional[str] = None
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_QUEUE_POLICY: Literal["drop_newest", "drop_oldest", "block"] = "drop_newest"
+    LOG_QUEUE_BLOCK_SECONDS: float = 0.05
+    LOG_QUEUE_BATCH_SIZE: int = 256
     MAILGUN_DOMAIN: Optional[str] = None
     MAILGUN_API_KEY: Optional[str] = None
+    MAILGUN_API_URL: str = "https://api.mailgun.net/v3"
+    MAIL_DISPATCHER_IN_PROCESS: bool = True
+    MAIL_CONCURRENCY: int = 4
+    MAIL_BATCH_SIZE: int = 100
+    MAIL_MAX_ATTEMPTS: int = 8
+    MAIL_BACKOFF_SECONDS: float = 2.0
+    MAIL_POLL_INTERVAL_SECONDS: float = 1.0
     B2_KEY_ID: Optional[str] = None
     B2_APPLICATION_KEY: Optional[str] = None
     B2_BUCKET_NAME: Optional[str] = None
+    B2_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    B2_UPLOAD_CONCURRENCY: int = 4
+    B2_UPLOAD_WORKERS: int = 16
+    B2_UPLOAD_QUEUE_SIZE: int = 64
 
 
 class DevConfig(GlobalConfig):
@@ -26,12 +78,21 @@ class DevConfig(GlobalConfig):
 
 
 class ProdConfig(GlobalConfig):
+    DB_AUTO_MIGRATE: bool = False
+    MAIL_DISPATCHER_IN_PROCESS: bool = False
+    SCORE_SCHEDULER_IN_PROCESS: bool = False
+    TIMELINE_FANOUT_IN_PROCESS: bool = False
     model_config = SettingsConfigDict(env_prefix="PROD_")
 
 
 class TestConfig(GlobalConfig):
     DATABASE_URL: Optional[str] = "sqlite:///test.db"
     DB_FORCE_ROLL_BACK: bool = True
+    QUERY_PROFILER_ENABLED: bool = True
+    MAIL_DISPATCHER_IN_PROCESS: bool = False
+    SCORE_SCHEDULER_IN_PROCESS: bool = False
+    TIMELINE_FANOUT_IN_PROCESS: bool = False
+    RESPONSE_CACHE_LIKE_STALENESS_SECONDS: float = 0
     model_config = SettingsConfigDict(env_prefix="TEST_")
 
 
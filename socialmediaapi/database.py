@@ -1,7 +1,11 @@
-import databases
+from functools import lru_cache
+
 import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
 from socialmediaapi.config import config
+from socialmediaapi.db_pool import PooledDatabase
+from socialmediaapi.replicas import ReadRouter
 
 metadata = sqlalchemy.MetaData()
 
@@ -11,6 +15,40 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column(
+        "like_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    # NULL on posts written before creation times were recorded.
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime(timezone=True)),
+    # Both scores are kept up to date by socialmediaapi.scores. top_24h_likes
+    # is NULL once the post is older than a day.
+    sqlalchemy.Column(
+        "hot_score", sqlalchemy.Float, nullable=False, server_default="0"
+    ),
+    sqlalchemy.Column("top_24h_likes", sqlalchemy.Integer),
+)
+
+sqlalchemy.Index("ix_posts_user_id_id", post_table.c.user_id, post_table.c.id)
+sqlalchemy.Index(
+    "ix_posts_like_count_id", post_table.c.like_count.desc(), post_table.c.id.desc()
+)
+sqlalchemy.Index(
+    "ix_posts_hot_score_id", post_table.c.hot_score.desc(), post_table.c.id.desc()
+)
+sqlalchemy.Index(
+    "ix_posts_top_24h_likes_id",
+    post_table.c.top_24h_likes.desc(),
+    post_table.c.id.desc(),
+    postgresql_where=post_table.c.top_24h_likes.isnot(None),
+    sqlite_where=post_table.c.top_24h_likes.isnot(None),
+)
+# Only covers posts still in the top_24h window, so expiring them reads just
+# the rows that need clearing.
+sqlalchemy.Index(
+    "ix_posts_top_24h_created_at",
+    post_table.c.created_at,
+    postgresql_where=post_table.c.top_24h_likes.isnot(None),
+    sqlite_where=post_table.c.top_24h_likes.isnot(None),
 )
 
 comments_table = sqlalchemy.Table(
@@ -22,6 +60,10 @@ comments_table = sqlalchemy.Table(
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
 )
 
+sqlalchemy.Index(
+    "ix_comments_post_id_id", comments_table.c.post_id, comments_table.c.id
+)
+
 likes_table = sqlalchemy.Table(
     "likes",
     metadata,
@@ -30,6 +72,14 @@ likes_table = sqlalchemy.Table(
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
 )
 
+sqlalchemy.Index(
+    "uq_likes_post_id_user_id",
+    likes_table.c.post_id,
+    likes_table.c.user_id,
+    unique=True,
+)
+sqlalchemy.Index("ix_likes_user_id", likes_table.c.user_id)
+
 users_table = sqlalchemy.Table(
     "users",
     metadata,
@@ -37,14 +87,172 @@ users_table = sqlalchemy.Table(
     sqlalchemy.Column("email", sqlalchemy.String, unique=True),
     sqlalchemy.Column("password", sqlalchemy.String),
     sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
+    sqlalchemy.Column(
+        "follower_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    # Set once follower_count reaches TIMELINE_FANOUT_MAX_FOLLOWERS and never
+    # cleared, so every post of the author is found the same way.
+    sqlalchemy.Column(
+        "fanout_on_read",
+        sqlalchemy.Boolean,
+        nullable=False,
+        server_default=sqlalchemy.false(),
+    ),
+)
+
+follows_table = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("follower_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column("followee_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    # Copy of the followee's fanout_on_read, so a reader's high-follower
+    # followees are found without looking at every account they follow.
+    sqlalchemy.Column(
+        "fanout_on_read",
+        sqlalchemy.Boolean,
+        nullable=False,
+        server_default=sqlalchemy.false(),
+    ),
+)
+
+sqlalchemy.Index(
+    "uq_follows_follower_id_followee_id",
+    follows_table.c.follower_id,
+    follows_table.c.followee_id,
+    unique=True,
+)
+sqlalchemy.Index(
+    "ix_follows_followee_id_follower_id",
+    follows_table.c.followee_id,
+    follows_table.c.follower_id,
+)
+sqlalchemy.Index(
+    "ix_follows_follower_id_fanout_on_read",
+    follows_table.c.follower_id,
+    follows_table.c.followee_id,
+    postgresql_where=follows_table.c.fanout_on_read,
+    sqlite_where=follows_table.c.fanout_on_read,
+)
+
+# Precomputed home timelines: one row per (reader, post) written by the
+# fan-out job. The primary key makes a timeline page a range scan.
+timeline_table = sqlalchemy.Table(
+    "timeline",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), primary_key=True),
+    sqlalchemy.Column("author_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+)
+
+uploads_table = sqlalchemy.Table(
+    "uploads",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("digest", sqlalchemy.String(64), nullable=False, unique=True),
+    sqlalchemy.Column("file_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("file_name", sqlalchemy.String),
+    sqlalchemy.Column("size", sqlalchemy.BigInteger, nullable=False),
+)
+
+email_outbox_table = sqlalchemy.Table(
+    "email_outbox",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("to_address", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("subject", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("body", sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column("status", sqlalchemy.String(16), nullable=False),
+    sqlalchemy.Column(
+        "attempts", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    sqlalchemy.Column(
+        "next_attempt_at", sqlalchemy.DateTime(timezone=True), nullable=False
+    ),
+    sqlalchemy.Column("claim_token", sqlalchemy.String(32)),
+    sqlalchemy.Column("last_error", sqlalchemy.String),
+    sqlalchemy.Column("sent_at", sqlalchemy.DateTime(timezone=True)),
+)
+
+sqlalchemy.Index(
+    "ix_email_outbox_status_next_attempt_at",
+    email_outbox_table.c.status,
+    email_outbox_table.c.next_attempt_at,
 )
 
-connect_args = {"check_same_thread": False} if "sqlite" in config.DATABASE_URL else {}
-engine = sqlalchemy.create_engine(config.DATABASE_URL, connect_args=connect_args)
+# Progress of periodic jobs that work through append-only tables: the last
+# row id they processed and a counter bumped whenever a run changed anything.
+job_state_table = sqlalchemy.Table(
+    "job_state",
+    metadata,
+    sqlalchemy.Column("name", sqlalchemy.String(64), primary_key=True),
+    sqlalchemy.Column(
+        "last_id", sqlalchemy.BigInteger, nullable=False, server_default="0"
+    ),
+    sqlalchemy.Column(
+        "version", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+)
+
+if "sqlite" in config.DATABASE_URL:
+    db_args = {
+        "max_size": config.DB_POOL_MAX_SIZE,
+        "acquire_timeout": config.DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        "timeout": config.DB_SQLITE_BUSY_TIMEOUT_SECONDS,
+        # WAL lets readers run alongside the single writer, and NORMAL only
+        # syncs on checkpoints, which is safe in WAL mode.
+        "pragmas": ("PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"),
+    }
+else:
+    db_args = {
+        "min_size": config.DB_POOL_MIN_SIZE,
+        "max_size": config.DB_POOL_MAX_SIZE,
+        "acquire_timeout": config.DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        "max_inactive_connection_lifetime": config.DB_CONNECTION_MAX_LIFETIME_SECONDS,
+        "server_settings": {
+            "statement_timeout": str(int(config.DB_STATEMENT_TIMEOUT_SECONDS * 1000))
+        },
+    }
+
 
-metadata.create_all(engine)
+@lru_cache
+def get_engine() -> sqlalchemy.Engine:
+    # The synchronous engine is only needed for migrations and maintenance,
+    # so it and its driver are created on first use rather than on import.
+    if "sqlite" in config.DATABASE_URL:
+        connect_args = {
+            "check_same_thread": False,
+            "timeout": config.DB_SQLITE_BUSY_TIMEOUT_SECONDS,
+        }
+        return sqlalchemy.create_engine(config.DATABASE_URL, connect_args=connect_args)
+    return sqlalchemy.create_engine(
+        config.DATABASE_URL, pool_recycle=config.DB_CONNECTION_MAX_LIFETIME_SECONDS
+    )
 
-db_args = {"min_size": 1, "max_size": 3} if "postgres" in config.DATABASE_URL else {}
-database = databases.Database(
+
+database = PooledDatabase(
     config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK, **db_args
 )
+
+# READ_DATABASE_URLS is a comma-separated list of replicas sharing the
+# primary's pool settings. Without replicas every read goes to the primary.
+read_database = ReadRouter(
+    database,
+    [
+        PooledDatabase(url.strip(), **db_args)
+        for url in (config.READ_DATABASE_URLS or "").split(",")
+        if url.strip()
+    ],
+    retry_after=config.READ_REPLICA_RETRY_SECONDS,
+    timeout=config.READ_REPLICA_TIMEOUT_SECONDS,
+    cache_ttl=config.READ_REPLICA_CACHE_TTL_SECONDS,
+)
+
+
+def insert_ignoring_conflicts(table: sqlalchemy.Table, *index_elements):
+    dialect_insert = (
+        postgresql.insert
+        if database.url.dialect.startswith("postgres")
+        else sqlite.insert
+    )
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements)
@@ -0,0 +1,246 @@
+import asyncio
+import bisect
+import logging
+import time
+import typing
+
+import databases
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+from databases.backends.sqlite import SQLiteBackend, SQLiteConnection
+from sqlalchemy.sql import ClauseElement
+
+logger = logging.getLogger(__name__)
+
+ACQUIRE_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+# Called with (query, statement name, seconds, failed) after every query that
+# goes through a PooledDatabase.
+QueryListener = typing.Callable[[ClauseElement | str, str, float, bool], None]
+query_listeners: list[QueryListener] = []
+
+
+def statement_name(query: ClauseElement | str) -> str:
+    # Queries tagged with .execution_options(name=...) keep that name; the
+    # rest are labelled by verb and table so label cardinality stays bounded.
+    if isinstance(query, str):
+        return "raw"
+    name = query.get_execution_options().get("name")
+    if name:
+        return name
+    if query.is_select:
+        froms = query.get_final_froms()
+        from_ = froms[0] if froms else None
+        while hasattr(from_, "left"):
+            from_ = from_.left
+        table = getattr(from_, "name", None)
+        return f"select {table}" if table else "select"
+    for verb in ("insert", "update", "delete"):
+        if getattr(query, f"is_{verb}", False):
+            return f"{verb} {query.table.name}"
+    return "other"
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PoolStats:
+    def __init__(self, max_size: int | None) -> None:
+        self.max_size = max_size
+        self.in_use = 0
+        self.waiters = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.wait_buckets = [0] * (len(ACQUIRE_WAIT_BUCKETS_MS) + 1)
+
+    async def acquire(
+        self, acquire: typing.Callable[[], typing.Awaitable], timeout: float | None
+    ) -> None:
+        self.waiters += 1
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(acquire(), timeout)
+        except TimeoutError as e:
+            self.timeouts += 1
+            raise PoolTimeoutError(
+                f"No database connection available after {timeout}s"
+            ) from e
+        finally:
+            self.waiters -= 1
+
+        waited = time.perf_counter() - started_at
+        self.wait_seconds += waited
+        self.wait_buckets[
+            bisect.bisect_left(ACQUIRE_WAIT_BUCKETS_MS, waited * 1000)
+        ] += 1
+        self.acquired += 1
+        self.in_use += 1
+
+    def released(self) -> None:
+        self.in_use -= 1
+
+    def stats(self, size: int, idle: int) -> dict:
+        # Histogram buckets are cumulative, as in Prometheus.
+        histogram, total = {}, 0
+        for bound, count in zip((*ACQUIRE_WAIT_BUCKETS_MS, "+Inf"), self.wait_buckets):
+            total += count
+            histogram[str(bound)] = total
+        return {
+            "max_size": self.max_size,
+            "size": size,
+            "in_use": self.in_use,
+            "idle": idle,
+            "waiters": self.waiters,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "avg_acquire_wait_ms": round(
+                self.wait_seconds / (self.acquired or 1) * 1000, 3
+            ),
+            "acquire_wait_ms": histogram,
+        }
+
+
+class PooledPostgresBackend(PostgresBackend):
+    def __init__(
+        self, database_url, *, acquire_timeout: float | None = None, **options
+    ) -> None:
+        super().__init__(database_url, **options)
+        self.acquire_timeout = acquire_timeout
+        self.pool_stats = PoolStats(options.get("max_size"))
+
+    def connection(self) -> "PooledPostgresConnection":
+        return PooledPostgresConnection(self, self._dialect)
+
+    def stats(self) -> dict:
+        if self._pool is None:
+            return self.pool_stats.stats(size=0, idle=0)
+        return self.pool_stats.stats(
+            size=self._pool.get_size(), idle=self._pool.get_idle_size()
+        )
+
+
+class PooledPostgresConnection(PostgresConnection):
+    async def acquire(self) -> None:
+        await self._database.pool_stats.acquire(
+            super().acquire, self._database.acquire_timeout
+        )
+
+    async def release(self) -> None:
+        await super().release()
+        self._database.pool_stats.released()
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    # databases opens a fresh SQLite connection per acquire, so the pool size
+    # is enforced with a semaphore and the per-connection pragmas are applied
+    # on every acquire.
+    def __init__(
+        self,
+        database_url,
+        *,
+        acquire_timeout: float | None = None,
+        max_size: int | None = None,
+        pragmas: typing.Sequence[str] = (),
+        **options,
+    ) -> None:
+        super().__init__(database_url, **options)
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = pragmas
+        self.pool_stats = PoolStats(max_size)
+        self.slots: asyncio.Semaphore | None = None
+
+    async def connect(self) -> None:
+        await super().connect()
+        if self.pool_stats.max_size:
+            self.slots = asyncio.Semaphore(self.pool_stats.max_size)
+
+    def connection(self) -> "PooledSQLiteConnection":
+        return PooledSQLiteConnection(self, self._pool, self._dialect)
+
+    def stats(self) -> dict:
+        return self.pool_stats.stats(size=self.pool_stats.in_use, idle=0)
+
+
+class PooledSQLiteConnection(SQLiteConnection):
+    def __init__(self, backend: PooledSQLiteBackend, pool, dialect) -> None:
+        super().__init__(pool, dialect)
+        self._backend = backend
+
+    async def acquire(self) -> None:
+        slots = self._backend.slots
+
+        async def acquire_slot():
+            if slots is not None:
+                await slots.acquire()
+
+        await self._backend.pool_stats.acquire(
+            acquire_slot, self._backend.acquire_timeout
+        )
+        try:
+            await super().acquire()
+            for pragma in self._backend.pragmas:
+                await self._connection.execute(pragma)
+        except BaseException:
+            if self._connection is not None:
+                await super().release()
+            await self.release_slot()
+            raise
+
+    async def release(self) -> None:
+        try:
+            await super().release()
+        finally:
+            await self.release_slot()
+
+    async def release_slot(self) -> None:
+        if self._backend.slots is not None:
+            self._backend.slots.release()
+        self._backend.pool_stats.released()
+
+
+class PooledDatabase(databases.Database):
+    SUPPORTED_BACKENDS: typing.ClassVar[dict[str, str]] = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "postgresql": "socialmediaapi.db_pool:PooledPostgresBackend",
+        "postgres": "socialmediaapi.db_pool:PooledPostgresBackend",
+        "sqlite": "socialmediaapi.db_pool:PooledSQLiteBackend",
+    }
+
+    def pool_stats(self) -> dict:
+        return self._backend.stats()
+
+    async def _observed(self, method: str, query, *args, **kwargs):
+        if not query_listeners:
+            return await getattr(super(), method)(query, *args, **kwargs)
+        started_at = time.perf_counter()
+        failed = True
+        try:
+            result = await getattr(super(), method)(query, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - started_at
+            name = statement_name(query)
+            for listener in query_listeners:
+                # A broken listener must not fail or mask the query's result.
+                try:
+                    listener(query, name, elapsed, failed)
+                except Exception:
+                    logger.exception("Query listener %r failed", listener)
+
+    async def fetch_all(self, query, values: dict | None = None):
+        return await self._observed("fetch_all", query, values)
+
+    async def fetch_one(self, query, values: dict | None = None):
+        return await self._observed("fetch_one", query, values)
+
+    async def fetch_val(self, query, values: dict | None = None, column=0):
+        return await self._observed("fetch_val", query, values, column=column)
+
+    async def execute(self, query, values: dict | None = None):
+        return await self._observed("execute", query, values)
+
+    async def execute_many(self, query, values: list):
+        return await self._observed("execute_many", query, values)
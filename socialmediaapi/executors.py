@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturatedError(f"{self.name} pool is saturated")
+            self.in_flight += 1
+            self.submitted += 1
+
+        queued_at = time.perf_counter()
+
+        def timed_call():
+            started_at = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self.wait_seconds += started_at - queued_at
+                    self.run_seconds += finished_at - started_at
+
+        def release(future: Future) -> None:
+            # Also runs for jobs cancelled while queued, by the awaiting task or
+            # by shutdown, which never reach timed_call.
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+        future = self.executor.submit(timed_call)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": min(self.in_flight, self.max_workers),
+                "queued": max(self.in_flight - self.max_workers, 0),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / completed * 1000, 3),
+                "avg_run_ms": round(self.run_seconds / completed * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            logger.debug(f"Shutting down {self.name} pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
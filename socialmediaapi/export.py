@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+import orjson
+import sqlalchemy
+
+from socialmediaapi.config import config
+from socialmediaapi.database import comments_table, database, likes_table, post_table
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+
+SNAPSHOT_SETTLED_QUERY = (
+    "SELECT pg_snapshot_xmin(pg_current_snapshot())"
+    " >= pg_snapshot_xmax(CAST(:snapshot AS pg_snapshot))"
+)
+
+EXPORTED_TABLES = {
+    "post": (
+        post_table,
+        (
+            post_table.c.id,
+            post_table.c.body,
+            post_table.c.user_id,
+            post_table.c.like_count.label("likes"),
+        ),
+    ),
+    "comment": (comments_table, tuple(comments_table.c)),
+    "like": (likes_table, tuple(likes_table.c)),
+}
+
+
+def is_postgres() -> bool:
+    return database.url.dialect.startswith("postgres")
+
+
+async def wait_for_snapshot(snapshot: str, timeout: float) -> None:
+    # Returns once every transaction that was running when the snapshot was
+    # taken has committed or rolled back.
+    async with asyncio.timeout(timeout):
+        while not await database.fetch_val(
+            SNAPSHOT_SETTLED_QUERY, values={"snapshot": snapshot}
+        ):
+            await asyncio.sleep(0.05)
+
+
+async def settled_max_id(table: sqlalchemy.Table, timeout: float) -> int:
+    # Highest id of table below which no row can still appear. On Postgres
+    # ids are drawn from sequences before their transaction commits, so the
+    # max(id) read together with a snapshot is only returned once every
+    # transaction running at that snapshot has finished. Raises TimeoutError
+    # when they run past timeout.
+    columns = [
+        sqlalchemy.func.coalesce(sqlalchemy.func.max(table.c.id), 0).label("max_id")
+    ]
+    if is_postgres():
+        columns.append(
+            sqlalchemy.cast(
+                sqlalchemy.func.pg_current_snapshot(), sqlalchemy.Text
+            ).label("snapshot")
+        )
+    row = await database.fetch_one(sqlalchemy.select(*columns))
+    if is_postgres():
+        await wait_for_snapshot(row.snapshot, timeout)
+    return row.max_id
+
+
+async def export_watermark() -> dict[str, int]:
+    # Upper bounds taken before streaming starts, so rows written during the
+    # export are left for the next incremental run instead of being split.
+    # On Postgres ids are drawn from sequences before their transaction
+    # commits, so a row below max(id) may still be invisible. The watermark
+    # is only handed out once the transactions in flight when it was read
+    # have finished, otherwise the next incremental run would skip those
+    # rows. SQLite has a single writer and needs no wait. Raises TimeoutError
+    # when they run past EXPORT_WATERMARK_TIMEOUT_SECONDS.
+    columns = [
+        sqlalchemy.select(sqlalchemy.func.coalesce(sqlalchemy.func.max(t.c.id), 0))
+        .scalar_subquery()
+        .label(name)
+        for name, (t, _) in EXPORTED_TABLES.items()
+    ]
+    if is_postgres():
+        columns.append(
+            sqlalchemy.cast(
+                sqlalchemy.func.pg_current_snapshot(), sqlalchemy.Text
+            ).label("snapshot")
+        )
+    row = await database.fetch_one(sqlalchemy.select(*columns))
+    if is_postgres():
+        await wait_for_snapshot(row.snapshot, config.EXPORT_WATERMARK_TIMEOUT_SECONDS)
+    return {name: row[name] for name in EXPORTED_TABLES}
+
+
+async def export_table(
+    name: str, after_id: int, until_id: int, batch_size: int
+) -> AsyncIterator[bytes]:
+    table, columns = EXPORTED_TABLES[name]
+    fields = tuple(str(column.name) for column in columns)
+    while after_id < until_id:
+        query = (
+            sqlalchemy.select(*columns)
+            .where(table.c.id > after_id, table.c.id <= until_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        lines = []
+        async for row in database.iterate(query):
+            record = dict(zip(fields, row._mapping))
+            lines.append(orjson.dumps({"type": name, **record}))
+            after_id = record["id"]
+        if not lines:
+            break
+        yield b"\n".join(lines) + b"\n"
+
+
+async def export_ndjson(
+    since: dict[str, int] | None = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    watermark: dict[str, int] | None = None,
+) -> AsyncIterator[bytes]:
+    # Each table is walked in id order with keyset batches, so memory stays
+    # bounded by one batch whatever the table sizes. Comments and likes carry
+    # their post_id; posts carry their like count. The last line is the
+    # watermark to pass back as `since` for an incremental export.
+    since = since or {}
+    watermark = watermark or await export_watermark()
+    logger.info(f"Exporting rows after {since} up to {watermark}")
+    for name in EXPORTED_TABLES:
+        async for chunk in export_table(
+            name, since.get(name, 0), watermark[name], batch_size
+        ):
+            yield chunk
+    yield orjson.dumps({"type": "watermark", **watermark}) + b"\n"
@@ -1,15 +1,30 @@
+import asyncio
+import hashlib
+import io
 import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
 from functools import lru_cache
-
-import b2sdk.v2 as b2
+from typing import TYPE_CHECKING
 
 from socialmediaapi.config import config
+from socialmediaapi.executors import BoundedExecutor
+from socialmediaapi.utils import log
+
+if TYPE_CHECKING:
+    import b2sdk.v2 as b2
 
 logger = logging.getLogger(__name__)
 
+b2_executor = BoundedExecutor(
+    "b2_upload", config.B2_UPLOAD_WORKERS, config.B2_UPLOAD_QUEUE_SIZE
+)
+
 
 @lru_cache
-def b2_api():
+def b2_api() -> "b2.B2Api":
+    # b2sdk is slow to import, so only the upload path pays for it.
+    import b2sdk.v2 as b2
+
     logger.debug("Creating and authorize B2 API")
     info = b2.InMemoryAccountInfo()
     b2_api = b2.B2Api(info)
@@ -19,10 +34,11 @@ def b2_api():
 
 
 @lru_cache
-def b2_get_bucket(api: b2.B2Api):
+def b2_get_bucket(api: "b2.B2Api"):
     return api.get_bucket_by_name(config.B2_BUCKET_NAME)
 
 
+@log(logger, level=logging.DEBUG)
 def b2_upload_file(local_file: str, file_name: str):
     api = b2_api()
     logger.debug(f"Uploading {local_file} to B2 as {file_name}")
@@ -36,3 +52,142 @@ def b2_upload_file(local_file: str, file_name: str):
     )
 
     return download_url
+
+
+@log(logger, level=logging.DEBUG, log_args=False)
+def b2_upload_bytes(data: bytes, file_name: str) -> str:
+    logger.debug(f"Uploading {len(data)} bytes to B2 as {file_name}")
+    return b2_get_bucket(b2_api()).upload_bytes(data, file_name).id_
+
+
+@log(logger, level=logging.DEBUG)
+def b2_start_large_file(file_name: str) -> str:
+    api = b2_api()
+    logger.debug(f"Starting B2 large file {file_name}")
+    large_file = api.session.start_large_file(
+        b2_get_bucket(api).id_, file_name, "b2/x-auto", {}
+    )
+    return large_file["fileId"]
+
+
+@log(logger, level=logging.DEBUG, log_args=False)
+def b2_upload_part(file_id: str, part_number: int, data: bytes) -> str:
+    sha1 = hashlib.sha1(data).hexdigest()
+    logger.debug(f"Uploading part {part_number} ({len(data)} bytes) of {file_id}")
+    b2_api().session.upload_part(
+        file_id, part_number, len(data), sha1, io.BytesIO(data)
+    )
+    return sha1
+
+
+@log(logger, level=logging.DEBUG)
+def b2_finish_large_file(file_id: str, part_sha1s: list[str]) -> None:
+    logger.debug(f"Finishing B2 large file {file_id} with {len(part_sha1s)} parts")
+    b2_api().session.finish_large_file(file_id, part_sha1s)
+
+
+@log(logger, level=logging.DEBUG)
+def b2_cancel_large_file(file_id: str) -> None:
+    logger.debug(f"Cancelling B2 large file {file_id}")
+    b2_api().session.cancel_large_file(file_id)
+
+
+@log(logger, level=logging.DEBUG)
+def b2_delete_file(file_id: str, file_name: str) -> None:
+    logger.debug(f"Deleting B2 file {file_name} ({file_id})")
+    b2_api().delete_file_version(file_id, file_name)
+
+
+def b2_download_url(file_id: str) -> str:
+    return b2_api().get_download_url_for_fileid(file_id)
+
+
+async def b2_stream_upload(
+    chunks: AsyncIterator[bytes],
+    file_name: str,
+    part_size: int | None = None,
+    concurrency: int | None = None,
+    deduplicate: (
+        Callable[[Callable[[], Awaitable[str]], bool], Awaitable[str]] | None
+    ) = None,
+) -> str:
+    # Streams shorter than two parts go out as a single upload, anything longer
+    # becomes a B2 large file. The stream is only read while a part slot is
+    # free, so memory stays bounded by part_size * (concurrency + 2).
+    # Once the stream is exhausted, deduplicate decides whether to commit the
+    # upload or to return the id of an identical file stored earlier. It is
+    # also told whether parts were already transferred, in which case a
+    # duplicate only saves storage, not bandwidth.
+    part_size = part_size or config.B2_UPLOAD_PART_SIZE
+    slots = asyncio.Semaphore(concurrency or config.B2_UPLOAD_CONCURRENCY)
+    uploads: list[asyncio.Task] = []
+    buffer = bytearray()
+    first_part: bytes | None = None
+    file_id: str | None = None
+    committed = False
+
+    async def upload_part(part_number: int, data: bytes) -> str:
+        try:
+            return await b2_executor.run(b2_upload_part, file_id, part_number, data)
+        finally:
+            slots.release()
+
+    async def submit(data: bytes) -> None:
+        await slots.acquire()
+        for upload in uploads:
+            if upload.done() and upload.exception():
+                slots.release()
+                raise upload.exception()
+        uploads.append(asyncio.create_task(upload_part(len(uploads) + 1, data)))
+
+    async def commit() -> str:
+        nonlocal committed
+        committed = True
+        if file_id is None:
+            data = (first_part or b"") + bytes(buffer)
+            return await b2_executor.run(b2_upload_bytes, data, file_name)
+
+        if buffer:
+            await submit(bytes(buffer))
+        part_sha1s = await asyncio.gather(*uploads)
+        await b2_executor.run(b2_finish_large_file, file_id, part_sha1s)
+        return file_id
+
+    async def discard() -> None:
+        for upload in uploads:
+            upload.cancel()
+        await asyncio.gather(*uploads, return_exceptions=True)
+        if file_id is not None:
+            try:
+                await b2_executor.run(b2_cancel_large_file, file_id)
+            except Exception:
+                logger.exception(f"Could not cancel B2 large file {file_id}")
+
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= part_size:
+                part = bytes(buffer[:part_size])
+                del buffer[:part_size]
+                if file_id is None:
+                    if first_part is None:
+                        first_part = part
+                        continue
+                    file_id = await b2_executor.run(b2_start_large_file, file_name)
+                    await submit(first_part)
+                    first_part = None
+                await submit(part)
+
+        stored_file_id = await (
+            deduplicate(commit, file_id is not None) if deduplicate else commit()
+        )
+    except BaseException:
+        await discard()
+        raise
+
+    if not committed:
+        logger.debug(f"Discarding duplicate upload of {file_name}")
+        await discard()
+
+    logger.debug(f"Uploaded {file_name} to B2 as {stored_file_id}")
+    return b2_download_url(stored_file_id)
@@ -0,0 +1,102 @@
+from collections.abc import AsyncIterator
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+
+
+class MultipartStreamError(Exception):
+    pass
+
+
+class MultipartFileStream:
+    def __init__(
+        self, headers: Headers, stream: AsyncIterator[bytes], field_name: str
+    ) -> None:
+        _, params = parse_options_header(headers.get("content-type", ""))
+        if b"boundary" not in params:
+            raise MultipartStreamError("Missing boundary in multipart.")
+
+        self.field_name = field_name
+        self.filename: str | None = None
+        self._stream = stream.__aiter__()
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+        self._file_done = False
+        self._pending: list[bytes] = []
+        self._parser = MultipartParser(
+            params[b"boundary"],
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if (
+            self.filename is None
+            and options.get(b"name") == self.field_name.encode()
+            and b"filename" in options
+        ):
+            self.filename = options[b"filename"].decode()
+            self._in_file = True
+
+    async def _feed(self) -> bool:
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise MultipartStreamError(str(e)) from e
+        return True
+
+    async def open(self) -> str:
+        while self.filename is None:
+            if not await self._feed():
+                raise MultipartStreamError(f"Missing file field '{self.field_name}'.")
+        return self.filename
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            if self._pending:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                yield data
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise MultipartStreamError("Unexpected end of multipart body.")
@@ -1,5 +1,8 @@
+import atexit
 import logging
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from socialmediaapi.config import DevConfig, ProdConfig, config
 
@@ -21,12 +24,170 @@ class EmailObfuscationFilter(logging.Filter):
         return True
 
 
+class LogQueueHandler(QueueHandler):
+    # Records are put on a bounded queue and written by a QueueListener
+    # thread. When the queue is full the policy decides between dropping the
+    # new record, dropping the oldest one or blocking the caller for a while.
+    # Blocking happens on the logging thread, which for request handlers is
+    # the event loop: every request stalls while the queue stays full.
+    def __init__(
+        self, maxsize: int, policy: str = "drop_newest", block_timeout: float = 0.05
+    ) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.enqueued = 0
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.policy != "drop_oldest" or not replace_oldest(self.queue, record):
+                return
+        self.enqueued += 1
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "depth": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+        }
+
+
+def replace_oldest(log_queue: queue.Queue, item) -> bool:
+    # Swaps the oldest record for item under the queue's own lock, so that a
+    # concurrent put cannot take the freed slot and the listener's stop
+    # sentinel is never the record evicted.
+    with log_queue.mutex:
+        for index, queued in enumerate(log_queue.queue):
+            if queued is not QueueListener._sentinel:
+                del log_queue.queue[index]
+                log_queue.queue.append(item)
+                log_queue.not_empty.notify()
+                return True
+    return False
+
+
+class BatchingQueueListener(QueueListener):
+    def __init__(self, queue, *handlers, batch_size: int = 256) -> None:
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def enqueue_sentinel(self) -> None:
+        # A blocking put could wait forever on a full queue at shutdown.
+        try:
+            self.queue.put_nowait(self._sentinel)
+        except queue.Full:
+            replace_oldest(self.queue, self._sentinel)
+
+    def _monitor(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            if self._sentinel in batch:
+                stopping = True
+                batch = [record for record in batch if record is not self._sentinel]
+            for record in batch:
+                self.handle(record)
+            if not batch:
+                continue
+            for handler in self.handlers:
+                if hasattr(handler, "flush_batch"):
+                    handler.flush_batch()
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    # Flushed by BatchingQueueListener once per batch instead of per record.
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+log_queues: dict[str, LogQueueHandler] = {}
+log_listeners: list[BatchingQueueListener] = []
+# Sinks replaced by each queue handler, with the filters moved off them.
+queued_sinks: dict[str, dict[logging.Handler, list]] = {}
+
+
+def queue_logger_handlers(*logger_names: str) -> None:
+    # Filters move from the sinks to the queue handler so that they still run
+    # on the calling thread: the correlation id lives in a context variable
+    # the listener thread cannot see. Sinks can be shared between loggers, so
+    # all filters are collected before any is removed.
+    loggers = [logging.getLogger(name) for name in logger_names]
+    sink_filters = {
+        sink: sink.filters[:] for logger in loggers for sink in logger.handlers
+    }
+    for sink, filters in sink_filters.items():
+        for log_filter in filters:
+            sink.removeFilter(log_filter)
+
+    for logger in loggers:
+        sinks = logger.handlers[:]
+        queue_handler = LogQueueHandler(
+            config.LOG_QUEUE_SIZE,
+            config.LOG_QUEUE_POLICY,
+            config.LOG_QUEUE_BLOCK_SECONDS,
+        )
+        for sink in sinks:
+            for log_filter in sink_filters[sink]:
+                if log_filter not in queue_handler.filters:
+                    queue_handler.addFilter(log_filter)
+            logger.removeHandler(sink)
+        logger.addHandler(queue_handler)
+
+        listener = BatchingQueueListener(
+            queue_handler.queue, *sinks, batch_size=config.LOG_QUEUE_BATCH_SIZE
+        )
+        listener.start()
+        log_queues[logger.name] = queue_handler
+        log_listeners.append(listener)
+        queued_sinks[logger.name] = {sink: sink_filters[sink] for sink in sinks}
+
+
+def stop_logging() -> None:
+    # The original sinks go back on their loggers before the queue handlers
+    # come off, so records logged after shutdown are written directly rather
+    # than left on a queue nobody drains.
+    for name, sinks in queued_sinks.items():
+        logger = logging.getLogger(name)
+        for sink, filters in sinks.items():
+            for log_filter in filters:
+                if log_filter not in sink.filters:
+                    sink.addFilter(log_filter)
+            logger.addHandler(sink)
+        logger.removeHandler(log_queues[name])
+    queued_sinks.clear()
+    while log_listeners:
+        log_listeners.pop().stop()
+    log_queues.clear()
+
+
+def logging_stats() -> dict:
+    return {name: handler.stats() for name, handler in log_queues.items()}
+
+
 handlers = ["default", "rotating_file"]
 if isinstance(config, ProdConfig):
     handlers = ["default", "rotating_file", "logtail"]
 
 
 def configure_logging() -> None:
+    stop_logging()
     dictConfig(
         {
             "version": 1,
@@ -62,7 +223,7 @@ def configure_logging() -> None:
                     "filters": ["correlation_id", "email_obfuscation"],
                 },
                 "rotating_file": {
-                    "class": "logging.handlers.RotatingFileHandler",
+                    "class": "socialmediaapi.logging_conf.BatchingRotatingFileHandler",
                     "level": "DEBUG",
                     "formatter": "file",
                     "filename": "socialmediaapi.log",
@@ -100,3 +261,7 @@ def configure_logging() -> None:
             },
         }
     )
+    queue_logger_handlers("uvicorn", "socialmediaapi")
+
+
+atexit.register(stop_logging)
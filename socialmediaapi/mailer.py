@@ -0,0 +1,211 @@
+import asyncio
+import datetime
+import json
+import logging
+import secrets
+from itertools import groupby
+
+import httpx
+from sqlalchemy import select
+
+from socialmediaapi.config import config
+from socialmediaapi.database import database, email_outbox_table
+from socialmediaapi.metrics import background_task_duration, timed
+from socialmediaapi.tasks import APIResponseError, mailgun_message, post_mailgun_message
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE_SECONDS = 60
+
+
+def is_permanent_error(err: Exception) -> bool:
+    # Mailgun answers 4xx for requests that will never succeed, such as a bad
+    # address or domain, and 429 when it is only rate limiting.
+    status_code = getattr(err, "status_code", None)
+    return status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class MailDispatcher:
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None = None,
+        concurrency: int | None = None,
+        batch_size: int | None = None,
+        max_attempts: int | None = None,
+        backoff_seconds: float | None = None,
+    ) -> None:
+        self.concurrency = concurrency or config.MAIL_CONCURRENCY
+        self.batch_size = batch_size or config.MAIL_BATCH_SIZE
+        self.max_attempts = max_attempts or config.MAIL_MAX_ATTEMPTS
+        self.backoff_seconds = (
+            config.MAIL_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        )
+        self._client = client
+        self._owns_client = client is None
+        self.requests = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def claim(self) -> list:
+        # Leasing rows by pushing next_attempt_at forward lets several workers
+        # share the outbox; a worker that dies mid-send releases its rows once
+        # the lease runs out. The outer due check stops two workers claiming
+        # the same rows.
+        now = utcnow()
+        token = secrets.token_hex(16)
+        due = (
+            email_outbox_table.c.status == "pending",
+            email_outbox_table.c.next_attempt_at <= now,
+        )
+        due_ids = (
+            select(email_outbox_table.c.id)
+            .where(*due)
+            .order_by(email_outbox_table.c.next_attempt_at, email_outbox_table.c.id)
+            .limit(self.batch_size * self.concurrency)
+        )
+        query = (
+            email_outbox_table.update()
+            .where(email_outbox_table.c.id.in_(due_ids.scalar_subquery()), *due)
+            .values(
+                claim_token=token,
+                next_attempt_at=now + datetime.timedelta(seconds=CLAIM_LEASE_SECONDS),
+            )
+        )
+        logger.debug(query)
+        await database.execute(query)
+
+        query = (
+            email_outbox_table.select()
+            .where(email_outbox_table.c.claim_token == token)
+            .order_by(email_outbox_table.c.id)
+        )
+        return await database.fetch_all(query)
+
+    def batches(self, rows: list) -> list[list]:
+        # Mailgun sends one message to up to 1000 recipients, so identical
+        # emails are grouped into a single request.
+        def key(row):
+            return row.subject, row.body
+
+        batches = []
+        for _, group in groupby(sorted(rows, key=key), key=key):
+            group = list(group)
+            for start in range(0, len(group), self.batch_size):
+                batches.append(group[start : start + self.batch_size])
+        return batches
+
+    async def send_batch(self, rows: list) -> None:
+        recipients = [row.to_address for row in rows]
+        data = mailgun_message(recipients, rows[0].subject, rows[0].body)
+        if len(recipients) > 1:
+            # Without recipient variables every recipient would see the others
+            # in the To header.
+            data["recipient-variables"] = json.dumps({to: {} for to in recipients})
+
+        self.requests += 1
+        try:
+            await post_mailgun_message(self.client, data)
+        except (APIResponseError, httpx.HTTPError) as err:
+            logger.warning(f"Sending {len(rows)} emails failed: {err}")
+            permanent = is_permanent_error(err)
+            for row in rows:
+                await self.reschedule(row, str(err), permanent)
+            return
+
+        query = (
+            email_outbox_table.update()
+            .where(email_outbox_table.c.id.in_([row.id for row in rows]))
+            .values(status="sent", sent_at=utcnow(), claim_token=None)
+        )
+        logger.debug(query)
+        await database.execute(query)
+        self.sent += len(rows)
+
+    async def reschedule(self, row, error: str, permanent: bool = False) -> None:
+        attempts = row.attempts + 1
+        if permanent or attempts >= self.max_attempts:
+            values = {"status": "failed"}
+            self.failed += 1
+        else:
+            delay = self.backoff_seconds * 2**attempts
+            values = {"next_attempt_at": utcnow() + datetime.timedelta(seconds=delay)}
+            self.retried += 1
+        query = (
+            email_outbox_table.update()
+            .where(email_outbox_table.c.id == row.id)
+            .values(
+                attempts=attempts, last_error=error[:255], claim_token=None, **values
+            )
+        )
+        logger.debug(query)
+        await database.execute(query)
+
+    async def dispatch_pending(self) -> int:
+        # Idle polls are not timed, or they would drown out the dispatches.
+        rows = await self.claim()
+        if not rows:
+            return 0
+        with timed(background_task_duration, "mail_dispatch"):
+            slots = asyncio.Semaphore(self.concurrency)
+
+            async def send(batch: list) -> None:
+                async with slots:
+                    await self.send_batch(batch)
+
+            await asyncio.gather(*(send(batch) for batch in self.batches(rows)))
+            return len(rows)
+
+    async def run(
+        self, stop: asyncio.Event, poll_interval: float | None = None
+    ) -> None:
+        poll_interval = poll_interval or config.MAIL_POLL_INTERVAL_SECONDS
+        logger.info("Mail dispatcher started")
+        try:
+            while not stop.is_set():
+                try:
+                    if await self.dispatch_pending():
+                        continue
+                except Exception:
+                    logger.exception("Mail dispatcher iteration failed")
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_interval)
+                except TimeoutError:
+                    pass
+        finally:
+            await self.close()
+            logger.info("Mail dispatcher stopped")
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "requests": self.requests,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+mail_dispatcher = MailDispatcher()
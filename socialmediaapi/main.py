@@ -1,15 +1,32 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from asgi_correlation_id import CorrelationIdMiddleware
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, status
 from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import JSONResponse
 
-from socialmediaapi.database import database
-from socialmediaapi.logging_conf import configure_logging
+from socialmediaapi.config import config
+from socialmediaapi.database import database, get_engine, read_database
+from socialmediaapi.db_pool import PoolTimeoutError
+from socialmediaapi.libs.b2 import b2_executor
+from socialmediaapi.logging_conf import configure_logging, stop_logging
+from socialmediaapi.mailer import mail_dispatcher
+from socialmediaapi.metrics import MetricsMiddleware
+from socialmediaapi.migrations import migrate
+from socialmediaapi.profiler import QueryProfilerMiddleware
+from socialmediaapi.routers.export import router as export_router
+from socialmediaapi.routers.metrics import router as metrics_router
 from socialmediaapi.routers.post import router as post_router
+from socialmediaapi.routers.search import router as search_router
+from socialmediaapi.routers.stats import router as stats_router
+from socialmediaapi.routers.timeline import router as timeline_router
 from socialmediaapi.routers.uploaded import router as uploaded_router
 from socialmediaapi.routers.user import router as user_router
+from socialmediaapi.scores import score_scheduler
+from socialmediaapi.security import load_password_backend, password_hasher
+from socialmediaapi.timeline import timeline_fanout
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +34,62 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     configure_logging()
+    if config.DB_AUTO_MIGRATE:
+        engine = await asyncio.to_thread(get_engine)
+        await asyncio.to_thread(migrate, engine)
+        engine.dispose()
+    await asyncio.to_thread(load_password_backend)
     await database.connect()
+    await read_database.connect()
+    stop_workers = asyncio.Event()
+    workers = []
+    if config.MAIL_DISPATCHER_IN_PROCESS:
+        workers.append(asyncio.create_task(mail_dispatcher.run(stop_workers)))
+    if config.SCORE_SCHEDULER_IN_PROCESS:
+        workers.append(asyncio.create_task(score_scheduler.run(stop_workers)))
+    if config.TIMELINE_FANOUT_IN_PROCESS:
+        workers.append(asyncio.create_task(timeline_fanout.run(stop_workers)))
     yield
+    stop_workers.set()
+    await asyncio.gather(*workers)
+    await read_database.disconnect()
     await database.disconnect()
+    password_hasher.shutdown()
+    b2_executor.shutdown()
+    stop_logging()
 
 
 app = FastAPI(lifespan=lifespan)
+if config.QUERY_PROFILER_ENABLED:
+    app.add_middleware(
+        QueryProfilerMiddleware,
+        max_queries=config.QUERY_PROFILER_MAX_QUERIES,
+        repeat_threshold=config.QUERY_PROFILER_REPEAT_THRESHOLD,
+    )
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(CorrelationIdMiddleware)
 
 app.include_router(post_router)
 app.include_router(user_router)
+app.include_router(timeline_router)
 app.include_router(uploaded_router)
+app.include_router(export_router)
+app.include_router(search_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handle_logging(request, exc):
     logger.error(f"HTTPException: {exc.status_code} {exc.detail}")
     return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request, exc):
+    logger.error(f"PoolTimeoutError: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, please retry."},
+        headers={"Retry-After": "1"},
+    )
@@ -0,0 +1,49 @@
+import logging
+
+import sqlalchemy
+
+from socialmediaapi.database import database, likes_table, post_table
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+async def reconcile_like_counts(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    counted_likes = (
+        sqlalchemy.select(sqlalchemy.func.count(likes_table.c.id))
+        .where(likes_table.c.post_id == post_table.c.id)
+        .scalar_subquery()
+    )
+
+    repaired = 0
+    last_id = 0
+    while True:
+        query = (
+            sqlalchemy.select(post_table.c.id)
+            .where(post_table.c.id > last_id)
+            .order_by(post_table.c.id)
+            .limit(batch_size)
+        )
+        ids = [row.id for row in await database.fetch_all(query)]
+        if not ids:
+            break
+
+        in_batch = post_table.c.id.between(ids[0], ids[-1])
+        drifted = post_table.c.like_count != counted_likes
+        query = sqlalchemy.select(sqlalchemy.func.count()).where(in_batch, drifted)
+        batch_repaired = await database.fetch_val(query)
+        if batch_repaired:
+            query = (
+                post_table.update()
+                .where(in_batch, drifted)
+                .values(like_count=counted_likes)
+            )
+            logger.debug(query)
+            await database.execute(query)
+            repaired += batch_repaired
+
+        last_id = ids[-1]
+
+    logger.info(f"Reconciled like counts, repaired {repaired} posts")
+    return repaired
@@ -0,0 +1,274 @@
+import abc
+import bisect
+import contextlib
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from socialmediaapi.db_pool import query_listeners
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames: tuple[str, ...], labelvalues: tuple, **extra) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+class Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        # The lock is only taken the first time a label combination is seen.
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self): ...
+
+    @abc.abstractmethod
+    def _render_child(self, labelvalues, child) -> Iterable[str]: ...
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for labelvalues, child in list(self._children.items()):
+            yield from self._render_child(labelvalues, child)
+
+
+class CounterValue:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, labelvalues, child) -> Iterable[str]:
+        labels = format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}{labels} {child.value}"
+
+
+class HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, labelvalues, child) -> Iterable[str]:
+        with child._lock:
+            counts, total = child.counts[:], child.sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            labels = format_labels(self.labelnames, labelvalues, le=bound)
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum{labels} {total}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CollectedMetric:
+    # Read at scrape time from a callback returning {labelvalues: value}, so
+    # components keep their own counters and pay nothing between scrapes.
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], dict[tuple, float]],
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for labelvalues, value in self.collect().items():
+            yield f"{self.name}{format_labels(self.labelnames, labelvalues)} {value}"
+
+
+class Gauge(CollectedMetric):
+    type = "gauge"
+
+
+class CollectedCounter(CollectedMetric):
+    # For monotonic totals a component already keeps, so that rate() works.
+    type = "counter"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric | CollectedMetric] = {}
+
+    def register(self, metric: Metric | CollectedMetric) -> Metric | CollectedMetric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], dict[tuple, float]],
+    ) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, collect))
+
+    def collected_counter(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], dict[tuple, float]],
+    ) -> CollectedCounter:
+        return self.register(CollectedCounter(name, help, labelnames, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route and status.",
+    ["method", "route", "status"],
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["method", "route"],
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Database query latency by statement.", ["statement"]
+)
+background_task_duration = registry.histogram(
+    "background_task_duration_seconds", "Background task run time.", ["task"]
+)
+b2_upload_bytes = registry.counter(
+    "b2_upload_bytes_total", "Bytes streamed to B2 by outcome.", ["outcome"]
+)
+b2_upload_duration = registry.histogram(
+    "b2_upload_duration_seconds",
+    "Time to stream an upload to B2.",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+@contextlib.contextmanager
+def timed(histogram: Histogram, *labelvalues):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labelvalues).observe(time.perf_counter() - started_at)
+
+
+def observe_query(query, statement: str, seconds: float, failed: bool) -> None:
+    db_query_duration.labels(statement).observe(seconds)
+
+
+query_listeners.append(observe_query)
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template rather than path to bound cardinality.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.labels(method, route).observe(
+                time.perf_counter() - started_at
+            )
+            http_requests.labels(method, route, str(status_code)).inc()
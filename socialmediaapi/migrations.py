@@ -0,0 +1,363 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+import sqlalchemy
+from sqlalchemy.schema import CreateIndex
+
+from socialmediaapi.database import (
+    comments_table,
+    email_outbox_table,
+    follows_table,
+    job_state_table,
+    likes_table,
+    metadata,
+    post_table,
+    timeline_table,
+    uploads_table,
+    users_table,
+)
+from socialmediaapi.search import SEARCH_CONFIG, SEARCHABLE_TABLES
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_ID = 8_120_431
+
+UNIQUE_LIKES_ATTEMPTS = 3
+
+SEARCH_BACKFILL_BATCH_SIZE = 5_000
+
+migrations_table = sqlalchemy.Table(
+    "schema_migrations",
+    sqlalchemy.MetaData(),
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("name", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column(
+        "applied_at",
+        sqlalchemy.DateTime(timezone=True),
+        nullable=False,
+        server_default=sqlalchemy.func.now(),
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[sqlalchemy.Engine], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, name, func))
+        return func
+
+    return decorator
+
+
+def is_postgres(engine: sqlalchemy.Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def get_index(name: str) -> sqlalchemy.Index:
+    for table in metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(name)
+
+
+def column_names(engine: sqlalchemy.Engine, table: str) -> set[str]:
+    return {c["name"] for c in sqlalchemy.inspect(engine).get_columns(table)}
+
+
+def create_index_online(engine: sqlalchemy.Engine, index: sqlalchemy.Index) -> None:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    run_index_ddl(engine, index.name, ddl)
+
+
+def run_index_ddl(engine: sqlalchemy.Engine, name: str, ddl: str) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if is_postgres(engine):
+            # An interrupted CONCURRENTLY build leaves an INVALID index behind
+            # that IF NOT EXISTS would happily skip, so drop it and start over.
+            invalid = conn.execute(
+                sqlalchemy.text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+                    " WHERE c.relname = :name AND NOT i.indisvalid"
+                ),
+                {"name": name},
+            ).first()
+            if invalid:
+                conn.execute(
+                    sqlalchemy.text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                )
+            ddl = re.sub(
+                r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl
+            )
+
+        logger.info(f"Creating index {name}")
+        logger.debug(ddl)
+        conn.execute(sqlalchemy.text(ddl))
+
+
+@migration(1, "initial_schema")
+def initial_schema(engine: sqlalchemy.Engine) -> None:
+    with engine.begin() as conn:
+        metadata.create_all(
+            conn, tables=[users_table, post_table, comments_table, likes_table]
+        )
+
+
+@migration(2, "posts_like_count")
+def posts_like_count(engine: sqlalchemy.Engine) -> None:
+    if "like_count" not in column_names(engine, "posts"):
+        with engine.begin() as conn:
+            conn.execute(
+                sqlalchemy.text(
+                    "ALTER TABLE posts"
+                    " ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+            conn.execute(
+                sqlalchemy.text(
+                    "UPDATE posts SET like_count ="
+                    " (SELECT count(*) FROM likes WHERE likes.post_id = posts.id)"
+                )
+            )
+    create_index_online(engine, get_index("ix_posts_like_count_id"))
+
+
+def remove_duplicate_likes(engine: sqlalchemy.Engine) -> None:
+    with engine.begin() as conn:
+        result = conn.execute(
+            sqlalchemy.text(
+                "DELETE FROM likes WHERE id NOT IN"
+                " (SELECT min(id) FROM likes GROUP BY post_id, user_id)"
+            )
+        )
+        if result.rowcount:
+            logger.info(f"Removed {result.rowcount} duplicate likes")
+            conn.execute(
+                sqlalchemy.text(
+                    "UPDATE posts SET like_count ="
+                    " (SELECT count(*) FROM likes WHERE likes.post_id = posts.id)"
+                )
+            )
+
+
+@migration(3, "dedupe_likes")
+def dedupe_likes(engine: sqlalchemy.Engine) -> None:
+    remove_duplicate_likes(engine)
+
+
+@migration(4, "secondary_indexes")
+def secondary_indexes(engine: sqlalchemy.Engine) -> None:
+    for name in ("ix_posts_user_id_id", "ix_comments_post_id_id", "ix_likes_user_id"):
+        create_index_online(engine, get_index(name))
+
+    # Servers still running the old like_post can insert duplicates after
+    # migration 3, so they are removed again right before every attempt at
+    # the unique index, including the one a re-run makes after a failure.
+    for attempt in range(1, UNIQUE_LIKES_ATTEMPTS + 1):
+        remove_duplicate_likes(engine)
+        try:
+            create_index_online(engine, get_index("uq_likes_post_id_user_id"))
+            return
+        except sqlalchemy.exc.IntegrityError:
+            if attempt == UNIQUE_LIKES_ATTEMPTS:
+                raise
+            logger.warning("Duplicate likes appeared during the unique index build")
+
+
+@migration(5, "uploads")
+def uploads(engine: sqlalchemy.Engine) -> None:
+    with engine.begin() as conn:
+        uploads_table.create(conn, checkfirst=True)
+
+
+@migration(6, "email_outbox")
+def email_outbox(engine: sqlalchemy.Engine) -> None:
+    with engine.begin() as conn:
+        email_outbox_table.create(conn, checkfirst=True)
+
+
+@migration(7, "search_index")
+def search_index(engine: sqlalchemy.Engine) -> None:
+    for kind, fts in SEARCHABLE_TABLES.items():
+        if is_postgres(engine):
+            run_index_ddl(
+                engine,
+                f"ix_{kind}_body_search",
+                f"CREATE INDEX IF NOT EXISTS ix_{kind}_body_search ON {kind}"
+                f" USING GIN (to_tsvector('{SEARCH_CONFIG}', body))",
+            )
+            continue
+        # External-content FTS5 table: it stores only the index and reads
+        # bodies from the base table by rowid.
+        with engine.begin() as conn:
+            conn.execute(
+                sqlalchemy.text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING"
+                    f" fts5(body, content='{kind}', content_rowid='id')"
+                )
+            )
+            conn.execute(
+                sqlalchemy.text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            )
+
+
+@migration(8, "follows_and_timelines")
+def follows_and_timelines(engine: sqlalchemy.Engine) -> None:
+    columns = column_names(engine, "users")
+    with engine.begin() as conn:
+        if "follower_count" not in columns:
+            conn.execute(
+                sqlalchemy.text(
+                    "ALTER TABLE users"
+                    " ADD COLUMN follower_count INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+        if "fanout_on_read" not in columns:
+            conn.execute(
+                sqlalchemy.text(
+                    "ALTER TABLE users"
+                    " ADD COLUMN fanout_on_read BOOLEAN NOT NULL DEFAULT false"
+                )
+            )
+        follows_table.create(conn, checkfirst=True)
+        timeline_table.create(conn, checkfirst=True)
+
+
+@migration(9, "post_scores")
+def post_scores(engine: sqlalchemy.Engine) -> None:
+    # Existing posts keep a NULL created_at and rank as old ones. Their hot
+    # scores are filled in by the first score run, which starts from the
+    # first like.
+    columns = column_names(engine, "posts")
+    with engine.begin() as conn:
+        for name, ddl in (
+            ("created_at", "TIMESTAMP WITH TIME ZONE"),
+            ("hot_score", "FLOAT NOT NULL DEFAULT 0"),
+            ("top_24h_likes", "INTEGER"),
+        ):
+            if name not in columns:
+                conn.execute(
+                    sqlalchemy.text(f"ALTER TABLE posts ADD COLUMN {name} {ddl}")
+                )
+        job_state_table.create(conn, checkfirst=True)
+    for name in (
+        "ix_posts_hot_score_id",
+        "ix_posts_top_24h_likes_id",
+        "ix_posts_top_24h_created_at",
+    ):
+        create_index_online(engine, get_index(name))
+
+
+def backfill_search_documents(engine: sqlalchemy.Engine, kind: str) -> None:
+    # One short transaction per batch of ids, so that no lock is held on more
+    # than a batch of rows at a time.
+    batch = sqlalchemy.text(
+        f"SELECT max(id) FROM (SELECT id FROM {kind} WHERE id > :after"
+        " ORDER BY id LIMIT :limit) AS batch"
+    )
+    fill = sqlalchemy.text(
+        f"UPDATE {kind} SET body_tsv = to_tsvector('{SEARCH_CONFIG}',"
+        " coalesce(body, '')) WHERE id > :after AND id <= :last"
+        " AND body_tsv IS NULL"
+    )
+    after = 0
+    while True:
+        with engine.begin() as conn:
+            last = conn.execute(
+                batch, {"after": after, "limit": SEARCH_BACKFILL_BATCH_SIZE}
+            ).scalar()
+            if last is None:
+                return
+            conn.execute(fill, {"after": after, "last": last})
+        logger.info(f"Backfilled search documents of {kind} up to id {last}")
+        after = last
+
+
+@migration(10, "search_tsvector")
+def search_tsvector(engine: sqlalchemy.Engine) -> None:
+    # ts_rank cannot read a document out of the expression index from
+    # migration 7, so ranking re-parsed the body of every match. body_tsv
+    # keeps the parsed document on the row instead. It is added as a plain
+    # nullable column, which does not rewrite the table, and a trigger fills
+    # it on every write before the existing rows are backfilled in batches.
+    # SQLite keeps its FTS5 tables.
+    if not is_postgres(engine):
+        return
+    for kind in SEARCHABLE_TABLES:
+        with engine.begin() as conn:
+            conn.execute(
+                sqlalchemy.text(
+                    f"ALTER TABLE {kind} ADD COLUMN IF NOT EXISTS body_tsv tsvector"
+                )
+            )
+            conn.execute(
+                sqlalchemy.text(f"DROP TRIGGER IF EXISTS {kind}_body_tsv ON {kind}")
+            )
+            conn.execute(
+                sqlalchemy.text(
+                    f"CREATE TRIGGER {kind}_body_tsv"
+                    f" BEFORE INSERT OR UPDATE OF body ON {kind} FOR EACH ROW"
+                    " EXECUTE FUNCTION tsvector_update_trigger(body_tsv,"
+                    f" 'pg_catalog.{SEARCH_CONFIG}', body)"
+                )
+            )
+        backfill_search_documents(engine, kind)
+        run_index_ddl(
+            engine,
+            f"ix_{kind}_body_tsv",
+            f"CREATE INDEX IF NOT EXISTS ix_{kind}_body_tsv ON {kind}"
+            " USING GIN (body_tsv)",
+        )
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(
+                sqlalchemy.text(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS ix_{kind}_body_search"
+                )
+            )
+
+
+def applied_versions(engine: sqlalchemy.Engine) -> set[int]:
+    with engine.begin() as conn:
+        migrations_table.create(conn, checkfirst=True)
+        query = sqlalchemy.select(migrations_table.c.version)
+        return {row.version for row in conn.execute(query)}
+
+
+def migrate(engine: sqlalchemy.Engine) -> list[int]:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        if is_postgres(engine):
+            lock.execute(
+                sqlalchemy.text("SELECT pg_advisory_lock(:id)"),
+                {"id": MIGRATION_LOCK_ID},
+            )
+        try:
+            applied = applied_versions(engine)
+            pending = sorted(
+                (m for m in MIGRATIONS if m.version not in applied),
+                key=lambda m: m.version,
+            )
+            for m in pending:
+                logger.info(f"Applying migration {m.version} {m.name}")
+                m.upgrade(engine)
+                with engine.begin() as conn:
+                    conn.execute(
+                        migrations_table.insert().values(version=m.version, name=m.name)
+                    )
+            return [m.version for m in pending]
+        finally:
+            if is_postgres(engine):
+                lock.execute(
+                    sqlalchemy.text("SELECT pg_advisory_unlock(:id)"),
+                    {"id": MIGRATION_LOCK_ID},
+                )
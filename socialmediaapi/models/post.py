@@ -1,5 +1,9 @@
+from typing import Generic, TypeVar
+
 from pydantic import BaseModel, ConfigDict
 
+T = TypeVar("T")
+
 
 class UserPostIn(BaseModel):
     body: str
@@ -39,3 +43,9 @@ class PostLikeIn(BaseModel):
 class PostLike(PostLikeIn):
     id: int
     user_id: int
+
+
+class BatchItemResult(BaseModel, Generic[T]):
+    status_code: int
+    item: T | None = None
+    detail: str | None = None
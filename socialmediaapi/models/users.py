@@ -9,3 +9,12 @@ class User(BaseModel):
 
 class UserIn(User):
     password: str
+
+
+class FollowIn(BaseModel):
+    followee_id: int
+
+
+class Follow(FollowIn):
+    id: int
+    follower_id: int
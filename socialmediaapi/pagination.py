@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(**values) -> str:
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, kind: str, **fields: type | tuple[type, ...]) -> dict:
+    # fields maps every key the caller reads to its expected type(s), so a
+    # cursor that decodes but was not issued by us is a 400 rather than a 500.
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise invalid_cursor_exception() from e
+
+    if not isinstance(values, dict) or values.get("k") != kind:
+        raise invalid_cursor_exception()
+    for name, types in fields.items():
+        value = values.get(name)
+        # bool is an int subclass, but never a valid cursor value.
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise invalid_cursor_exception()
+    return values
+
+
+def invalid_cursor_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor"
+    )
@@ -0,0 +1,109 @@
+import contextvars
+import logging
+from collections import Counter
+
+from asgi_correlation_id import correlation_id
+from starlette.datastructures import MutableHeaders
+
+from socialmediaapi.config import config
+from socialmediaapi.db_pool import query_listeners
+
+logger = logging.getLogger(__name__)
+
+
+def compiled_sql(query) -> str:
+    # Bind parameters stay as placeholders, so the text doubles as the
+    # statement shape and never carries user data into the logs.
+    return " ".join(str(query).split())
+
+
+class QueryProfile:
+    def __init__(self) -> None:
+        self.request_id = correlation_id.get()
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.finished = False
+
+    def record(self, query, seconds: float) -> None:
+        if self.finished:
+            return
+        self.queries += 1
+        self.seconds += seconds
+        self.shapes[compiled_sql(query)] += 1
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.3f};desc="{self.queries} queries"'
+
+    def report(self, request: str, max_queries: int, repeat_threshold: int) -> None:
+        if self.queries > max_queries:
+            logger.warning(
+                f"{request} ran {self.queries} queries in "
+                f"{self.seconds * 1000:.1f}ms (request {self.request_id})"
+            )
+        for shape, count in self.shapes.items():
+            if count >= repeat_threshold:
+                logger.warning(
+                    f"{request} ran the same statement {count} times, possible "
+                    f"N+1 (request {self.request_id}): {shape}"
+                )
+
+
+current_profile: contextvars.ContextVar[QueryProfile | None] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def profile_query(query, statement: str, seconds: float, failed: bool) -> None:
+    if (profile := current_profile.get()) is not None:
+        profile.record(query, seconds)
+
+
+def log_slow_query(query, statement: str, seconds: float, failed: bool) -> None:
+    if config.SLOW_QUERY_SECONDS and seconds >= config.SLOW_QUERY_SECONDS:
+        logger.warning(
+            f"Slow query {statement} took {seconds * 1000:.1f}ms: "
+            f"{compiled_sql(query)}"
+        )
+
+
+if config.QUERY_PROFILER_ENABLED:
+    query_listeners.append(profile_query)
+query_listeners.append(log_slow_query)
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, app, max_queries: int, repeat_threshold: int) -> None:
+        self.app = app
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+            # Background tasks run after the last body chunk, still inside
+            # this call and context; their queries are not the request's.
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                profile.finished = True
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            profile.report(
+                f"{scope['method']} {scope['path']}",
+                self.max_queries,
+                self.repeat_threshold,
+            )
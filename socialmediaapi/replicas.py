@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import sqlite3
+import time
+
+import asyncpg
+import databases
+
+from socialmediaapi.db_pool import PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ERRORS = (
+    OSError,
+    TimeoutError,
+    PoolTimeoutError,
+    sqlite3.OperationalError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.exceptions.OperatorInterventionError,
+)
+
+# Reads within one request stick to the replica they started on, so queries
+# that are meant to agree (an ETag version and the page it labels) do not
+# straddle replicas with different lag.
+pinned_replica: contextvars.ContextVar[databases.Database | None] = (
+    contextvars.ContextVar("pinned_replica", default=None)
+)
+
+
+class ReadRouter:
+    def __init__(
+        self,
+        primary: databases.Database,
+        replicas: list[databases.Database],
+        retry_after: float,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+    ) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.replica_cache_ttl = cache_ttl
+        self._rotation = itertools.cycle(range(len(replicas)))
+        self._down_until = [0.0] * len(replicas)
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.failovers = 0
+
+    async def connect(self) -> None:
+        for index, replica in enumerate(self.replicas):
+            try:
+                await replica.connect()
+            except REPLICA_ERRORS:
+                logger.exception(f"Could not connect to read replica {index}")
+                self._mark_down(index)
+
+    async def disconnect(self) -> None:
+        for replica in self.replicas:
+            if replica.is_connected:
+                await replica.disconnect()
+
+    def _mark_down(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_after
+
+    def _candidates(self) -> list[int]:
+        now = time.monotonic()
+        healthy = [
+            index
+            for index in range(len(self.replicas))
+            if self._down_until[index] <= now
+        ]
+        if not healthy:
+            return []
+        pinned = pinned_replica.get()
+        if pinned in self.replicas and self.replicas.index(pinned) in healthy:
+            first = self.replicas.index(pinned)
+        else:
+            first = next(self._rotation)
+            while first not in healthy:
+                first = next(self._rotation)
+        return [first] + [index for index in healthy if index != first]
+
+    async def _read(self, method: str, query):
+        for index in self._candidates():
+            replica = self.replicas[index]
+            try:
+                if not replica.is_connected:
+                    await replica.connect()
+                result = await asyncio.wait_for(
+                    getattr(replica, method)(query), self.timeout
+                )
+            except REPLICA_ERRORS as e:
+                logger.warning(f"Read replica {index} failed, failing over: {e!r}")
+                self._mark_down(index)
+                self.failovers += 1
+                continue
+            pinned_replica.set(replica)
+            self.replica_reads += 1
+            return result
+
+        self.primary_reads += 1
+        return await getattr(self.primary, method)(query)
+
+    def cache_ttl(self, ttl: float) -> float:
+        # A response read from a lagging replica right after a write would
+        # otherwise stay cached under the generation that write created.
+        if pinned_replica.get() is None or self.replica_cache_ttl is None:
+            return ttl
+        return min(ttl, self.replica_cache_ttl)
+
+    async def fetch_all(self, query):
+        return await self._read("fetch_all", query)
+
+    async def fetch_one(self, query):
+        return await self._read("fetch_one", query)
+
+    async def fetch_val(self, query):
+        return await self._read("fetch_val", query)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(until <= now for until in self._down_until),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "failovers": self.failovers,
+        }
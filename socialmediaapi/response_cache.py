@@ -0,0 +1,181 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+
+from socialmediaapi.cache import TTLCache
+from socialmediaapi.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int, max_bytes: int, ttl: float) -> None:
+        self.entries = TTLCache(maxsize, ttl, max_bytes=max_bytes)
+        # Generations are only dropped once they expire, never to make room:
+        # a bump expires ttl after the last entry cached under the previous
+        # generation could have been, so a missing generation reading as 0
+        # cannot revive stale entries. Bumps draw from one counter, so a
+        # generation that comes back never reuses an old number. Ordered by
+        # last bump, expired generations are purged from the front.
+        self.ttl = ttl
+        self.generations: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self.bumps = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value, ttl)
+
+    async def generation(self, name: str) -> int:
+        expires_at, generation = self.generations.get(name, (0.0, 0))
+        return generation if expires_at > time.monotonic() else 0
+
+    async def bump(self, name: str) -> None:
+        now = time.monotonic()
+        while self.generations:
+            expires_at, _ = next(iter(self.generations.values()))
+            if expires_at > now:
+                break
+            self.generations.popitem(last=False)
+        self.bumps += 1
+        self.generations.pop(name, None)
+        self.generations[name] = (now + self.ttl, self.bumps)
+
+    async def clear(self) -> None:
+        self.entries.clear()
+        self.generations.clear()
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            **self.entries.stats(),
+            "generations": len(self.generations),
+        }
+
+
+class RedisCacheBackend:
+    # Shares entries and generations between workers. Entries expire through
+    # Redis TTLs and memory is bounded by the server's maxmemory policy.
+    def __init__(self, url: str, prefix: str = "socialmediaapi:") -> None:
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self.redis.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.redis.set(self.prefix + key, value, px=math.ceil(ttl * 1000))
+
+    async def generation(self, name: str) -> int:
+        return int(await self.redis.get(f"{self.prefix}gen:{name}") or 0)
+
+    async def bump(self, name: str) -> None:
+        await self.redis.incr(f"{self.prefix}gen:{name}")
+
+    async def clear(self) -> None:
+        async for key in self.redis.scan_iter(match=f"{self.prefix}*"):
+            await self.redis.delete(key)
+
+    async def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        memory = await self.redis.info("memory")
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes": memory.get("used_memory"),
+        }
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float, like_staleness: float) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.like_staleness = like_staleness
+
+    @property
+    def feed_ttl(self) -> float:
+        # Likes only invalidate the feed when no staleness is allowed, otherwise
+        # feed pages expire quickly enough for like counts to catch up.
+        if self.like_staleness > 0:
+            return min(self.ttl, self.like_staleness)
+        return self.ttl
+
+    async def feed_key(self, *parts) -> str:
+        generation = await self.backend.generation("feed")
+        return ":".join(map(str, ("feed", generation, *parts)))
+
+    async def post_key(self, post_id: int, *parts) -> str:
+        generation = await self.backend.generation(f"post:{post_id}")
+        return ":".join(map(str, ("post", post_id, generation, *parts)))
+
+    async def get(self, key: str) -> Response | None:
+        value = await self.backend.get(key)
+        if value is None:
+            return None
+        headers, body = value.split(b"\n", 1)
+        return Response(
+            body, media_type="application/json", headers=json.loads(headers)
+        )
+
+    async def set(
+        self, key: str, body: bytes, headers: dict, ttl: float | None = None
+    ) -> Response:
+        value = json.dumps(headers).encode() + b"\n" + body
+        await self.backend.set(key, value, self.ttl if ttl is None else ttl)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def post_created(self) -> None:
+        await self.backend.bump("feed")
+
+    async def comment_created(self, *post_ids: int) -> None:
+        for post_id in post_ids:
+            await self.backend.bump(f"post:{post_id}")
+
+    async def post_liked(self, *post_ids: int) -> None:
+        for post_id in post_ids:
+            await self.backend.bump(f"post:{post_id}")
+        if post_ids and self.like_staleness <= 0:
+            await self.backend.bump("feed")
+
+    async def scores_updated(self) -> None:
+        await self.backend.bump("feed")
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    async def stats(self) -> dict:
+        return await self.backend.stats()
+
+
+def create_backend():
+    if config.RESPONSE_CACHE_BACKEND == "redis":
+        logger.debug("Using Redis response cache")
+        return RedisCacheBackend(config.RESPONSE_CACHE_REDIS_URL)
+    return MemoryCacheBackend(
+        config.RESPONSE_CACHE_MAX_ENTRIES,
+        config.RESPONSE_CACHE_MAX_BYTES,
+        config.RESPONSE_CACHE_TTL_SECONDS,
+    )
+
+
+response_cache = ResponseCache(
+    create_backend(),
+    config.RESPONSE_CACHE_TTL_SECONDS,
+    config.RESPONSE_CACHE_LIKE_STALENESS_SECONDS,
+)
@@ -0,0 +1,36 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from socialmediaapi.export import export_ndjson, export_watermark
+from socialmediaapi.models.users import User
+from socialmediaapi.security import get_current_user
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export(
+    current_user: Annotated[User, Depends(get_current_user)],
+    since_post_id: Annotated[int, Query(ge=0)] = 0,
+    since_comment_id: Annotated[int, Query(ge=0)] = 0,
+    since_like_id: Annotated[int, Query(ge=0)] = 0,
+):
+    logger.info("Exporting posts, comments and likes")
+    since = {"post": since_post_id, "comment": since_comment_id, "like": since_like_id}
+    # Taken before the response starts so that a timeout can still be reported.
+    try:
+        watermark = await export_watermark()
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Writes in progress did not finish, please retry.",
+            headers={"Retry-After": "1"},
+        )
+    return StreamingResponse(
+        export_ndjson(since, watermark=watermark), media_type="application/x-ndjson"
+    )
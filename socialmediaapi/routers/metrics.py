@@ -0,0 +1,69 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from socialmediaapi.database import database
+from socialmediaapi.libs.b2 import b2_executor
+from socialmediaapi.logging_conf import log_queues
+from socialmediaapi.mailer import mail_dispatcher
+from socialmediaapi.metrics import registry
+from socialmediaapi.security import password_hasher
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+executors = {"password_hashing": password_hasher, "b2_upload": b2_executor}
+
+registry.gauge(
+    "db_pool_connections",
+    "Database pool connections by state.",
+    ["state"],
+    lambda: {
+        (state,): database.pool_stats()[state]
+        for state in ("in_use", "idle", "waiters")
+    },
+)
+registry.collected_counter(
+    "db_pool_acquire_timeouts_total",
+    "Connection acquires that timed out.",
+    [],
+    lambda: {(): database.pool_stats()["timeouts"]},
+)
+registry.gauge(
+    "executor_tasks",
+    "Thread pool tasks by pool and state.",
+    ["pool", "state"],
+    lambda: {
+        (name, state): executor.stats()[state]
+        for name, executor in executors.items()
+        for state in ("active", "queued")
+    },
+)
+registry.collected_counter(
+    "executor_tasks_rejected_total",
+    "Thread pool tasks rejected by a full queue.",
+    ["pool"],
+    lambda: {
+        (name,): executor.stats()["rejected"] for name, executor in executors.items()
+    },
+)
+registry.collected_counter(
+    "mail_outbox_messages_total",
+    "Outbox messages handled by the in-process dispatcher.",
+    ["outcome"],
+    lambda: {
+        (outcome,): mail_dispatcher.stats()[outcome]
+        for outcome in ("sent", "retried", "failed")
+    },
+)
+registry.collected_counter(
+    "log_records_dropped_total",
+    "Log records dropped by a full log queue.",
+    ["logger"],
+    lambda: {(name,): handler.dropped for name, handler in log_queues.items()},
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -2,16 +2,31 @@ import logging
 from enum import Enum
 from typing import Annotated
 
+import orjson
 import sqlalchemy
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 
+from socialmediaapi.conditional import etag_matches, make_etag, not_modified
 from socialmediaapi.database import (
     comments_table,
     database,
+    insert_ignoring_conflicts,
+    job_state_table,
     likes_table,
     post_table,
+    read_database,
 )
 from socialmediaapi.models.post import (
+    BatchItemResult,
     Comment,
     CommentInt,
     PostLike,
@@ -22,64 +37,292 @@ from socialmediaapi.models.post import (
     UserPostWithLikes,
 )
 from socialmediaapi.models.users import User
+from socialmediaapi.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from socialmediaapi.response_cache import response_cache
+from socialmediaapi.scores import SCORES_JOB, new_post_scores, utcnow
+from socialmediaapi.search import index_documents
 from socialmediaapi.security import get_current_user
 from socialmediaapi.utils import log
 
-select_post_and_likes = (
-    sqlalchemy.select(
-        post_table, sqlalchemy.func.count(likes_table.c.id).label("likes")
-    )
-    .select_from(post_table.outerjoin(likes_table))
-    .group_by(post_table.c.id)
+select_post_and_likes = sqlalchemy.select(
+    post_table.c.id,
+    post_table.c.body,
+    post_table.c.user_id,
+    post_table.c.like_count.label("likes"),
 )
 
+# Plain str keys: orjson rejects str subclasses such as quoted_name.
+FEED_FIELDS = tuple(map(str, select_post_and_likes.selected_columns.keys()))
+COMMENT_FIELDS = tuple(map(str, comments_table.columns.keys()))
+
+MAX_BATCH_SIZE = 100
+
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
 
+@log(logger, level=logging.DEBUG)
 async def find_post(post_id: int):
-    query = post_table.select().where(post_table.c.id == post_id)
+    # Replicas may lag behind, so a post they do not know about yet is looked
+    # up again on the primary before it is reported missing.
+    query = (
+        post_table.select()
+        .where(post_table.c.id == post_id)
+        .execution_options(name="find_post")
+    )
+    logger.debug(query)
+    return await read_database.fetch_one(query) or await database.fetch_one(query)
+
+
+# Posts and likes are append-only, so their highest ids change whenever the
+# feed does. Hot and top_24h orders also change when a score run does, which
+# bumps the job's version. Selected alongside a feed page so that a cache miss
+# labels the page in the same round trip.
+FEED_VERSION_COLUMNS = (
+    sqlalchemy.select(sqlalchemy.func.max(post_table.c.id))
+    .scalar_subquery()
+    .label("version_post_id"),
+    sqlalchemy.select(sqlalchemy.func.max(likes_table.c.id))
+    .scalar_subquery()
+    .label("version_like_id"),
+    sqlalchemy.select(job_state_table.c.version)
+    .where(job_state_table.c.name == SCORES_JOB)
+    .scalar_subquery()
+    .label("version_scores"),
+)
+
+
+def version_of(row) -> tuple:
+    return row.version_post_id, row.version_like_id, row.version_scores
+
+
+async def feed_version() -> tuple:
+    query = sqlalchemy.select(*FEED_VERSION_COLUMNS).execution_options(
+        name="feed_version"
+    )
+    logger.debug(query)
+    return version_of(await read_database.fetch_one(query))
+
+
+def last_comment_id(post_id: int) -> sqlalchemy.ScalarSelect:
+    return (
+        sqlalchemy.select(sqlalchemy.func.max(comments_table.c.id))
+        .where(comments_table.c.post_id == post_id)
+        .scalar_subquery()
+    )
+
+
+async def post_version(post_id: int) -> tuple:
+    # Like find_post, a post missing from a lagging replica is looked up on
+    # the primary. The database that knew it is returned with the version so
+    # that the rest of the request reads the state the version describes.
+    query = (
+        sqlalchemy.select(
+            post_table.c.like_count,
+            last_comment_id(post_id).label("last_comment_id"),
+        )
+        .where(post_table.c.id == post_id)
+        .execution_options(name="post_version")
+    )
+    logger.debug(query)
+    if version := await read_database.fetch_one(query):
+        return version, read_database
+    return await database.fetch_one(query), database
+
+
+async def find_existing_post_ids(post_ids) -> set[int]:
+    post_ids = set(post_ids)
+    query = sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+    logger.debug(query)
+    existing = {row.id for row in await read_database.fetch_all(query)}
+    if missing := post_ids - existing:
+        query = sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(missing))
+        existing |= {row.id for row in await database.fetch_all(query)}
+    return existing
+
+
+async def insert_returning_ids(table, rows: list[dict]) -> list[int]:
+    # A multi-row INSERT assigns ids in VALUES order, but RETURNING does not
+    # promise to report them in that order, hence the sort.
+    query = table.insert().values(rows).returning(table.c.id)
     logger.debug(query)
-    return await database.fetch_one(query)
+    return sorted(row.id for row in await database.fetch_all(query))
+
+
+def encode_rows(rows, fields: tuple[str, ...]) -> bytes:
+    # The selected columns already match the response model, so rows are
+    # encoded without FastAPI's per-row validation pass. Values are read from
+    # the driver row directly, skipping the per-column type lookup that
+    # Record attribute access does; the columns involved are ints and text.
+    return orjson.dumps([dict(zip(fields, row._mapping)) for row in rows])
+
+
+def post_not_found_result(post_id: int) -> dict:
+    return {
+        "status_code": status.HTTP_404_NOT_FOUND,
+        "detail": f"Post with id {post_id} not found",
+    }
 
 
 class PostSorting(str, Enum):
     new = "new"
     old = "old"
     most_likes = "most_likes"
+    hot = "hot"
+    top_24h = "top_24h"
+
+
+# Sort key of the score-based orders, selected after the feed columns so
+# encode_rows leaves it out of the response.
+SCORE_COLUMNS = {
+    PostSorting.hot: post_table.c.hot_score,
+    PostSorting.top_24h: post_table.c.top_24h_likes,
+}
+
+# Keys each sorting reads back from its cursor, with their types.
+CURSOR_FIELDS = {
+    PostSorting.new: {"id": int},
+    PostSorting.old: {"id": int},
+    PostSorting.most_likes: {"id": int, "likes": int},
+    PostSorting.hot: {"id": int, "score": (int, float)},
+    PostSorting.top_24h: {"id": int, "score": int},
+}
 
 
 @router.get("/post", response_model=list[UserPostWithLikes])
 @log(logger)
-async def get_all_posts(sorting: PostSorting = PostSorting.new):
+async def get_all_posts(
+    request: Request,
+    sorting: PostSorting = PostSorting.new,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
     logger.info("get_all_posts()")
 
+    cache_key = await response_cache.feed_key(sorting.value, cursor, limit)
+    if cached := await response_cache.get(cache_key):
+        if etag_matches(request, cached.headers.get("etag")):
+            return not_modified(cached.headers["etag"])
+        return cached
+
+    # A miss reads the version with the page. Only a conditional request pays
+    # for a separate version query, which can spare it the page.
+    if request.headers.get("if-none-match"):
+        etag = make_etag("feed", sorting.value, cursor, limit, *await feed_version())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    score = SCORE_COLUMNS.get(sorting)
     if sorting == PostSorting.new:
         query = select_post_and_likes.order_by(post_table.c.id.desc())
     elif sorting == PostSorting.old:
         query = select_post_and_likes.order_by(post_table.c.id.asc())
     elif sorting == PostSorting.most_likes:
-        query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+        query = select_post_and_likes.order_by(
+            post_table.c.like_count.desc(), post_table.c.id.desc()
+        )
+    elif score is not None:
+        query = (
+            select_post_and_likes.add_columns(score.label("score"))
+            .where(score.isnot(None))
+            .order_by(score.desc(), post_table.c.id.desc())
+        )
+
+    if cursor:
+        after = decode_cursor(cursor, sorting.value, **CURSOR_FIELDS[sorting])
+        if sorting == PostSorting.new:
+            query = query.where(post_table.c.id < after["id"])
+        elif sorting == PostSorting.old:
+            query = query.where(post_table.c.id > after["id"])
+        elif sorting == PostSorting.most_likes:
+            query = query.where(
+                sqlalchemy.or_(
+                    post_table.c.like_count < after["likes"],
+                    sqlalchemy.and_(
+                        post_table.c.like_count == after["likes"],
+                        post_table.c.id < after["id"],
+                    ),
+                )
+            )
+        elif score is not None:
+            query = query.where(
+                sqlalchemy.or_(
+                    score < after["score"],
+                    sqlalchemy.and_(
+                        score == after["score"], post_table.c.id < after["id"]
+                    ),
+                )
+            )
 
+    query = (
+        query.add_columns(*FEED_VERSION_COLUMNS)
+        .limit(limit + 1)
+        .execution_options(name="feed")
+    )
     logger.debug(query)
 
-    return await database.fetch_all(query)
+    posts = await read_database.fetch_all(query)
+    version = version_of(posts[0]) if posts else await feed_version()
+    headers = {"ETag": make_etag("feed", sorting.value, cursor, limit, *version)}
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        sort_key = {"score": last.score} if score is not None else {}
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            k=sorting.value, id=last.id, likes=last.likes, **sort_key
+        )
+
+    body = encode_rows(posts, FEED_FIELDS)
+    return await response_cache.set(
+        cache_key, body, headers, ttl=read_database.cache_ttl(response_cache.feed_ttl)
+    )
 
 
 @router.post("/post", response_model=UserPost, status_code=201)
 async def create_post(
-    post: UserPostIn, current_user: Annotated[User, Depends(get_current_user)]
+    post: UserPostIn,
+    current_user: Annotated[User, Depends(get_current_user)],
 ):
     logger.info("Creating post")
 
     data = {**post.model_dump(), "user_id": current_user.id}
-    query = post_table.insert().values(data)
+    query = (
+        post_table.insert()
+        .values(**data, **new_post_scores(utcnow()))
+        .execution_options(name="insert_post")
+    )
     logger.debug(query)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await index_documents("posts", [{**data, "id": last_record_id}])
+    await response_cache.post_created()
     return {**data, "id": last_record_id}
 
 
+@router.post("/post/batch", response_model=list[BatchItemResult[UserPost]])
+async def create_posts_batch(
+    posts: Annotated[list[UserPostIn], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    logger.info(f"Creating {len(posts)} posts")
+
+    rows = [{**post.model_dump(), "user_id": current_user.id} for post in posts]
+    async with database.transaction():
+        scores = new_post_scores(utcnow())
+        ids = await insert_returning_ids(
+            post_table, [{**row, **scores} for row in rows]
+        )
+        await index_documents(
+            "posts", [{**row, "id": id} for row, id in zip(rows, ids)]
+        )
+    await response_cache.post_created()
+    return [
+        {"status_code": status.HTTP_201_CREATED, "item": {**row, "id": id}}
+        for row, id in zip(rows, ids)
+    ]
+
+
 @router.post("/comment", response_model=Comment, status_code=201)
 async def create_comment(
     comment: CommentInt,
@@ -93,37 +336,184 @@ async def create_comment(
         )
 
     data = {**comment.model_dump(), "user_id": current_user.id}
-    query = comments_table.insert().values(data)
+    query = (
+        comments_table.insert().values(data).execution_options(name="insert_comment")
+    )
     logger.debug(query)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await index_documents("comments", [{**data, "id": last_record_id}])
+    await response_cache.comment_created(comment.post_id)
     return {**data, "id": last_record_id}
 
 
+@router.post("/comment/batch", response_model=list[BatchItemResult[Comment]])
+async def create_comments_batch(
+    comments: Annotated[
+        list[CommentInt], Body(min_length=1, max_length=MAX_BATCH_SIZE)
+    ],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    logger.debug(f"Creating {len(comments)} comments.")
+    existing_post_ids = await find_existing_post_ids(c.post_id for c in comments)
+
+    results: list[dict | None] = [None] * len(comments)
+    positions, rows = [], []
+    for position, comment in enumerate(comments):
+        if comment.post_id not in existing_post_ids:
+            results[position] = post_not_found_result(comment.post_id)
+            continue
+        positions.append(position)
+        rows.append({**comment.model_dump(), "user_id": current_user.id})
+
+    if rows:
+        async with database.transaction():
+            ids = await insert_returning_ids(comments_table, rows)
+            await index_documents(
+                "comments", [{**row, "id": id} for row, id in zip(rows, ids)]
+            )
+        for position, row, id in zip(positions, rows, ids):
+            results[position] = {
+                "status_code": status.HTTP_201_CREATED,
+                "item": {**row, "id": id},
+            }
+        await response_cache.comment_created(*{row["post_id"] for row in rows})
+    return results
+
+
 @router.get("/post/{post_id}/comment", response_model=list[Comment])
 @log(logger)
-async def get_comments_on_post(post_id: int):
-    post = await find_post(post_id)
-    if not post:
+async def get_comments_on_post(post_id: int, request: Request):
+    version, source = await post_version(post_id)
+    if not version:
         raise HTTPException(status_code=404, detail=f"Post with id {post_id} not found")
+    etag = make_etag("comments", post_id, version.last_comment_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    query = comments_table.select().where(comments_table.c.post_id == post_id)
+    query = (
+        comments_table.select()
+        .where(comments_table.c.post_id == post_id)
+        .order_by(comments_table.c.id)
+        .execution_options(name="comments_on_post")
+    )
     logger.debug(query)
-    return await database.fetch_all(query)
+    comments = await source.fetch_all(query)
+    return Response(
+        encode_rows(comments, COMMENT_FIELDS),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 @router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+async def get_post_with_comments(
+    post_id: int,
+    request: Request,
+    comments_cursor: str | None = None,
+    comments_limit: Annotated[int, Query(ge=1, le=500)] = 50,
+):
     logger.debug("Getting post and its comments")
-    query = select_post_and_likes.where(post_table.c.id == post_id)
+    cache_key = await response_cache.post_key(post_id, comments_cursor, comments_limit)
+    if cached := await response_cache.get(cache_key):
+        if etag_matches(request, cached.headers.get("etag")):
+            return not_modified(cached.headers["etag"])
+        return cached
+
+    # A miss reads the version with the post and its comments. Only a
+    # conditional request pays for a separate version query, which can spare
+    # it the page.
+    source = read_database
+    if request.headers.get("if-none-match"):
+        version, source = await post_version(post_id)
+        if not version:
+            raise HTTPException(
+                status_code=404, detail=f"Post with id {post_id} not found"
+            )
+        etag = make_etag(
+            "post",
+            post_id,
+            comments_cursor,
+            comments_limit,
+            version.like_count,
+            version.last_comment_id,
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    after_id = (
+        decode_cursor(comments_cursor, "comments", id=int)["id"]
+        if comments_cursor
+        else 0
+    )
+    comments = (
+        comments_table.select()
+        .where(comments_table.c.post_id == post_id, comments_table.c.id > after_id)
+        .order_by(comments_table.c.id)
+        .limit(comments_limit + 1)
+        .subquery()
+    )
+    query = (
+        select_post_and_likes.add_columns(
+            comments.c.id.label("comment_id"),
+            comments.c.body.label("comment_body"),
+            comments.c.user_id.label("comment_user_id"),
+            last_comment_id(post_id).label("last_comment_id"),
+        )
+        .select_from(
+            post_table.outerjoin(comments, comments.c.post_id == post_table.c.id)
+        )
+        .where(post_table.c.id == post_id)
+        .order_by(comments.c.id)
+        .execution_options(name="post_with_comments")
+    )
     logger.debug(query)
-    post = await database.fetch_one(query)
-    if not post:
+    rows = await source.fetch_all(query)
+    if not rows and source is read_database:
+        # Like find_post, a post missing from a lagging replica is looked up
+        # on the primary before it is reported missing.
+        rows = await database.fetch_all(query)
+    if not rows:
         raise HTTPException(status_code=404, detail=f"Post with id {post_id} not found")
 
-    return {
-        "post": post,
-        "comments": await get_comments_on_post(post_id),
-    }
+    post = rows[0]
+    etag = make_etag(
+        "post",
+        post_id,
+        comments_cursor,
+        comments_limit,
+        post.likes,
+        post.last_comment_id,
+    )
+    headers = {"ETag": etag}
+    comments = [
+        {
+            "id": row.comment_id,
+            "body": row.comment_body,
+            "post_id": post_id,
+            "user_id": row.comment_user_id,
+        }
+        for row in rows
+        if row.comment_id is not None
+    ]
+    if len(comments) > comments_limit:
+        comments = comments[:comments_limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(k="comments", id=comments[-1]["id"])
+
+    body = orjson.dumps(
+        {
+            "post": {
+                "id": post.id,
+                "body": post.body,
+                "user_id": post.user_id,
+                "likes": post.likes,
+            },
+            "comments": comments,
+        }
+    )
+    return await response_cache.set(
+        cache_key, body, headers, ttl=read_database.cache_ttl(response_cache.ttl)
+    )
 
 
 @router.post("/like", response_model=PostLike, status_code=201)
@@ -138,7 +528,86 @@ async def like_post(
         )
 
     data = {**like.model_dump(), "user_id": current_user.id}
-    query = likes_table.insert().values(data)
+    query = (
+        insert_ignoring_conflicts(likes_table, "post_id", "user_id")
+        .values(data)
+        .returning(likes_table.c.id)
+        .execution_options(name="insert_like")
+    )
     logger.debug(query)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.fetch_val(query)
+        if last_record_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Post with id {like.post_id} already liked",
+            )
+        await database.execute(
+            post_table.update()
+            .where(post_table.c.id == like.post_id)
+            .values(like_count=post_table.c.like_count + 1)
+        )
+    await response_cache.post_liked(like.post_id)
     return {**data, "id": last_record_id}
+
+
+@router.post("/like/batch", response_model=list[BatchItemResult[PostLike]])
+async def like_posts_batch(
+    likes: Annotated[list[PostLikeIn], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    logger.debug(f"Liking {len(likes)} posts.")
+    existing_post_ids = await find_existing_post_ids(like.post_id for like in likes)
+
+    results: list[dict | None] = [None] * len(likes)
+    positions: dict[int, int] = {}
+    for position, like in enumerate(likes):
+        if like.post_id not in existing_post_ids:
+            results[position] = post_not_found_result(like.post_id)
+        elif like.post_id in positions:
+            results[position] = {
+                "status_code": status.HTTP_409_CONFLICT,
+                "detail": f"Post with id {like.post_id} already liked",
+            }
+        else:
+            positions[like.post_id] = position
+
+    if positions:
+        query = (
+            insert_ignoring_conflicts(likes_table, "post_id", "user_id")
+            .values(
+                [
+                    {"post_id": post_id, "user_id": current_user.id}
+                    for post_id in positions
+                ]
+            )
+            .returning(likes_table.c.id, likes_table.c.post_id)
+            .execution_options(name="insert_likes_batch")
+        )
+        logger.debug(query)
+        async with database.transaction():
+            liked = {row.post_id: row.id for row in await database.fetch_all(query)}
+            if liked:
+                await database.execute(
+                    post_table.update()
+                    .where(post_table.c.id.in_(liked))
+                    .values(like_count=post_table.c.like_count + 1)
+                )
+
+        for post_id, position in positions.items():
+            if post_id in liked:
+                results[position] = {
+                    "status_code": status.HTTP_201_CREATED,
+                    "item": {
+                        "id": liked[post_id],
+                        "post_id": post_id,
+                        "user_id": current_user.id,
+                    },
+                }
+            else:
+                results[position] = {
+                    "status_code": status.HTTP_409_CONFLICT,
+                    "detail": f"Post with id {post_id} already liked",
+                }
+        await response_cache.post_liked(*liked)
+    return results
@@ -0,0 +1,61 @@
+import logging
+from enum import Enum
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+
+from socialmediaapi.config import config
+from socialmediaapi.models.post import Comment, UserPostWithLikes
+from socialmediaapi.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    invalid_cursor_exception,
+)
+from socialmediaapi.routers.post import COMMENT_FIELDS, FEED_FIELDS, encode_rows
+from socialmediaapi.search import search
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class SearchKind(str, Enum):
+    posts = "posts"
+    comments = "comments"
+
+
+@router.get("/search", response_model=list[UserPostWithLikes] | list[Comment])
+async def search_text(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    kind: SearchKind = SearchKind.posts,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    logger.info(f"Searching {kind.value}")
+    offset = 0
+    if cursor:
+        offset = decode_cursor(cursor, f"search:{kind.value}", offset=int)["offset"]
+        if offset < 0:
+            raise invalid_cursor_exception()
+    # Ranking has to score every match before the offset, so deep pages are
+    # not served at all.
+    if offset >= config.SEARCH_MAX_RESULTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Only the first {config.SEARCH_MAX_RESULTS} results can be paged",
+        )
+    limit = min(limit, config.SEARCH_MAX_RESULTS - offset)
+
+    rows = await search(kind.value, q, limit + 1, offset)
+    headers = {}
+    if len(rows) > limit and offset + limit < config.SEARCH_MAX_RESULTS:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            k=f"search:{kind.value}", offset=offset + limit
+        )
+
+    rows = rows[:limit]
+    fields = FEED_FIELDS if kind == SearchKind.posts else COMMENT_FIELDS
+    return Response(
+        encode_rows(rows, fields), media_type="application/json", headers=headers
+    )
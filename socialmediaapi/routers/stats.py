@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+
+from socialmediaapi.database import database, read_database
+from socialmediaapi.libs.b2 import b2_executor
+from socialmediaapi.logging_conf import logging_stats
+from socialmediaapi.mailer import mail_dispatcher
+from socialmediaapi.response_cache import response_cache
+from socialmediaapi.scores import score_scheduler
+from socialmediaapi.security import password_hasher, principal_cache, token_cache
+from socialmediaapi.timeline import timeline_fanout
+from socialmediaapi.uploads import upload_stats
+from socialmediaapi.utils import call_stats_snapshot
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def get_stats():
+    return {
+        "database_pool": database.pool_stats(),
+        "read_replicas": read_database.stats(),
+        "password_hashing": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "b2_upload": b2_executor.stats(),
+        "uploads": upload_stats.stats(),
+        "mailer": mail_dispatcher.stats(),
+        "scores": score_scheduler.stats(),
+        "timeline_fanout": timeline_fanout.stats(),
+        "response_cache": await response_cache.stats(),
+        "logging": logging_stats(),
+        "calls": call_stats_snapshot(),
+    }
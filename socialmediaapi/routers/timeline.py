@@ -0,0 +1,131 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from socialmediaapi.config import config
+from socialmediaapi.database import (
+    database,
+    follows_table,
+    insert_ignoring_conflicts,
+    timeline_table,
+    users_table,
+)
+from socialmediaapi.models.post import UserPostWithLikes
+from socialmediaapi.models.users import Follow, FollowIn, User
+from socialmediaapi.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from socialmediaapi.routers.post import FEED_FIELDS, encode_rows
+from socialmediaapi.security import get_current_user
+from socialmediaapi.timeline import (
+    backfill_timeline,
+    read_timeline,
+    switch_to_fanout_on_read,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/follow", response_model=Follow, status_code=201)
+async def follow_user(
+    follow: FollowIn, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.debug("Following a user.")
+    if follow.followee_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Users cannot follow themselves",
+        )
+
+    async with database.transaction():
+        followee = await database.fetch_one(
+            users_table.update()
+            .where(users_table.c.id == follow.followee_id)
+            .values(follower_count=users_table.c.follower_count + 1)
+            .returning(users_table.c.follower_count, users_table.c.fanout_on_read)
+            .execution_options(name="count_follower")
+        )
+        if followee is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {follow.followee_id} not found",
+            )
+        crossed = (
+            not followee.fanout_on_read
+            and followee.follower_count >= config.TIMELINE_FANOUT_MAX_FOLLOWERS
+        )
+
+        data = {**follow.model_dump(), "follower_id": current_user.id}
+        query = (
+            insert_ignoring_conflicts(follows_table, "follower_id", "followee_id")
+            .values(**data, fanout_on_read=followee.fanout_on_read)
+            .returning(follows_table.c.id)
+            .execution_options(name="insert_follow")
+        )
+        logger.debug(query)
+        last_record_id = await database.fetch_val(query)
+        if last_record_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"User with id {follow.followee_id} already followed",
+            )
+        if crossed:
+            await switch_to_fanout_on_read(follow.followee_id)
+        elif not followee.fanout_on_read:
+            await backfill_timeline(current_user.id, follow.followee_id)
+    return {**data, "id": last_record_id}
+
+
+@router.delete("/follow/{followee_id}", status_code=204)
+async def unfollow_user(
+    followee_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.debug("Unfollowing a user.")
+    async with database.transaction():
+        query = (
+            follows_table.delete()
+            .where(
+                follows_table.c.follower_id == current_user.id,
+                follows_table.c.followee_id == followee_id,
+            )
+            .returning(follows_table.c.id)
+            .execution_options(name="delete_follow")
+        )
+        logger.debug(query)
+        if await database.fetch_val(query) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {followee_id} not followed",
+            )
+        await database.execute(
+            users_table.update()
+            .where(users_table.c.id == followee_id)
+            .values(follower_count=users_table.c.follower_count - 1)
+        )
+        await database.execute(
+            timeline_table.delete().where(
+                timeline_table.c.user_id == current_user.id,
+                timeline_table.c.author_id == followee_id,
+            )
+        )
+
+
+@router.get("/timeline", response_model=list[UserPostWithLikes])
+async def get_timeline(
+    current_user: Annotated[User, Depends(get_current_user)],
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    logger.info("get_timeline()")
+    before_id = decode_cursor(cursor, "timeline", id=int)["id"] if cursor else None
+
+    posts = await read_timeline(current_user.id, before_id, limit + 1)
+    headers = {}
+    if len(posts) > limit:
+        posts = posts[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(k="timeline", id=posts[-1].id)
+
+    return Response(
+        encode_rows(posts, FEED_FIELDS), media_type="application/json", headers=headers
+    )
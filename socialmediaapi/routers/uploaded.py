@@ -1,33 +1,56 @@
 import logging
-import tempfile
 
-import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, status
+from fastapi import APIRouter, HTTPException, Request, status
 
-from socialmediaapi.libs.b2 import b2_upload_file
+from socialmediaapi.executors import PoolSaturatedError
+from socialmediaapi.libs.multipart_stream import (
+    MultipartFileStream,
+    MultipartStreamError,
+)
+from socialmediaapi.uploads import upload_deduplicated
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-CHUNK_SIZE = 1024 * 1024
-
-
-@router.post("/upload", status_code=201)
-async def upload_file(file: UploadFile):
+upload_request_body = {
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+    "required": True,
+}
+
+
+@router.post(
+    "/upload", status_code=201, openapi_extra={"requestBody": upload_request_body}
+)
+async def upload_file(request: Request):
     try:
-        with tempfile.NamedTemporaryFile() as temp_file:
-            filename = temp_file.name
-            logger.info(f"Saving uploaded file temporarily to {filename}")
-            async with aiofiles.open(filename, "wb") as f:
-                while chunk := await file.read(CHUNK_SIZE):
-                    await f.write(chunk)
-
-            file_url = b2_upload_file(local_file=filename, file_name=file.filename)
+        upload = MultipartFileStream(request.headers, request.stream(), "file")
+        filename = await upload.open()
+        logger.info(f"Streaming uploaded file {filename} to B2")
+        result = await upload_deduplicated(upload.chunks(), filename)
+    except MultipartStreamError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid upload: {str(e)}",
+        )
+    except PoolSaturatedError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"There was an error uploading the file: {str(e)}.",
         )
 
-    return {"detail": f"Succesfully uploaded {file.filename}", "file_url": file_url}
+    return {"detail": f"Succesfully uploaded {filename}", **result}
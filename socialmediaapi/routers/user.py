@@ -1,7 +1,7 @@
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from socialmediaapi import tasks
@@ -11,9 +11,10 @@ from socialmediaapi.security import (
     authenticate_user,
     create_access_token,
     create_confirmation_token,
-    get_password_hash,
+    get_password_hash_async,
     get_subject_for_token_type,
     get_user,
+    invalidate_principal,
 )
 
 logger = logging.getLogger(__name__)
@@ -22,7 +23,7 @@ router = APIRouter()
 
 
 @router.post("/register", status_code=201)
-async def register(user: UserIn, background_task: BackgroundTasks, request: Request):
+async def register(user: UserIn, request: Request):
     if await get_user(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -30,18 +31,20 @@ async def register(user: UserIn, background_task: BackgroundTasks, request: Requ
         )
     query = users_table.insert().values(
         email=user.email,
-        password=get_password_hash(user.password),
+        password=await get_password_hash_async(user.password),
         confirmed=user.confirmed,
     )
     logger.debug(query)
-    await database.execute(query)
-    background_task.add_task(
-        tasks.send_user_registration_email,
-        user.email,
-        confirmation_url=request.url_for(
-            "confirm_email", token=create_confirmation_token(user.email)
-        ),
-    )
+    async with database.transaction():
+        await database.execute(query)
+        await tasks.enqueue_user_registration_email(
+            user.email,
+            confirmation_url=str(
+                request.url_for(
+                    "confirm_email", token=create_confirmation_token(user.email)
+                )
+            ),
+        )
     return {"detail": "User created"}
 
 
@@ -61,4 +64,5 @@ async def confirm_email(token: str):
     )
     logger.debug(query)
     await database.execute(query)
+    invalidate_principal(email)
     return {"detail": "User confirmed"}
@@ -0,0 +1,220 @@
+import asyncio
+import datetime
+import logging
+import math
+
+import sqlalchemy
+
+from socialmediaapi.config import config
+from socialmediaapi.database import (
+    database,
+    insert_ignoring_conflicts,
+    job_state_table,
+    likes_table,
+    post_table,
+)
+from socialmediaapi.export import settled_max_id
+from socialmediaapi.metrics import background_task_duration, timed
+from socialmediaapi.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+SCORES_JOB = "post_scores"
+
+# Ten times the likes (plus one) is worth HOT_GRAVITY_SECONDS (12.5 hours)
+# of age.
+HOT_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+HOT_GRAVITY_SECONDS = 45_000
+
+TOP_WINDOW = datetime.timedelta(hours=24)
+
+RESCORE_QUERY = (
+    "UPDATE posts SET hot_score = :hot_score, top_24h_likes = :top_24h_likes"
+    " WHERE id = :id"
+)
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC)
+
+
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    # SQLite hands timestamps back without their timezone.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.UTC)
+    return value
+
+
+def hot_score(likes: int, created_at: datetime.datetime | None) -> float:
+    # The age term grows with the creation time instead of decaying with the
+    # clock, so a post only needs rescoring when it is liked. Posts without a
+    # creation time rank as if written at HOT_EPOCH.
+    age = 0.0
+    if created_at is not None:
+        age = (as_utc(created_at) - HOT_EPOCH).total_seconds()
+    return math.log10(1 + likes) + age / HOT_GRAVITY_SECONDS
+
+
+def new_post_scores(created_at: datetime.datetime) -> dict:
+    return {
+        "created_at": created_at,
+        "hot_score": hot_score(0, created_at),
+        "top_24h_likes": 0,
+    }
+
+
+class ScoreScheduler:
+    def __init__(self, batch_size: int | None = None) -> None:
+        self.batch_size = batch_size or config.SCORE_BATCH_SIZE
+        self.runs = 0
+        self.rescored = 0
+        self.expired = 0
+        self.last_like_id = 0
+
+    async def watermark(self) -> int:
+        await database.execute(
+            insert_ignoring_conflicts(job_state_table, "name").values(name=SCORES_JOB)
+        )
+        query = sqlalchemy.select(job_state_table.c.last_id).where(
+            job_state_table.c.name == SCORES_JOB
+        )
+        return await database.fetch_val(query)
+
+    async def save_progress(
+        self, last_id: int | None = None, bump: bool = True
+    ) -> None:
+        # The version feeds the feed ETags, so it only moves when scores did.
+        values = {}
+        if bump:
+            values["version"] = job_state_table.c.version + 1
+        if last_id is not None:
+            values["last_id"] = last_id
+        if not values:
+            return
+        await database.execute(
+            job_state_table.update()
+            .where(job_state_table.c.name == SCORES_JOB)
+            .values(**values)
+        )
+
+    async def rescore(self, post_ids: set[int], now: datetime.datetime) -> int:
+        query = (
+            sqlalchemy.select(
+                post_table.c.id,
+                post_table.c.like_count,
+                post_table.c.created_at,
+                post_table.c.hot_score,
+                post_table.c.top_24h_likes,
+            )
+            .where(post_table.c.id.in_(post_ids))
+            .execution_options(name="posts_to_rescore")
+        )
+        logger.debug(query)
+        rows = []
+        for post in await database.fetch_all(query):
+            in_window = (
+                post.created_at is not None
+                and as_utc(post.created_at) >= now - TOP_WINDOW
+            )
+            score = hot_score(post.like_count, post.created_at)
+            top_24h_likes = post.like_count if in_window else None
+            # Posts whose scores did not move are left alone, so that a
+            # repeated run writes nothing.
+            if (
+                math.isclose(score, post.hot_score, rel_tol=1e-12)
+                and top_24h_likes == post.top_24h_likes
+            ):
+                continue
+            rows.append(
+                {"id": post.id, "hot_score": score, "top_24h_likes": top_24h_likes}
+            )
+        if rows:
+            await database.execute_many(RESCORE_QUERY, rows)
+        return len(rows)
+
+    async def expire(self, now: datetime.datetime) -> int:
+        query = (
+            post_table.update()
+            .where(
+                post_table.c.top_24h_likes.isnot(None),
+                post_table.c.created_at < now - TOP_WINDOW,
+            )
+            .values(top_24h_likes=None)
+            .returning(post_table.c.id)
+            .execution_options(name="expire_top_24h")
+        )
+        logger.debug(query)
+        return len(await database.fetch_all(query))
+
+    async def update_scores(self) -> int:
+        # Likes are append-only, so every post liked since the last run is
+        # found from the likes after the stored watermark, in id batches. The
+        # run stops at settled_max_id, so a like that commits after one with
+        # a higher id is still ahead of the watermark. Scores are recomputed
+        # from like_count and only written when they changed, which makes a
+        # repeated or concurrent run harmless.
+        with timed(background_task_duration, "post_scores"):
+            now = utcnow()
+            watermark = await self.watermark()
+            until_id = await settled_max_id(
+                likes_table, config.WATERMARK_SETTLE_TIMEOUT_SECONDS
+            )
+            after_id = watermark
+            rescored = 0
+            while after_id < until_id:
+                query = (
+                    sqlalchemy.select(likes_table.c.id, likes_table.c.post_id)
+                    .where(likes_table.c.id > after_id, likes_table.c.id <= until_id)
+                    .order_by(likes_table.c.id)
+                    .limit(self.batch_size)
+                    .execution_options(name="new_likes")
+                )
+                logger.debug(query)
+                likes = await database.fetch_all(query)
+                if not likes:
+                    break
+                post_ids = {like.post_id for like in likes}
+                after_id = likes[-1].id
+                async with database.transaction():
+                    changed = await self.rescore(post_ids, now)
+                    await self.save_progress(after_id, bump=bool(changed))
+                rescored += changed
+
+            expired = await self.expire(now)
+            if expired:
+                await self.save_progress()
+            if rescored or expired:
+                await response_cache.scores_updated()
+                logger.info(f"Rescored {rescored} posts, expired {expired}")
+
+            self.runs += 1
+            self.rescored += rescored
+            self.expired += expired
+            self.last_like_id = after_id
+            return rescored
+
+    async def run(self, stop: asyncio.Event, interval: float | None = None) -> None:
+        interval = interval or config.SCORE_INTERVAL_SECONDS
+        logger.info("Score scheduler started")
+        while not stop.is_set():
+            try:
+                await self.update_scores()
+            except Exception:
+                logger.exception("Score scheduler iteration failed")
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except TimeoutError:
+                pass
+        logger.info("Score scheduler stopped")
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "rescored": self.rescored,
+            "expired": self.expired,
+            "last_like_id": self.last_like_id,
+        }
+
+
+score_scheduler = ScoreScheduler()
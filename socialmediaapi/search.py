@@ -0,0 +1,90 @@
+import logging
+import re
+
+import sqlalchemy
+
+from socialmediaapi.database import database, read_database
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration of the Postgres body_tsv columns. Query terms
+# must be parsed with the same one to match them.
+SEARCH_CONFIG = "english"
+
+SEARCHABLE_TABLES = {"posts": "posts_fts", "comments": "comments_fts"}
+
+SELECTED_COLUMNS = {
+    "posts": "{t}.id, {t}.body, {t}.user_id, {t}.like_count AS likes",
+    "comments": "{t}.id, {t}.body, {t}.post_id, {t}.user_id",
+}
+
+
+def is_sqlite() -> bool:
+    return database.url.dialect == "sqlite"
+
+
+def search_terms(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def fts5_match(terms: list[str]) -> str:
+    # Every term is quoted so that user input cannot inject FTS5 operators or
+    # column filters; adjacent quoted terms are ANDed.
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_query(kind: str, terms: list[str], limit: int, offset: int):
+    columns = SELECTED_COLUMNS[kind].format(t=kind)
+    if is_sqlite():
+        fts = SEARCHABLE_TABLES[kind]
+        query = sqlalchemy.text(
+            f"SELECT {columns} FROM {fts} JOIN {kind} ON {kind}.id = {fts}.rowid"
+            f" WHERE {fts} MATCH :match ORDER BY {fts}.rank, {kind}.id"
+            " LIMIT :limit OFFSET :offset"
+        ).bindparams(match=fts5_match(terms), limit=limit, offset=offset)
+    else:
+        # body_tsv holds the parsed body, so neither the match nor ts_rank
+        # has to parse the bodies again.
+        document = f"{kind}.body_tsv"
+        query = sqlalchemy.text(
+            f"SELECT {columns} FROM {kind},"
+            f" plainto_tsquery('{SEARCH_CONFIG}', :terms) AS q"
+            f" WHERE {document} @@ q ORDER BY ts_rank({document}, q) DESC, {kind}.id"
+            " LIMIT :limit OFFSET :offset"
+        ).bindparams(terms=" ".join(terms), limit=limit, offset=offset)
+    return query.execution_options(name=f"search_{kind}")
+
+
+async def search(kind: str, text: str, limit: int, offset: int = 0) -> list:
+    terms = search_terms(text)
+    if not terms:
+        return []
+    query = search_query(kind, terms, limit, offset)
+    logger.debug(query)
+    return await read_database.fetch_all(query)
+
+
+async def index_documents(kind: str, rows: list[dict]) -> None:
+    # A Postgres trigger fills body_tsv on write, so only the SQLite
+    # external-content FTS5 tables need to be written alongside the rows.
+    if not is_sqlite() or not rows:
+        return
+    fts = SEARCHABLE_TABLES[kind]
+    query = f"INSERT INTO {fts} (rowid, body) VALUES (:id, :body)"
+    await database.execute_many(
+        query, [{"id": row["id"], "body": row["body"]} for row in rows]
+    )
+
+
+def rebuild_search_index(engine: sqlalchemy.Engine) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for kind, fts in SEARCHABLE_TABLES.items():
+            logger.info(f"Rebuilding search index of {kind}")
+            if engine.dialect.name == "sqlite":
+                conn.execute(
+                    sqlalchemy.text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+                )
+            else:
+                conn.execute(
+                    sqlalchemy.text(f"REINDEX INDEX CONCURRENTLY ix_{kind}_body_tsv")
+                )
@@ -1,21 +1,36 @@
 import datetime
 import logging
+import time
+from functools import lru_cache
 from typing import Annotated, Literal
 
+import sqlalchemy
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, JWTError, jwt
 from passlib.context import CryptContext
 
+from socialmediaapi.cache import TTLCache
+from socialmediaapi.config import config
 from socialmediaapi.database import database, users_table
-from socialmediaapi.models.users import UserIn
+from socialmediaapi.executors import BoundedExecutor, PoolSaturatedError
+from socialmediaapi.models.users import User, UserIn
+from socialmediaapi.utils import log
 
 logger = logging.getLogger(__name__)
 
 SECRET_KEY = "132456"
 ALGORITHM = "HS256"
 oaut2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"])
+password_hasher = BoundedExecutor(
+    "password_hashing", config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_QUEUE_SIZE
+)
+token_cache = TTLCache(
+    maxsize=config.PRINCIPAL_CACHE_SIZE, ttl=config.PRINCIPAL_CACHE_TTL_SECONDS
+)
+principal_cache = TTLCache(
+    maxsize=config.PRINCIPAL_CACHE_SIZE, ttl=config.PRINCIPAL_CACHE_TTL_SECONDS
+)
 
 
 def create_credentials_exception(detail: str) -> HTTPException:
@@ -54,11 +69,15 @@ def create_confirmation_token(email: str):
     return encoded_jwt
 
 
-def get_subject_for_token_type(
-    token: str, type: Literal["access", "confirmation"]
-) -> str:
+def decode_token(token: str, type: Literal["access", "confirmation"]) -> dict:
     try:
-        payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
+        # exp is required: the token cache is bounded by it.
+        payload = jwt.decode(
+            token,
+            key=SECRET_KEY,
+            algorithms=[ALGORITHM],
+            options={"require_exp": True},
+        )
     except ExpiredSignatureError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -78,32 +97,107 @@ def get_subject_for_token_type(
             f"Token has incorrect type, expected '{type}'"
         )
 
+    return payload
+
+
+def get_subject_for_token_type(
+    token: str, type: Literal["access", "confirmation"]
+) -> str:
+    return decode_token(token, type)["sub"]
+
+
+def get_subject_for_access_token(token: str) -> str:
+    email = token_cache.get(token)
+    if email is None:
+        payload = decode_token(token, "access")
+        email = payload["sub"]
+        token_cache.set(token, email, ttl=payload["exp"] - time.time())
     return email
 
 
+@lru_cache
+def password_context() -> CryptContext:
+    return CryptContext(schemes=["bcrypt"])
+
+
+def load_password_backend() -> None:
+    # passlib loads bcrypt on the first hash; doing it at startup keeps that
+    # cost off the first /register or /token request.
+    password_context().handler("bcrypt").get_backend()
+
+
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
 
+async def run_password_hasher(func, *args):
+    try:
+        return await password_hasher.run(func, *args)
+    except PoolSaturatedError as e:
+        logger.warning("Password hashing pool is saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": "1"},
+        ) from e
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_password_hasher(get_password_hash, password)
 
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_hasher(verify_password, plain_password, hashed_password)
+
+
+@log(logger, level=logging.DEBUG, log_args=False)
 async def get_user(email: str) -> UserIn:
     logger.debug("Fetching user from the database", extra={"email": email})
-    query = users_table.select().where(users_table.c.email == email)
+    query = (
+        users_table.select()
+        .where(users_table.c.email == email)
+        .execution_options(name="get_user")
+    )
     logger.debug(query)
     result = await database.fetch_one(query)
     if result:
         return result
 
 
+async def get_principal(email: str) -> User | None:
+    user = principal_cache.get(email)
+    if user is None:
+        logger.debug("Fetching principal from the database", extra={"email": email})
+        query = (
+            sqlalchemy.select(
+                users_table.c.id, users_table.c.email, users_table.c.confirmed
+            )
+            .where(users_table.c.email == email)
+            .execution_options(name="get_principal")
+        )
+        logger.debug(query)
+        result = await database.fetch_one(query)
+        if result is None:
+            return None
+        user = User(id=result.id, email=result.email, confirmed=result.confirmed)
+        principal_cache.set(email, user)
+    return user
+
+
+def invalidate_principal(email: str) -> None:
+    principal_cache.delete(email)
+
+
 async def authenticate_user(email: str, password: str) -> UserIn:
     logger.debug("Authenticating user", extra={"email": email})
     user = await get_user(email)
     if not user:
         raise create_credentials_exception("Invalid email or password")
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         raise create_credentials_exception("Invalid email or password")
     if not user.confirmed:
         raise create_credentials_exception("User has not confirmed email")
@@ -111,8 +205,8 @@ async def authenticate_user(email: str, password: str) -> UserIn:
 
 
 async def get_current_user(token: Annotated[str, Depends(oaut2_scheme)]):
-    email = get_subject_for_token_type(token, "access")
-    user = await get_user(email)
+    email = get_subject_for_access_token(token)
+    user = await get_principal(email)
     if user is None:
         raise create_credentials_exception("Could not find user for this token")
     return user
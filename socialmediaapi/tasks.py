@@ -1,40 +1,66 @@
+import datetime
 import logging
 
 import httpx
 
 from socialmediaapi.config import config
+from socialmediaapi.database import database, email_outbox_table
 
 logger = logging.getLogger(__name__)
 
 
 class APIResponseError(Exception):
-    pass
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def mailgun_message(to: list[str], subject: str, body: str) -> dict:
+    return {
+        "from": f"Ruben Jimenez Andreu <mailgun@{config.MAILGUN_DOMAIN}>",
+        "to": to,
+        "subject": subject,
+        "text": body,
+    }
+
+
+async def post_mailgun_message(client: httpx.AsyncClient, data: dict):
+    try:
+        response = await client.post(
+            f"{config.MAILGUN_API_URL}/{config.MAILGUN_DOMAIN}/messages",
+            auth=("api", config.MAILGUN_API_KEY),
+            data=data,
+        )
+        response.raise_for_status()
+        logger.debug(response.content)
+    except httpx.HTTPStatusError as err:
+        raise APIResponseError(
+            f"API request failed with status code {err.response.status_code}",
+            status_code=err.response.status_code,
+        ) from err
 
 
 async def send_simple_emain(to: str, subject: str, body: str):
     logger.debug(f"Sending email to '{to[:3]}' with subject '{subject[:20]}'")
     async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"https://api.mailgun.net/v3/{config.MAILGUN_DOMAIN}/messages",
-                auth=("api", config.MAILGUN_API_KEY),
-                data={
-                    "from": f"Ruben Jimenez Andreu <mailgun@{config.MAILGUN_DOMAIN}>",
-                    "to": [to],
-                    "subject": subject,
-                    "text": body,
-                },
-            )
-            response.raise_for_status()
-            logger.debug(response.content)
-        except httpx.HTTPStatusError as err:
-            raise APIResponseError(
-                f"API request failed with status code {err.response.status_code}"
-            ) from err
-
-
-async def send_user_registration_email(email: str, confirmation_url: str):
-    return await send_simple_emain(
+        await post_mailgun_message(client, mailgun_message([to], subject, body))
+
+
+async def enqueue_email(to: str, subject: str, body: str):
+    logger.debug(f"Queueing email to '{to[:3]}' with subject '{subject[:20]}'")
+    query = email_outbox_table.insert().values(
+        to_address=to,
+        subject=subject,
+        body=body,
+        status="pending",
+        next_attempt_at=datetime.datetime.now(datetime.timezone.utc),
+    )
+    logger.debug(query)
+    return await database.execute(query)
+
+
+async def enqueue_user_registration_email(email: str, confirmation_url: str):
+    return await enqueue_email(
         email,
         "Successfuly signed up",
         (
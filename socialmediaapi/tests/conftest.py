@@ -2,14 +2,19 @@ import os
 from typing import AsyncGenerator, Generator
 from unittest.mock import AsyncMock, Mock
 
+import b2sdk.v2 as b2
 import pytest
 from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient, Request, Response
 
 os.environ["ENV_STATE"] = "test"
 
-from socialmediaapi.database import database, users_table  # noqa: E402
+from socialmediaapi import security  # noqa: E402
+from socialmediaapi.config import config  # noqa: E402
+from socialmediaapi.database import database, get_engine, users_table  # noqa: E402
 from socialmediaapi.main import app  # noqa: E402
+from socialmediaapi.migrations import migrate  # noqa: E402
+from socialmediaapi.response_cache import response_cache  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -17,6 +22,11 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def migrated_db() -> None:
+    migrate(get_engine())
+
+
 @pytest.fixture()
 def client() -> Generator:
     yield TestClient(app)
@@ -29,6 +39,14 @@ async def db() -> AsyncGenerator:
     await database.disconnect()
 
 
+@pytest.fixture(autouse=True)
+async def clear_caches() -> AsyncGenerator:
+    yield
+    security.token_cache.clear()
+    security.principal_cache.clear()
+    await response_cache.clear()
+
+
 @pytest.fixture()
 async def async_client(client) -> AsyncGenerator:
     async with AsyncClient(
@@ -79,3 +97,16 @@ def mock_httpx_client(mocker):
     mocked_async_client.post = AsyncMock(return_value=response)
     mocked_client.return_value.__aenter__.return_value = mocked_async_client
     return mocked_async_client
+
+
+@pytest.fixture()
+def fake_b2(mocker) -> b2.Bucket:
+    api = b2.B2Api(
+        b2.InMemoryAccountInfo(),
+        api_config=b2.B2HttpApiConfig(_raw_api_class=b2.RawSimulator),
+    )
+    api.authorize_account("production", *api.session.raw_api.create_account())
+    bucket = api.create_bucket("test-bucket", "allPrivate")
+    mocker.patch.object(config, "B2_BUCKET_NAME", "test-bucket")
+    mocker.patch("socialmediaapi.libs.b2.b2_api", return_value=api)
+    return bucket
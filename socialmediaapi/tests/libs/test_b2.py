@@ -0,0 +1,62 @@
+import b2sdk.v2 as b2
+import pytest
+
+from socialmediaapi.libs import b2 as b2_lib
+
+
+async def iter_chunks(data: bytes, chunk_size: int = 7):
+    for i in range(0, len(data), chunk_size):
+        yield data[i : i + chunk_size]
+
+
+def uploaded_file(bucket: b2.Bucket, file_name: str) -> b2.FileVersion:
+    return bucket.get_file_info_by_name(file_name)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [0, 10, 19])
+async def test_stream_upload_single_part(fake_b2: b2.Bucket, mocker, size: int):
+    upload_part = mocker.spy(b2_lib, "b2_upload_part")
+    data = bytes(range(size))
+
+    url = await b2_lib.b2_stream_upload(iter_chunks(data), "small.bin", part_size=10)
+
+    file = uploaded_file(fake_b2, "small.bin")
+    assert file.size == size
+    assert file.id_ in url
+    upload_part.assert_not_called()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size, parts", [(20, 2), (45, 5)])
+async def test_stream_upload_multipart(
+    fake_b2: b2.Bucket, mocker, size: int, parts: int
+):
+    upload_part = mocker.spy(b2_lib, "b2_upload_part")
+    data = bytes(range(size))
+
+    url = await b2_lib.b2_stream_upload(
+        iter_chunks(data), "large.bin", part_size=10, concurrency=2
+    )
+
+    file = uploaded_file(fake_b2, "large.bin")
+    assert file.size == size
+    assert file.id_ in url
+    assert upload_part.call_count == parts
+    assert sorted(c.args[1] for c in upload_part.call_args_list) == list(
+        range(1, parts + 1)
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_upload_cancels_failed_large_file(fake_b2: b2.Bucket, mocker):
+    mocker.patch.object(b2_lib, "b2_upload_part", side_effect=RuntimeError("boom"))
+    cancel = mocker.spy(b2_lib, "b2_cancel_large_file")
+
+    with pytest.raises(RuntimeError):
+        await b2_lib.b2_stream_upload(
+            iter_chunks(bytes(50)), "broken.bin", part_size=10, concurrency=1
+        )
+
+    cancel.assert_called_once()
+    assert list(fake_b2.list_unfinished_large_files()) == []
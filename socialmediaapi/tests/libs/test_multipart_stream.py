@@ -0,0 +1,57 @@
+import pytest
+from starlette.datastructures import Headers
+
+from socialmediaapi.libs.multipart_stream import (
+    MultipartFileStream,
+    MultipartStreamError,
+)
+
+BODY = (
+    b"--boundary\r\n"
+    b'Content-Disposition: form-data; name="note"\r\n\r\n'
+    b"hello\r\n"
+    b"--boundary\r\n"
+    b'Content-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+    b"Content-Type: text/plain\r\n\r\n"
+    b"file contents\r\n"
+    b"--boundary--\r\n"
+)
+HEADERS = Headers({"content-type": "multipart/form-data; boundary=boundary"})
+
+
+async def iter_chunks(data: bytes, chunk_size: int):
+    for i in range(0, len(data), chunk_size):
+        yield data[i : i + chunk_size]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 16, len(BODY)])
+async def test_stream_file(chunk_size: int):
+    upload = MultipartFileStream(HEADERS, iter_chunks(BODY, chunk_size), "file")
+
+    assert await upload.open() == "a.txt"
+    assert b"".join([chunk async for chunk in upload.chunks()]) == b"file contents"
+
+
+@pytest.mark.anyio
+async def test_stream_missing_field():
+    upload = MultipartFileStream(HEADERS, iter_chunks(BODY, 16), "image")
+
+    with pytest.raises(MultipartStreamError):
+        await upload.open()
+
+
+@pytest.mark.anyio
+async def test_stream_truncated_body():
+    upload = MultipartFileStream(HEADERS, iter_chunks(BODY[:-20], 16), "file")
+    await upload.open()
+
+    with pytest.raises(MultipartStreamError):
+        [chunk async for chunk in upload.chunks()]
+
+
+def test_missing_boundary():
+    with pytest.raises(MultipartStreamError):
+        MultipartFileStream(
+            Headers({"content-type": "text/plain"}), iter_chunks(b"", 1), "file"
+        )
@@ -0,0 +1,45 @@
+import orjson
+import pytest
+from httpx import AsyncClient
+
+from socialmediaapi.tests.routers.test_post import create_post
+
+
+@pytest.mark.anyio
+async def test_export(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+
+    response = await async_client.get(
+        "/export",
+        params={"since_post_id": post["id"] - 1},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [orjson.loads(line) for line in response.text.splitlines()]
+    assert records[0] == {"type": "post", **post, "likes": 0}
+    assert records[-1]["post"] == post["id"]
+
+
+@pytest.mark.anyio
+async def test_export_requires_authentication(async_client: AsyncClient):
+    response = await async_client.get("/export")
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_export_watermark_timeout(
+    async_client: AsyncClient, logged_in_token: str, mocker
+):
+    mocker.patch(
+        "socialmediaapi.routers.export.export_watermark", side_effect=TimeoutError
+    )
+
+    response = await async_client.get(
+        "/export", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,31 @@
+import pytest
+from httpx import AsyncClient
+
+from socialmediaapi.tests.routers.test_post import create_post
+
+
+@pytest.mark.anyio
+async def test_get_metrics(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    await async_client.get(f"/post/{post['id']}/comment")
+    await async_client.get("/post/999/comment")
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert (
+        'http_requests_total{method="GET",route="/post/{post_id}/comment",status="200"}'
+        in text
+    )
+    assert (
+        'http_requests_total{method="GET",route="/post/{post_id}/comment",status="404"}'
+        in text
+    )
+    assert 'db_query_duration_seconds_count{statement="insert_post"}' in text
+    assert 'db_query_duration_seconds_count{statement="comments_on_post"}' in text
+    assert 'db_pool_connections{state="in_use"}' in text
+    assert "# TYPE db_pool_acquire_timeouts_total counter" in text
+    assert 'executor_tasks_rejected_total{pool="b2_upload"}' in text
+    assert 'mail_outbox_messages_total{outcome="sent"}' in text
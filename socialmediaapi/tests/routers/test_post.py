@@ -2,6 +2,10 @@ import pytest
 from httpx import AsyncClient
 
 from socialmediaapi import security
+from socialmediaapi.database import database
+from socialmediaapi.pagination import encode_cursor
+from socialmediaapi.response_cache import response_cache
+from socialmediaapi.scores import score_scheduler
 
 
 async def create_post(
@@ -107,6 +111,50 @@ async def test_get_all_posts(async_client: AsyncClient, created_post: dict):
     assert response.json() == [{**created_post, "likes": 0}]
 
 
+@pytest.mark.anyio
+async def test_list_endpoints_keep_response_schema(async_client: AsyncClient):
+    response = await async_client.get("/openapi.json")
+
+    paths = response.json()["paths"]
+    feed = paths["/post"]["get"]["responses"]["200"]["content"]["application/json"]
+    comments = paths["/post/{post_id}/comment"]["get"]["responses"]["200"]
+    assert feed["schema"]["items"]["$ref"].endswith("/UserPostWithLikes")
+    assert comments["content"]["application/json"]["schema"]["items"]["$ref"].endswith(
+        "/Comment"
+    )
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_cached_until_new_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await async_client.get("/post")
+    hits = response_cache.backend.entries.hits
+
+    response = await async_client.get("/post")
+    assert response.json() == [{**created_post, "likes": 0}]
+    assert response_cache.backend.entries.hits == hits + 1
+
+    post = await create_post("Second Post", async_client, logged_in_token)
+    response = await async_client.get("/post")
+    assert [p["id"] for p in response.json()] == [post["id"], created_post["id"]]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_likes_stale_within_window(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str, mocker
+):
+    mocker.patch.object(response_cache, "like_staleness", 5)
+    await async_client.get("/post")
+    await like_post(created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/post")
+    assert response.json()[0]["likes"] == 0
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 1
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "sorting, expected_order",
@@ -148,6 +196,103 @@ async def test_get_all_posts_sort_likes(
     assert post_ids == expected_order
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "sorting, expected_order",
+    [("new", [3, 2, 1]), ("old", [1, 2, 3]), ("most_likes", [2, 3, 1])],
+)
+async def test_get_all_posts_paginated(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sorting: str,
+    expected_order: list[int],
+):
+    for i in range(3):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+    await like_post(2, async_client, logged_in_token)
+
+    post_ids = []
+    params = {"sorting": sorting, "limit": 2}
+    while True:
+        response = await async_client.get("/post", params=params)
+        assert response.status_code == 200
+        post_ids += [post["id"] for post in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert post_ids == expected_order
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("sorting", ["hot", "top_24h"])
+async def test_get_all_posts_sort_scores(
+    async_client: AsyncClient, logged_in_token: str, sorting: str
+):
+    for i in range(3):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+    await like_post(2, async_client, logged_in_token)
+    await score_scheduler.update_scores()
+
+    post_ids = []
+    params = {"sorting": sorting, "limit": 2}
+    while True:
+        response = await async_client.get("/post", params=params)
+        assert response.status_code == 200
+        post_ids += [post["id"] for post in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert post_ids == [2, 3, 1]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/post", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "sorting, values",
+    [
+        ("new", {"k": "new"}),
+        ("new", {"k": "new", "id": "1"}),
+        ("new", {"k": "new", "id": True}),
+        ("most_likes", {"k": "most_likes", "id": 1}),
+        ("most_likes", {"k": "most_likes", "id": 1, "likes": None}),
+        ("hot", {"k": "hot", "id": 1}),
+        ("top_24h", {"k": "top_24h", "id": 1, "score": 1.5}),
+    ],
+)
+async def test_get_all_posts_malformed_cursor(
+    async_client: AsyncClient, sorting: str, values: dict
+):
+    response = await async_client.get(
+        "/post", params={"sorting": sorting, "cursor": encode_cursor(**values)}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_cursor_from_other_sorting(
+    async_client: AsyncClient, logged_in_token: str
+):
+    for i in range(2):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+    response = await async_client.get("/post", params={"sorting": "new", "limit": 1})
+
+    response = await async_client.get(
+        "/post",
+        params={"sorting": "old", "cursor": response.headers["X-Next-Cursor"]},
+    )
+
+    assert response.status_code == 400
+
+
 @pytest.mark.anyio
 async def test_create_comment(
     async_client: AsyncClient,
@@ -218,6 +363,19 @@ async def test_get_post_with_comments(
     }
 
 
+@pytest.mark.anyio
+async def test_get_post_with_comments_invalidated_by_comment(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await async_client.get(f"/post/{created_post['id']}")
+    comment = await create_comment(
+        "New Comment", created_post["id"], async_client, logged_in_token
+    )
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["comments"] == [comment]
+
+
 @pytest.mark.anyio
 async def test_get_post_with_comments_and_like(
     async_client: AsyncClient,
@@ -236,6 +394,38 @@ async def test_get_post_with_comments_and_like(
     }
 
 
+@pytest.mark.anyio
+async def test_get_post_with_comments_paginated(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    comments = [
+        await create_comment(
+            f"Comment {i}", created_post["id"], async_client, logged_in_token
+        )
+        for i in range(3)
+    ]
+
+    response = await async_client.get(
+        f"/post/{created_post['id']}", params={"comments_limit": 2}
+    )
+    assert response.status_code == 200
+    assert response.json()["comments"] == comments[:2]
+
+    response = await async_client.get(
+        f"/post/{created_post['id']}",
+        params={
+            "comments_limit": 2,
+            "comments_cursor": response.headers["X-Next-Cursor"],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "post": {**created_post, "likes": 0},
+        "comments": comments[2:],
+    }
+    assert "X-Next-Cursor" not in response.headers
+
+
 @pytest.mark.anyio
 async def test_get_missing_post_with_comments(
     async_client: AsyncClient, created_post: dict, created_comment: dict
@@ -263,3 +453,174 @@ async def test_like_post(
         "post_id": created_post["id"],
         "user_id": confirmed_user["id"],
     }.items() <= response.json().items()
+
+
+@pytest.mark.anyio
+async def test_like_post_twice(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+    response = await async_client.post(
+        "/like",
+        json={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 409
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 1
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_not_modified(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    etag = (await async_client.get("/post")).headers["ETag"]
+
+    response = await async_client.get("/post", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    await like_post(created_post["id"], async_client, logged_in_token)
+    response = await async_client.get("/post", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_not_modified(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    url = f"/post/{created_post['id']}"
+    etag = (await async_client.get(url)).headers["ETag"]
+    await response_cache.clear()
+
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await create_comment("Comment", created_post["id"], async_client, logged_in_token)
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["comments"]) == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("url", ["/post", "/post/{id}", "/post?sorting=hot"])
+async def test_cache_miss_reads_page_and_version_in_one_query(
+    async_client: AsyncClient, created_post: dict, mocker, url: str
+):
+    await response_cache.clear()
+    fetch_one = mocker.spy(database, "fetch_one")
+    fetch_all = mocker.spy(database, "fetch_all")
+
+    response = await async_client.get(url.format(id=created_post["id"]))
+
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    fetch_one.assert_not_called()
+    assert fetch_all.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_get_comments_on_post_not_modified(
+    async_client: AsyncClient, created_comment: dict, mocker
+):
+    url = f"/post/{created_comment['post_id']}/comment"
+    etag = (await async_client.get(url)).headers["ETag"]
+    fetch_all = mocker.spy(database, "fetch_all")
+
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    fetch_all.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_create_posts_batch(
+    async_client: AsyncClient, confirmed_user: dict, logged_in_token: str
+):
+    response = await async_client.post(
+        "/post/batch",
+        json=[{"body": "First"}, {"body": "Second"}],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "status_code": 201,
+            "item": {"id": 1, "body": "First", "user_id": confirmed_user["id"]},
+            "detail": None,
+        },
+        {
+            "status_code": 201,
+            "item": {"id": 2, "body": "Second", "user_id": confirmed_user["id"]},
+            "detail": None,
+        },
+    ]
+    response = await async_client.get("/post", params={"sorting": "old"})
+    assert [post["body"] for post in response.json()] == ["First", "Second"]
+
+
+@pytest.mark.anyio
+async def test_create_posts_batch_too_large(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.post(
+        "/post/batch",
+        json=[{"body": "Post"}] * 101,
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_create_comments_batch(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    response = await async_client.post(
+        "/comment/batch",
+        json=[
+            {"body": "First", "post_id": created_post["id"]},
+            {"body": "Missing", "post_id": 99},
+            {"body": "Second", "post_id": created_post["id"]},
+        ],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    results = response.json()
+    assert [result["status_code"] for result in results] == [201, 404, 201]
+    assert results[1]["detail"] == "Post with id 99 not found"
+    response = await async_client.get(f"/post/{created_post['id']}/comment")
+    assert [comment["body"] for comment in response.json()] == ["First", "Second"]
+    assert [comment["id"] for comment in response.json()] == [
+        results[0]["item"]["id"],
+        results[2]["item"]["id"],
+    ]
+
+
+@pytest.mark.anyio
+async def test_like_posts_batch(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    other_post = await create_post("Other", async_client, logged_in_token)
+    await like_post(other_post["id"], async_client, logged_in_token)
+
+    response = await async_client.post(
+        "/like/batch",
+        json=[
+            {"post_id": created_post["id"]},
+            {"post_id": created_post["id"]},
+            {"post_id": other_post["id"]},
+            {"post_id": 99},
+        ],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert [result["status_code"] for result in response.json()] == [
+        201,
+        409,
+        409,
+        404,
+    ]
+    response = await async_client.get("/post", params={"sorting": "old"})
+    assert [post["likes"] for post in response.json()] == [1, 1]
@@ -0,0 +1,106 @@
+import pytest
+from httpx import AsyncClient
+
+from socialmediaapi.config import config
+from socialmediaapi.pagination import NEXT_CURSOR_HEADER, encode_cursor
+from socialmediaapi.tests.routers.test_post import create_comment, create_post
+
+
+@pytest.mark.anyio
+async def test_search_posts_ranked(async_client: AsyncClient, logged_in_token: str):
+    await create_post("Nothing relevant here", async_client, logged_in_token)
+    passing = await create_post(
+        "A long post about birds that mentions a cat once",
+        async_client,
+        logged_in_token,
+    )
+    focused = await create_post("Cat, cats and a cat", async_client, logged_in_token)
+
+    response = await async_client.get("/search", params={"q": "cat"})
+
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == [focused["id"], passing["id"]]
+    assert response.json()[0] == {**focused, "likes": 0}
+
+
+@pytest.mark.anyio
+async def test_search_posts_paginated(async_client: AsyncClient, logged_in_token: str):
+    for number in range(3):
+        await create_post(f"Search me {number}", async_client, logged_in_token)
+
+    first = await async_client.get("/search", params={"q": "search", "limit": 2})
+    second = await async_client.get(
+        "/search",
+        params={"q": "search", "limit": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]},
+    )
+
+    assert len(first.json()) == 2
+    assert len(second.json()) == 1
+    assert NEXT_CURSOR_HEADER not in second.headers
+    ids = [post["id"] for post in first.json() + second.json()]
+    assert len(set(ids)) == 3
+
+
+@pytest.mark.anyio
+async def test_search_pages_stop_at_max_results(
+    async_client: AsyncClient, logged_in_token: str, mocker
+):
+    mocker.patch.object(config, "SEARCH_MAX_RESULTS", 3)
+    for number in range(5):
+        await create_post(f"Search me {number}", async_client, logged_in_token)
+
+    first = await async_client.get("/search", params={"q": "search", "limit": 2})
+    second = await async_client.get(
+        "/search",
+        params={"q": "search", "limit": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]},
+    )
+    beyond = await async_client.get(
+        "/search",
+        params={"q": "search", "cursor": encode_cursor(k="search:posts", offset=3)},
+    )
+
+    assert len(second.json()) == 1
+    assert NEXT_CURSOR_HEADER not in second.headers
+    assert beyond.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_search_comments(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    comment = await create_comment(
+        "Lovely photo", post["id"], async_client, logged_in_token
+    )
+
+    response = await async_client.get(
+        "/search", params={"q": "photo", "kind": "comments"}
+    )
+
+    assert response.json() == [comment]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("q", ['"unbalanced', "body:cat OR", "NEAR(", "*", "!!!"])
+async def test_search_treats_query_as_plain_text(
+    async_client: AsyncClient, logged_in_token: str, q: str
+):
+    await create_post("cat body", async_client, logged_in_token)
+
+    response = await async_client.get("/search", params={"q": q})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        encode_cursor(k="search:posts"),
+        encode_cursor(k="search:posts", offset="20"),
+        encode_cursor(k="search:posts", offset=-20),
+        encode_cursor(k="search:comments", offset=20),
+    ],
+)
+async def test_search_invalid_cursor(async_client: AsyncClient, cursor: str):
+    response = await async_client.get("/search", params={"q": "cat", "cursor": cursor})
+
+    assert response.status_code == 400
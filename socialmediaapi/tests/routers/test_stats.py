@@ -0,0 +1,10 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_get_stats(async_client: AsyncClient, registered_user: dict):
+    response = await async_client.get("/stats")
+
+    assert response.status_code == 200
+    assert response.json()["password_hashing"]["completed"] >= 1
@@ -0,0 +1,200 @@
+import pytest
+from httpx import AsyncClient
+
+from socialmediaapi import security
+from socialmediaapi.config import config
+from socialmediaapi.database import database, timeline_table, users_table
+from socialmediaapi.pagination import NEXT_CURSOR_HEADER, encode_cursor
+from socialmediaapi.tests.routers.test_post import create_post
+from socialmediaapi.timeline import timeline_fanout
+
+
+async def create_author(email: str) -> dict:
+    user_id = await database.execute(
+        users_table.insert().values(email=email, password="", confirmed=True)
+    )
+    return {"id": user_id, "token": security.create_access_token(email)}
+
+
+async def follow(async_client: AsyncClient, followee_id: int, token: str):
+    return await async_client.post(
+        "/follow",
+        json={"followee_id": followee_id},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+async def get_timeline(async_client: AsyncClient, token: str, **params):
+    return await async_client.get(
+        "/timeline", params=params, headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+@pytest.fixture()
+async def author() -> dict:
+    return await create_author("author@example.com")
+
+
+@pytest.mark.anyio
+async def test_follow_user(
+    async_client: AsyncClient, confirmed_user: dict, logged_in_token: str, author
+):
+    response = await follow(async_client, author["id"], logged_in_token)
+
+    assert response.status_code == 201
+    assert {
+        "followee_id": author["id"],
+        "follower_id": confirmed_user["id"],
+    }.items() <= response.json().items()
+    query = users_table.select().where(users_table.c.id == author["id"])
+    assert (await database.fetch_one(query)).follower_count == 1
+
+
+@pytest.mark.anyio
+async def test_follow_user_twice(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    await follow(async_client, author["id"], logged_in_token)
+    response = await follow(async_client, author["id"], logged_in_token)
+
+    assert response.status_code == 409
+    query = users_table.select().where(users_table.c.id == author["id"])
+    assert (await database.fetch_one(query)).follower_count == 1
+
+
+@pytest.mark.anyio
+async def test_follow_missing_user(async_client: AsyncClient, logged_in_token: str):
+    response = await follow(async_client, 999, logged_in_token)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_follow_self(
+    async_client: AsyncClient, confirmed_user: dict, logged_in_token: str
+):
+    response = await follow(async_client, confirmed_user["id"], logged_in_token)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_timeline_requires_auth(async_client: AsyncClient):
+    response = await async_client.get("/timeline")
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_timeline_fans_out_new_posts(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    await follow(async_client, author["id"], logged_in_token)
+    post = await create_post("Fresh post", async_client, author["token"])
+    await create_post("Not followed", async_client, logged_in_token)
+    await timeline_fanout.fan_out_pending()
+
+    response = await get_timeline(async_client, logged_in_token)
+
+    assert response.status_code == 200
+    assert response.json() == [{**post, "likes": 0}]
+
+
+@pytest.mark.anyio
+async def test_follow_backfills_recent_posts(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    older = await create_post("Older post", async_client, author["token"])
+
+    await follow(async_client, author["id"], logged_in_token)
+    response = await get_timeline(async_client, logged_in_token)
+
+    assert [post["id"] for post in response.json()] == [older["id"]]
+
+
+@pytest.mark.anyio
+async def test_timeline_paginated(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    await follow(async_client, author["id"], logged_in_token)
+    posts = [
+        await create_post(f"Post {number}", async_client, author["token"])
+        for number in range(3)
+    ]
+    await timeline_fanout.fan_out_pending()
+
+    first = await get_timeline(async_client, logged_in_token, limit=2)
+    second = await get_timeline(
+        async_client, logged_in_token, limit=2, cursor=first.headers[NEXT_CURSOR_HEADER]
+    )
+
+    assert [post["id"] for post in first.json() + second.json()] == [
+        post["id"] for post in reversed(posts)
+    ]
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+
+@pytest.mark.anyio
+async def test_unfollow_removes_posts(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    await follow(async_client, author["id"], logged_in_token)
+    await create_post("Soon gone", async_client, author["token"])
+    await timeline_fanout.fan_out_pending()
+
+    response = await async_client.delete(
+        f"/follow/{author['id']}",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 204
+    assert (await get_timeline(async_client, logged_in_token)).json() == []
+    query = users_table.select().where(users_table.c.id == author["id"])
+    assert (await database.fetch_one(query)).follower_count == 0
+
+
+@pytest.mark.anyio
+async def test_unfollow_not_followed(
+    async_client: AsyncClient, logged_in_token: str, author
+):
+    response = await async_client.delete(
+        f"/follow/{author['id']}",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_high_follower_author_fans_out_on_read(
+    async_client: AsyncClient, logged_in_token: str, author, mocker
+):
+    mocker.patch.object(config, "TIMELINE_FANOUT_MAX_FOLLOWERS", 2)
+    fan = await create_author("fan@example.com")
+    await follow(async_client, author["id"], fan["token"])
+    before = await create_post("Fanned out", async_client, author["token"])
+    await timeline_fanout.fan_out_pending()
+
+    await follow(async_client, author["id"], logged_in_token)
+    after = await create_post("Pulled on read", async_client, author["token"])
+    await timeline_fanout.fan_out_pending()
+
+    query = users_table.select().where(users_table.c.id == author["id"])
+    assert (await database.fetch_one(query)).fanout_on_read
+    query = timeline_table.select().where(timeline_table.c.post_id == after["id"])
+    assert await database.fetch_all(query) == []
+    response = await get_timeline(async_client, fan["token"])
+    assert [post["id"] for post in response.json()] == [after["id"], before["id"]]
+    response = await get_timeline(async_client, logged_in_token)
+    assert [post["id"] for post in response.json()] == [after["id"], before["id"]]
+
+
+@pytest.mark.anyio
+async def test_timeline_malformed_cursor(
+    async_client: AsyncClient, logged_in_token: str
+):
+    cursor = encode_cursor(k="timeline", id="1")
+
+    response = await get_timeline(async_client, logged_in_token, cursor=cursor)
+
+    assert response.status_code == 400
@@ -0,0 +1,32 @@
+import hashlib
+
+import b2sdk.v2 as b2
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_upload_file(async_client: AsyncClient, fake_b2: b2.Bucket):
+    response = await async_client.post(
+        "/upload", files={"file": ("image.png", b"image data", "image/png")}
+    )
+
+    assert response.status_code == 201
+    file = fake_b2.get_file_info_by_name("image.png")
+    assert file.size == len(b"image data")
+    assert file.id_ in response.json()["file_url"]
+    assert response.json()["sha256"] == hashlib.sha256(b"image data").hexdigest()
+
+
+@pytest.mark.anyio
+async def test_upload_file_missing_file(async_client: AsyncClient, fake_b2: b2.Bucket):
+    response = await async_client.post("/upload", files={"other": ("a.txt", b"a")})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_upload_file_not_multipart(async_client: AsyncClient):
+    response = await async_client.post("/upload", content=b"raw bytes")
+
+    assert response.status_code == 422
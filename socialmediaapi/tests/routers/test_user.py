@@ -1,7 +1,10 @@
 import pytest
-from fastapi import BackgroundTasks
 from httpx import AsyncClient
 
+from socialmediaapi import tasks
+from socialmediaapi.database import database, email_outbox_table
+from socialmediaapi.executors import PoolSaturatedError
+
 
 async def register_user(async_client: AsyncClient, email: str, password: str):
     return await async_client.post(
@@ -16,6 +19,17 @@ async def test_register_user(async_client: AsyncClient):
     assert "User created" in response.json()["detail"]
 
 
+@pytest.mark.anyio
+async def test_register_user_queues_confirmation_email(async_client: AsyncClient):
+    await register_user(async_client, "test@example.com", "1234")
+
+    outbox = await database.fetch_all(email_outbox_table.select())
+    assert [(row.to_address, row.status) for row in outbox] == [
+        ("test@example.com", "pending")
+    ]
+    assert "/confirm/" in outbox[0].body
+
+
 @pytest.mark.anyio
 async def test_register_user_already_exists(
     async_client: AsyncClient, confirmed_user: dict
@@ -25,6 +39,16 @@ async def test_register_user_already_exists(
     assert "already exists" in response.json()["detail"]
 
 
+@pytest.mark.anyio
+async def test_register_user_hashing_pool_saturated(async_client: AsyncClient, mocker):
+    mocker.patch(
+        "socialmediaapi.security.password_hasher.run", side_effect=PoolSaturatedError
+    )
+    response = await register_user(async_client, "test@example.com", "1234")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
 @pytest.mark.anyio
 async def test_login_user_not_exists(async_client: AsyncClient):
     response = await async_client.post(
@@ -53,7 +77,7 @@ async def test_login_user(async_client: AsyncClient, confirmed_user: dict):
 
 @pytest.mark.anyio
 async def test_confirm_user(async_client: AsyncClient, mocker):
-    spy = mocker.spy(BackgroundTasks, "add_task")
+    spy = mocker.spy(tasks, "enqueue_user_registration_email")
     await register_user(async_client, "test@example.com", "123456")
     confirmation_url = str(spy.call_args[1]["confirmation_url"])
     response = await async_client.get(confirmation_url)
@@ -75,7 +99,7 @@ async def test_confirm_user_expired_token(async_client: AsyncClient, mocker):
         "socialmediaapi.security.confirmation_token_expire_minutes",
         return_value=-1,
     )
-    spy = mocker.spy(BackgroundTasks, "add_task")
+    spy = mocker.spy(tasks, "enqueue_user_registration_email")
     await register_user(async_client, "test@example.com", "123456")
     confirmation_url = str(spy.call_args[1]["confirmation_url"])
     response = await async_client.get(confirmation_url)
@@ -0,0 +1,63 @@
+from socialmediaapi.cache import TTLCache
+
+
+def test_get_set():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        **cache.stats(),
+        "size": 1,
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_expires_entries(mocker):
+    monotonic = mocker.patch("socialmediaapi.cache.time.monotonic", return_value=0)
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=10)
+
+    monotonic.return_value = 30
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    monotonic.return_value = 61
+    assert cache.get("a") is None
+
+
+def test_set_ignores_expired_ttl():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, ttl=-1)
+
+    assert len(cache) == 0
+
+
+def test_evicts_on_max_bytes():
+    cache = TTLCache(maxsize=10, ttl=60, max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"123")
+    cache.set("d", b"12345678901")
+
+    assert cache.get("a") is None
+    assert cache.get("d") is None
+    assert cache.bytes == 8
+    assert cache.stats()["bytes"] == 8
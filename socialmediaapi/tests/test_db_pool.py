@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from socialmediaapi.database import database
+from socialmediaapi.db_pool import PooledDatabase, PoolTimeoutError
+
+
+@pytest.mark.anyio
+async def test_sqlite_pragmas_applied():
+    assert await database.fetch_val("PRAGMA journal_mode") == "wal"
+    assert await database.fetch_val("PRAGMA synchronous") == 1
+
+
+@pytest.mark.anyio
+async def test_acquire_times_out_when_pool_exhausted():
+    pool = PooledDatabase("sqlite:///test.db", max_size=1, acquire_timeout=0.05)
+    await pool.connect()
+    try:
+        async with pool.connection():
+            stats = pool.pool_stats()
+            assert stats["in_use"] == 1
+
+            with pytest.raises(PoolTimeoutError):
+                await asyncio.create_task(pool.fetch_val("SELECT 1"))
+
+        assert await pool.fetch_val("SELECT 1") == 1
+    finally:
+        await pool.disconnect()
+
+    stats = pool.pool_stats()
+    assert stats["in_use"] == 0
+    assert stats["timeouts"] == 1
+    assert stats["acquired"] == 2
+    assert stats["acquire_wait_ms"]["+Inf"] == 2
+
+
+@pytest.mark.anyio
+async def test_failing_query_listener_does_not_fail_query(mocker):
+    def broken(query, name, seconds, failed):
+        raise RuntimeError("boom")
+
+    observed = []
+    mocker.patch(
+        "socialmediaapi.db_pool.query_listeners",
+        [broken, lambda *args: observed.append(args[1])],
+    )
+
+    assert await database.fetch_val("SELECT 1") == 1
+    assert observed == ["raw"]
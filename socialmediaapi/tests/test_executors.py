@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from socialmediaapi.executors import BoundedExecutor, PoolSaturatedError
+
+
+@pytest.fixture()
+def executor():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.anyio
+async def test_run(executor: BoundedExecutor):
+    assert await executor.run(sum, [1, 2, 3]) == 6
+
+    stats = executor.stats()
+    assert stats["submitted"] == 1
+    assert stats["completed"] == 1
+    assert stats["active"] == 0
+
+
+@pytest.mark.anyio
+async def test_run_rejects_when_saturated(executor: BoundedExecutor):
+    release = threading.Event()
+    running = asyncio.gather(executor.run(release.wait), executor.run(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(PoolSaturatedError):
+        await executor.run(sum, [1])
+    stats = executor.stats()
+    assert stats == {**stats, "active": 1, "queued": 1, "rejected": 1}
+
+    release.set()
+    await running
+    assert executor.stats()["completed"] == 2
+
+
+@pytest.mark.anyio
+async def test_cancelled_queued_job_releases_its_slot(executor: BoundedExecutor):
+    release = threading.Event()
+    running = asyncio.ensure_future(executor.run(release.wait))
+    queued = asyncio.ensure_future(executor.run(sum, [1]))
+    await asyncio.sleep(0)
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    release.set()
+    await running
+
+    stats = executor.stats()
+    assert stats == {**stats, "active": 0, "queued": 0, "submitted": 2, "completed": 2}
+    assert await executor.run(sum, [1, 2]) == 3
@@ -0,0 +1,82 @@
+import orjson
+import pytest
+
+from socialmediaapi.database import comments_table, database, likes_table, post_table
+from socialmediaapi.export import export_ndjson, wait_for_snapshot
+
+
+async def collect(**kwargs) -> list[dict]:
+    chunks = [chunk async for chunk in export_ndjson(**kwargs)]
+    return [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+async def create_post_with_comment_and_like(user_id: int) -> int:
+    post_id = await database.execute(
+        post_table.insert().values(body="Post", user_id=user_id, like_count=1)
+    )
+    await database.execute(
+        comments_table.insert().values(body="Comment", post_id=post_id, user_id=user_id)
+    )
+    await database.execute(
+        likes_table.insert().values(post_id=post_id, user_id=user_id)
+    )
+    return post_id
+
+
+@pytest.mark.anyio
+async def test_export_ndjson(registered_user: dict):
+    user_id = registered_user["id"]
+    first = await create_post_with_comment_and_like(user_id)
+    second = await create_post_with_comment_and_like(user_id)
+
+    records = await collect(batch_size=1)
+
+    assert [(r["type"], r.get("post_id", r["id"])) for r in records[:-1]] == [
+        ("post", first),
+        ("post", second),
+        ("comment", first),
+        ("comment", second),
+        ("like", first),
+        ("like", second),
+    ]
+    assert records[0] == {
+        "type": "post",
+        "id": first,
+        "body": "Post",
+        "user_id": user_id,
+        "likes": 1,
+    }
+    assert records[-1]["type"] == "watermark"
+
+
+@pytest.mark.anyio
+async def test_export_ndjson_incremental(registered_user: dict):
+    await create_post_with_comment_and_like(registered_user["id"])
+    watermark = (await collect())[-1]
+    new_post = await create_post_with_comment_and_like(registered_user["id"])
+
+    since = {name: watermark[name] for name in ("post", "comment", "like")}
+    records = await collect(since=since)
+
+    assert [(r["type"], r.get("post_id", r["id"])) for r in records[:-1]] == [
+        ("post", new_post),
+        ("comment", new_post),
+        ("like", new_post),
+    ]
+
+
+@pytest.mark.anyio
+async def test_wait_for_snapshot(mocker):
+    fetch_val = mocker.patch.object(database, "fetch_val", side_effect=[False, True])
+
+    await wait_for_snapshot("10:12:10,11", timeout=1)
+
+    assert fetch_val.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_wait_for_snapshot_times_out(mocker):
+    mocker.patch.object(database, "fetch_val", return_value=False)
+
+    with pytest.raises(TimeoutError):
+        await wait_for_snapshot("10:12:10,11", timeout=0.1)
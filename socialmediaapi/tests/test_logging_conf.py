@@ -0,0 +1,127 @@
+import logging
+import queue
+
+import pytest
+
+from socialmediaapi import logging_conf
+from socialmediaapi.logging_conf import BatchingQueueListener, LogQueueHandler
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: list[str] = []
+        self.batches = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+    def flush_batch(self) -> None:
+        self.batches += 1
+
+
+def queued_messages(handler: LogQueueHandler) -> list[str]:
+    messages = []
+    while not handler.queue.empty():
+        messages.append(handler.queue.get_nowait().getMessage())
+    return messages
+
+
+def test_drop_newest_when_full():
+    handler = LogQueueHandler(maxsize=2, policy="drop_newest")
+    for message in ("a", "b", "c"):
+        handler.handle(make_record(message))
+
+    assert handler.stats() == {
+        "policy": "drop_newest",
+        "depth": 2,
+        "maxsize": 2,
+        "enqueued": 2,
+        "dropped": 1,
+    }
+    assert queued_messages(handler) == ["a", "b"]
+
+
+def test_drop_oldest_when_full():
+    handler = LogQueueHandler(maxsize=2, policy="drop_oldest")
+    for message in ("a", "b", "c"):
+        handler.handle(make_record(message))
+
+    assert handler.dropped == 1
+    assert queued_messages(handler) == ["b", "c"]
+
+
+def test_block_drops_after_timeout():
+    handler = LogQueueHandler(maxsize=1, policy="block", block_timeout=0.01)
+    handler.handle(make_record("a"))
+    handler.handle(make_record("b"))
+
+    assert handler.dropped == 1
+
+
+def test_listener_writes_batches():
+    handler = LogQueueHandler(maxsize=100)
+    sink = RecordingHandler()
+    for message in ("a", "b", "c"):
+        handler.handle(make_record(message))
+
+    listener = BatchingQueueListener(handler.queue, sink, batch_size=10)
+    listener.start()
+    listener.stop()
+
+    assert sink.messages == ["a", "b", "c"]
+    assert sink.batches == 1
+
+
+def test_filters_run_before_queueing():
+    handler = LogQueueHandler(maxsize=10)
+    handler.addFilter(lambda record: setattr(record, "tag", "caller") or True)
+    handler.handle(make_record("a"))
+
+    assert handler.queue.get_nowait().tag == "caller"
+
+
+def test_drop_oldest_keeps_stop_sentinel():
+    handler = LogQueueHandler(maxsize=2, policy="drop_oldest")
+    handler.queue.put_nowait(BatchingQueueListener._sentinel)
+    handler.queue.put_nowait(make_record("a"))
+
+    handler.handle(make_record("b"))
+
+    assert handler.queue.get_nowait() is BatchingQueueListener._sentinel
+    assert handler.queue.get_nowait().getMessage() == "b"
+
+
+def test_listener_stops_with_full_queue():
+    handler = LogQueueHandler(maxsize=1)
+    handler.handle(make_record("a"))
+    listener = BatchingQueueListener(handler.queue, RecordingHandler())
+
+    listener.enqueue_sentinel()
+
+    assert handler.queue.get_nowait() is BatchingQueueListener._sentinel
+    with pytest.raises(queue.Empty):
+        handler.queue.get_nowait()
+
+
+def test_stop_logging_restores_sinks():
+    logger = logging.getLogger("socialmediaapi.tests.stop_logging")
+    sink = RecordingHandler()
+    sink_filter = logging.Filter()
+    sink.addFilter(sink_filter)
+    logger.addHandler(sink)
+    logging_conf.queue_logger_handlers(logger.name)
+    try:
+        assert logger.handlers == [logging_conf.log_queues[logger.name]]
+    finally:
+        logging_conf.stop_logging()
+
+    assert logger.handlers == [sink]
+    assert sink.filters == [sink_filter]
+    logger.warning("after shutdown")
+    assert sink.messages == ["after shutdown"]
+    logger.removeHandler(sink)
@@ -0,0 +1,165 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+from httpx import AsyncClient
+
+from socialmediaapi.config import config
+from socialmediaapi.database import database, email_outbox_table
+from socialmediaapi.mailer import MailDispatcher
+from socialmediaapi.metrics import background_task_duration
+from socialmediaapi.tasks import enqueue_email
+
+
+class StubMailgun(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubMailgunHandler)
+        self.messages: list[dict] = []
+        self.status = 200
+
+
+class StubMailgunHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.server.messages.append(parse_qs(self.rfile.read(length).decode()))
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"message": "Queued"}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def mailgun(mocker):
+    server = StubMailgun()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    mocker.patch.object(
+        config, "MAILGUN_API_URL", f"http://127.0.0.1:{server.server_port}"
+    )
+    mocker.patch.object(config, "MAILGUN_DOMAIN", "example.com")
+    mocker.patch.object(config, "MAILGUN_API_KEY", "test-key")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+async def dispatcher():
+    async with AsyncClient() as client:
+        yield MailDispatcher(
+            client=client, concurrency=2, batch_size=2, backoff_seconds=0
+        )
+
+
+async def fetch_outbox() -> list:
+    query = email_outbox_table.select().order_by(email_outbox_table.c.id)
+    return await database.fetch_all(query)
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_sends_email(mailgun, dispatcher):
+    await enqueue_email("test@example.com", "Subject", "Body")
+
+    assert await dispatcher.dispatch_pending() == 1
+
+    assert mailgun.messages[0]["to"] == ["test@example.com"]
+    assert mailgun.messages[0]["subject"] == ["Subject"]
+    (row,) = await fetch_outbox()
+    assert row.status == "sent"
+    assert row.sent_at is not None
+    assert await dispatcher.dispatch_pending() == 0
+
+
+@pytest.mark.anyio
+async def test_idle_dispatch_is_not_timed(dispatcher):
+    timings = background_task_duration.labels("mail_dispatch")
+    observed = sum(timings.counts)
+
+    assert await dispatcher.dispatch_pending() == 0
+
+    assert sum(timings.counts) == observed
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_batches_identical_emails(mailgun, dispatcher):
+    for to in ("a@example.com", "b@example.com", "c@example.com"):
+        await enqueue_email(to, "Newsletter", "Same body")
+    await enqueue_email("d@example.com", "Other", "Other body")
+
+    assert await dispatcher.dispatch_pending() == 4
+
+    recipients = sorted(message["to"] for message in mailgun.messages)
+    assert recipients == [
+        ["a@example.com", "b@example.com"],
+        ["c@example.com"],
+        ["d@example.com"],
+    ]
+    batch = next(message for message in mailgun.messages if len(message["to"]) == 2)
+    assert json.loads(batch["recipient-variables"][0]) == {
+        "a@example.com": {},
+        "b@example.com": {},
+    }
+    assert {row.status for row in await fetch_outbox()} == {"sent"}
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_retries_with_backoff(mailgun, dispatcher):
+    dispatcher.backoff_seconds = 60
+    mailgun.status = 500
+    await enqueue_email("test@example.com", "Subject", "Body")
+
+    assert await dispatcher.dispatch_pending() == 1
+
+    (row,) = await fetch_outbox()
+    assert row.status == "pending"
+    assert row.attempts == 1
+    assert "500" in row.last_error
+    assert await dispatcher.dispatch_pending() == 0
+    assert dispatcher.stats()["retried"] == 1
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_gives_up_after_max_attempts(mailgun, dispatcher):
+    dispatcher.max_attempts = 3
+    mailgun.status = 503
+    await enqueue_email("test@example.com", "Subject", "Body")
+
+    while await dispatcher.dispatch_pending():
+        pass
+
+    assert len(mailgun.messages) == 3
+    (row,) = await fetch_outbox()
+    assert row.status == "failed"
+    assert row.attempts == 3
+    assert dispatcher.stats()["failed"] == 1
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_fails_permanent_errors_at_once(mailgun, dispatcher):
+    mailgun.status = 400
+    await enqueue_email("test@example.com", "Subject", "Body")
+
+    assert await dispatcher.dispatch_pending() == 1
+
+    (row,) = await fetch_outbox()
+    assert row.status == "failed"
+    assert row.attempts == 1
+    assert dispatcher.stats()["failed"] == 1
+
+
+@pytest.mark.anyio
+async def test_dispatch_pending_retries_rate_limited(mailgun, dispatcher):
+    dispatcher.backoff_seconds = 60
+    mailgun.status = 429
+    await enqueue_email("test@example.com", "Subject", "Body")
+
+    await dispatcher.dispatch_pending()
+
+    (row,) = await fetch_outbox()
+    assert row.status == "pending"
+    assert dispatcher.stats()["retried"] == 1
@@ -0,0 +1,28 @@
+import pytest
+import sqlalchemy
+
+from socialmediaapi.database import database, likes_table, post_table
+from socialmediaapi.maintenance import reconcile_like_counts
+
+
+async def create_post_with_like(user_id: int, like_count: int) -> int:
+    post_id = await database.execute(
+        post_table.insert().values(body="Post", user_id=user_id, like_count=like_count)
+    )
+    await database.execute(
+        likes_table.insert().values(post_id=post_id, user_id=user_id)
+    )
+    return post_id
+
+
+@pytest.mark.anyio
+async def test_reconcile_like_counts(registered_user: dict):
+    in_sync = await create_post_with_like(registered_user["id"], 1)
+    drifted = await create_post_with_like(registered_user["id"], 5)
+
+    repaired = await reconcile_like_counts(batch_size=1)
+
+    assert repaired == 1
+    query = sqlalchemy.select(post_table.c.id, post_table.c.like_count)
+    counts = {row.id: row.like_count for row in await database.fetch_all(query)}
+    assert counts == {in_sync: 1, drifted: 1}
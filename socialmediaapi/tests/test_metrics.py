@@ -0,0 +1,51 @@
+import pytest
+
+from socialmediaapi.metrics import Metric, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ["route"], (0.1, 1))
+    histogram.labels("/post").observe(0.05)
+    histogram.labels("/post").observe(0.5)
+    histogram.labels("/post").observe(2)
+
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/post",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/post",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/post",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/post"} 3' in text
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests.", ["route"])
+    counter.labels('say "hi"\n').inc(2)
+
+    assert 'requests_total{route="say \\"hi\\"\\n"} 2.0' in registry.render()
+
+
+def test_gauge_is_collected_at_render_time():
+    registry = Registry()
+    depth = {"value": 1}
+    registry.gauge("queue_depth", "Depth.", [], lambda: {(): depth["value"]})
+    depth["value"] = 7
+
+    assert "queue_depth 7" in registry.render()
+
+
+def test_collected_counter_renders_counter_type():
+    registry = Registry()
+    registry.collected_counter("jobs_total", "Jobs.", ["outcome"], lambda: {("ok",): 3})
+
+    text = registry.render()
+
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{outcome="ok"} 3' in text
+
+
+def test_metric_requires_child_type():
+    with pytest.raises(TypeError):
+        Metric("abstract", "Abstract.")
@@ -0,0 +1,92 @@
+import pytest
+import sqlalchemy
+
+from socialmediaapi.migrations import MIGRATIONS, migrate
+
+LEGACY_SCHEMA = [
+    (
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR UNIQUE,"
+        " password VARCHAR, confirmed BOOLEAN)"
+    ),
+    (
+        "CREATE TABLE posts (id INTEGER PRIMARY KEY, body VARCHAR,"
+        " user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+    (
+        "CREATE TABLE comments (id INTEGER PRIMARY KEY, body VARCHAR,"
+        " post_id INTEGER NOT NULL REFERENCES posts (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+    (
+        "CREATE TABLE likes (id INTEGER PRIMARY KEY,"
+        " post_id INTEGER NOT NULL REFERENCES posts (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+    "INSERT INTO users (id, email) VALUES (1, 'test@example.com')",
+    "INSERT INTO posts (id, body, user_id) VALUES (1, 'Post', 1)",
+    "INSERT INTO likes (post_id, user_id) VALUES (1, 1), (1, 1)",
+]
+
+
+@pytest.fixture()
+def engine(tmp_path) -> sqlalchemy.Engine:
+    return sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_migrate_empty_database(engine: sqlalchemy.Engine):
+    assert migrate(engine) == sorted(m.version for m in MIGRATIONS)
+    assert migrate(engine) == []
+
+    inspector = sqlalchemy.inspect(engine)
+    assert {"users", "posts", "comments", "likes"} <= set(inspector.get_table_names())
+
+
+def test_migrate_legacy_database(engine: sqlalchemy.Engine):
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(sqlalchemy.text(statement))
+
+    migrate(engine)
+
+    with engine.begin() as conn:
+        assert conn.execute(sqlalchemy.text("SELECT count(*) FROM likes")).scalar() == 1
+        like_count = conn.execute(sqlalchemy.text("SELECT like_count FROM posts"))
+        assert like_count.scalar() == 1
+
+    inspector = sqlalchemy.inspect(engine)
+    likes_indexes = {i["name"]: i for i in inspector.get_indexes("likes")}
+    assert likes_indexes["uq_likes_post_id_user_id"]["unique"]
+    assert "ix_likes_user_id" in likes_indexes
+    assert "ix_comments_post_id_id" in {
+        i["name"] for i in inspector.get_indexes("comments")
+    }
+    assert {
+        "ix_posts_user_id_id",
+        "ix_posts_like_count_id",
+        "ix_posts_hot_score_id",
+        "ix_posts_top_24h_likes_id",
+    } <= {i["name"] for i in inspector.get_indexes("posts")}
+
+
+def test_rerun_of_secondary_indexes_removes_new_duplicate_likes(
+    engine: sqlalchemy.Engine,
+):
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(sqlalchemy.text(statement))
+    migrate(engine)
+    # A failed unique index build leaves migration 4 unrecorded, while old
+    # servers keep inserting duplicates.
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("DROP INDEX uq_likes_post_id_user_id"))
+        conn.execute(sqlalchemy.text("DELETE FROM schema_migrations WHERE version = 4"))
+        conn.execute(
+            sqlalchemy.text("INSERT INTO likes (post_id, user_id) VALUES (1, 1)")
+        )
+
+    assert migrate(engine) == [4]
+
+    with engine.begin() as conn:
+        assert conn.execute(sqlalchemy.text("SELECT count(*) FROM likes")).scalar() == 1
+    likes_indexes = {i["name"] for i in sqlalchemy.inspect(engine).get_indexes("likes")}
+    assert "uq_likes_post_id_user_id" in likes_indexes
@@ -0,0 +1,104 @@
+import logging
+
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+
+from socialmediaapi import profiler
+from socialmediaapi.database import database, post_table
+from socialmediaapi.profiler import (
+    QueryProfile,
+    QueryProfilerMiddleware,
+    current_profile,
+)
+from socialmediaapi.tests.routers.test_post import create_post
+
+
+def find_post_query(post_id: int):
+    return post_table.select().where(post_table.c.id == post_id)
+
+
+@pytest.mark.anyio
+async def test_profile_counts_queries_for_the_current_request():
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    try:
+        await database.fetch_one(find_post_query(1))
+        await database.fetch_all(sqlalchemy.select(post_table.c.id))
+    finally:
+        current_profile.reset(token)
+    await database.fetch_one(find_post_query(2))
+
+    assert profile.queries == 2
+    assert profile.server_timing().startswith("db;dur=")
+    assert profile.server_timing().endswith('desc="2 queries"')
+
+
+@pytest.mark.anyio
+async def test_profile_reports_repeated_statement(caplog):
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    try:
+        for post_id in range(3):
+            await database.fetch_one(find_post_query(post_id))
+    finally:
+        current_profile.reset(token)
+
+    with caplog.at_level(logging.WARNING, logger=profiler.logger.name):
+        profile.report("GET /post", max_queries=10, repeat_threshold=3)
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "same statement 3 times" in message
+    assert "WHERE posts.id = :id_1" in message
+
+
+def test_profile_reports_too_many_queries(caplog):
+    profile = QueryProfile()
+    for post_id in range(3):
+        profile.record(sqlalchemy.select(post_table.c.id).limit(post_id), 0.001)
+
+    with caplog.at_level(logging.WARNING, logger=profiler.logger.name):
+        profile.report("GET /post", max_queries=2, repeat_threshold=10)
+
+    assert "ran 3 queries" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_slow_query_is_logged_with_sql(caplog, mocker):
+    mocker.patch.object(profiler.config, "SLOW_QUERY_SECONDS", 0.000001)
+
+    with caplog.at_level(logging.WARNING, logger=profiler.logger.name):
+        await database.fetch_one(find_post_query(1))
+
+    assert "Slow query select posts" in caplog.text
+    assert "FROM posts WHERE posts.id = :id_1" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_server_timing_header(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+
+    response = await async_client.get(f"/post/{post['id']}/comment")
+
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+
+
+@pytest.mark.anyio
+async def test_queries_after_response_are_not_profiled(caplog):
+    async def app(scope, receive, send):
+        await database.fetch_one(find_post_query(1))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        await database.fetch_one(find_post_query(2))
+
+    async def send(message):
+        pass
+
+    middleware = QueryProfilerMiddleware(app, max_queries=1, repeat_threshold=2)
+    scope = {"type": "http", "method": "GET", "path": "/post", "headers": []}
+
+    with caplog.at_level(logging.WARNING, logger=profiler.logger.name):
+        await middleware(scope, None, send)
+
+    assert caplog.records == []
@@ -0,0 +1,104 @@
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+
+from socialmediaapi.database import database, post_table, users_table
+from socialmediaapi.db_pool import PooledDatabase
+from socialmediaapi.migrations import migrate
+from socialmediaapi.replicas import ReadRouter
+
+
+@pytest.fixture()
+def replica_url(tmp_path) -> str:
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = sqlalchemy.create_engine(url)
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            users_table.insert().values(
+                id=1, email="replica@example.com", password="x", confirmed=True
+            )
+        )
+        connection.execute(
+            post_table.insert().values(id=1, body="From replica", user_id=1)
+        )
+    engine.dispose()
+    return url
+
+
+@pytest.fixture()
+async def read_router(replica_url: str, mocker):
+    router = ReadRouter(database, [PooledDatabase(replica_url)], retry_after=30)
+    await router.connect()
+    mocker.patch("socialmediaapi.routers.post.read_database", router)
+    yield router
+    await router.disconnect()
+
+
+@pytest.mark.anyio
+async def test_reads_go_to_replica(read_router: ReadRouter):
+    posts = await read_router.fetch_all(post_table.select())
+
+    assert [post.body for post in posts] == ["From replica"]
+    assert read_router.stats()["replica_reads"] == 1
+
+
+@pytest.mark.anyio
+async def test_fails_over_to_primary(tmp_path):
+    replica = PooledDatabase(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReadRouter(database, [replica], retry_after=30)
+
+    assert await router.fetch_all(post_table.select()) == []
+    assert await router.fetch_all(post_table.select()) == []
+
+    assert router.stats() == {
+        "replicas": 1,
+        "healthy": 0,
+        "replica_reads": 0,
+        "primary_reads": 2,
+        "failovers": 1,
+    }
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_reads_replica(
+    async_client: AsyncClient, read_router: ReadRouter
+):
+    response = await async_client.get("/post")
+
+    assert [post["body"] for post in response.json()] == ["From replica"]
+
+
+@pytest.mark.anyio
+async def test_comment_on_post_missing_from_replica(
+    async_client: AsyncClient, logged_in_token: str, read_router: ReadRouter
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post("/post", json={"body": "On primary"}, headers=headers)
+    await async_client.post("/post", json={"body": "Lagging"}, headers=headers)
+
+    response = await async_client.post(
+        "/comment", json={"body": "Comment", "post_id": 2}, headers=headers
+    )
+
+    assert response.status_code == 201
+
+
+@pytest.mark.anyio
+async def test_get_post_missing_from_replica(
+    async_client: AsyncClient, logged_in_token: str, read_router: ReadRouter
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post("/post", json={"body": "On primary"}, headers=headers)
+    await async_client.post("/post", json={"body": "Lagging"}, headers=headers)
+    await async_client.post(
+        "/comment", json={"body": "Comment", "post_id": 2}, headers=headers
+    )
+
+    post = await async_client.get("/post/2")
+    comments = await async_client.get("/post/2/comment")
+
+    assert post.status_code == 200
+    assert post.json()["post"]["body"] == "Lagging"
+    assert [comment["body"] for comment in post.json()["comments"]] == ["Comment"]
+    assert [comment["body"] for comment in comments.json()] == ["Comment"]
@@ -0,0 +1,34 @@
+import pytest
+
+from socialmediaapi.response_cache import MemoryCacheBackend
+
+
+@pytest.mark.anyio
+async def test_generations_expire_without_reusing_numbers(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=0)
+    backend = MemoryCacheBackend(maxsize=10, max_bytes=1000, ttl=60)
+    await backend.bump("post:1")
+    await backend.bump("post:2")
+
+    assert await backend.generation("post:1") == 1
+    assert await backend.generation("post:2") == 2
+
+    monotonic.return_value = 61
+    assert await backend.generation("post:1") == 0
+
+    await backend.bump("post:1")
+    assert await backend.generation("post:1") == 3
+    assert list(backend.generations) == ["post:1"]
+
+
+@pytest.mark.anyio
+async def test_generations_are_not_evicted_for_space(mocker):
+    mocker.patch("time.monotonic", return_value=0)
+    backend = MemoryCacheBackend(maxsize=1, max_bytes=1000, ttl=60)
+    await backend.set("post:1:0", b"stale", 60)
+    await backend.bump("post:1")
+
+    for post_id in range(2, 10):
+        await backend.bump(f"post:{post_id}")
+
+    assert await backend.generation("post:1") == 1
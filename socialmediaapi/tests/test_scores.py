@@ -0,0 +1,155 @@
+import datetime
+
+import pytest
+import sqlalchemy
+
+from socialmediaapi.database import (
+    database,
+    job_state_table,
+    likes_table,
+    post_table,
+)
+from socialmediaapi.response_cache import response_cache
+from socialmediaapi.scores import (
+    HOT_GRAVITY_SECONDS,
+    SCORES_JOB,
+    ScoreScheduler,
+    hot_score,
+    new_post_scores,
+    utcnow,
+)
+
+
+async def create_scored_post(user_id: int, created_at: datetime.datetime) -> int:
+    return await database.execute(
+        post_table.insert().values(
+            body="Post", user_id=user_id, **new_post_scores(created_at)
+        )
+    )
+
+
+async def like(post_id: int, user_id: int, **values) -> None:
+    await database.execute(
+        likes_table.insert().values(post_id=post_id, user_id=user_id, **values)
+    )
+    await database.execute(
+        post_table.update()
+        .where(post_table.c.id == post_id)
+        .values(like_count=post_table.c.like_count + 1)
+    )
+
+
+async def scores() -> dict[int, tuple]:
+    query = sqlalchemy.select(
+        post_table.c.id, post_table.c.hot_score, post_table.c.top_24h_likes
+    )
+    return {
+        row.id: (row.hot_score, row.top_24h_likes)
+        for row in await database.fetch_all(query)
+    }
+
+
+def test_hot_score_trades_likes_for_age():
+    now = utcnow()
+    older = now - datetime.timedelta(seconds=HOT_GRAVITY_SECONDS)
+
+    assert hot_score(0, now) > hot_score(0, older)
+    assert hot_score(9, older) == pytest.approx(hot_score(0, now))
+    assert hot_score(10, older) > hot_score(0, now)
+
+
+def test_hot_score_of_naive_timestamp():
+    now = utcnow()
+
+    assert hot_score(3, now.replace(tzinfo=None)) == hot_score(3, now)
+
+
+@pytest.mark.anyio
+async def test_update_scores_only_touches_liked_posts(registered_user: dict):
+    user_id = registered_user["id"]
+    liked = await create_scored_post(user_id, utcnow())
+    untouched = await create_scored_post(user_id, utcnow())
+    await database.execute(
+        post_table.update().where(post_table.c.id == untouched).values(hot_score=-1)
+    )
+    await like(liked, user_id)
+    scheduler = ScoreScheduler(batch_size=1)
+
+    assert await scheduler.update_scores() == 1
+    assert await scheduler.update_scores() == 0
+
+    after = await scores()
+    assert after[liked][1] == 1
+    assert after[liked][0] > after[untouched][0]
+    assert after[untouched] == (-1, 0)
+    assert scheduler.stats()["runs"] == 2
+
+
+@pytest.mark.anyio
+async def test_update_scores_expires_top_24h(registered_user: dict):
+    user_id = registered_user["id"]
+    old = await create_scored_post(user_id, utcnow() - datetime.timedelta(days=2))
+    fresh = await create_scored_post(user_id, utcnow())
+
+    await ScoreScheduler().update_scores()
+
+    after = await scores()
+    assert after[old][1] is None
+    assert after[fresh][1] == 0
+
+
+@pytest.mark.anyio
+async def test_rescore_leaves_old_posts_out_of_top_24h(registered_user: dict):
+    user_id = registered_user["id"]
+    old = await create_scored_post(user_id, utcnow() - datetime.timedelta(days=2))
+    await like(old, user_id)
+
+    await ScoreScheduler().update_scores()
+
+    assert (await scores())[old][1] is None
+
+
+async def scores_version() -> int:
+    query = sqlalchemy.select(job_state_table.c.version).where(
+        job_state_table.c.name == SCORES_JOB
+    )
+    return await database.fetch_val(query)
+
+
+@pytest.mark.anyio
+async def test_update_scores_stops_at_settled_likes(registered_user: dict, mocker):
+    user_id = registered_user["id"]
+    early = await create_scored_post(user_id, utcnow())
+    late = await create_scored_post(user_id, utcnow())
+    await like(early, user_id, id=5)
+    await like(late, user_id, id=10)
+    scheduler = ScoreScheduler()
+    # Like 10 is visible, but a transaction holding a lower id may still be
+    # running, so only likes up to 5 are settled.
+    mocker.patch("socialmediaapi.scores.settled_max_id", return_value=5)
+
+    assert await scheduler.update_scores() == 1
+    assert (await scores())[late][1] == 0
+    assert scheduler.last_like_id == 5
+    mocker.stopall()
+
+    assert await scheduler.update_scores() == 1
+    assert (await scores())[late][1] == 1
+    assert scheduler.last_like_id == 10
+
+
+@pytest.mark.anyio
+async def test_update_scores_without_changes_keeps_version(
+    registered_user: dict, mocker
+):
+    user_id = registered_user["id"]
+    post_id = await create_scored_post(user_id, utcnow())
+    await like(post_id, user_id)
+    scheduler = ScoreScheduler()
+    await scheduler.update_scores()
+    version = await scores_version()
+    scores_updated = mocker.spy(response_cache, "scores_updated")
+
+    assert await scheduler.update_scores() == 0
+    assert await scores_version() == version
+    assert scores_updated.call_count == 0
@@ -0,0 +1,25 @@
+import sqlalchemy
+
+from socialmediaapi.migrations import migrate
+from socialmediaapi.search import fts5_match, rebuild_search_index, search_terms
+
+
+def test_search_terms_are_quoted_for_fts5():
+    assert fts5_match(search_terms('Cat" OR body:dog*')) == '"cat" "or" "body" "dog"'
+
+
+def test_rebuild_search_index(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("INSERT INTO users (id, email) VALUES (1, 'a')"))
+        conn.execute(
+            sqlalchemy.text("INSERT INTO posts (body, user_id) VALUES ('Hello', 1)")
+        )
+
+    rebuild_search_index(engine)
+
+    with engine.begin() as conn:
+        query = "SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'hello'"
+        assert conn.execute(sqlalchemy.text(query)).scalar() == 1
+    engine.dispose()
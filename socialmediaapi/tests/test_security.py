@@ -28,6 +28,18 @@ def test_create_confirmation_token():
     ).items()
 
 
+def test_get_subject_for_access_token_missing_exp():
+    token = jwt.encode(
+        {"sub": "test@example.com", "type": "access"},
+        key=security.SECRET_KEY,
+        algorithm=security.ALGORITHM,
+    )
+    with pytest.raises(security.HTTPException) as exc_info:
+        security.get_subject_for_access_token(token)
+    assert exc_info.value.status_code == 401
+    assert "Invalid token" == exc_info.value.detail
+
+
 @pytest.mark.parametrize(
     "create_token_func, token_type",
     [
@@ -107,6 +119,47 @@ async def test_get_user_not_found():
     assert user is None
 
 
+@pytest.mark.anyio
+async def test_get_current_user_is_cached(registered_user: dict, mocker):
+    token = security.create_access_token(registered_user["email"])
+    user = await security.get_current_user(token)
+
+    fetch_one = mocker.spy(security.database, "fetch_one")
+    hits = security.principal_cache.hits
+    assert await security.get_current_user(token) == user
+    fetch_one.assert_not_called()
+    assert security.principal_cache.hits == hits + 1
+
+
+@pytest.mark.anyio
+async def test_get_current_user_cache_honors_token_expiry(
+    registered_user: dict, mocker
+):
+    mocker.patch("socialmediaapi.security.access_token_expire_minutes", return_value=1)
+    token = security.create_access_token(registered_user["email"])
+    cache_set = mocker.spy(security.token_cache, "set")
+
+    await security.get_current_user(token)
+
+    assert 0 < cache_set.call_args.kwargs["ttl"] <= 60
+
+
+@pytest.mark.anyio
+async def test_invalidate_principal(registered_user: dict):
+    token = security.create_access_token(registered_user["email"])
+    assert not (await security.get_current_user(token)).confirmed
+
+    query = (
+        security.users_table.update()
+        .where(security.users_table.c.email == registered_user["email"])
+        .values(confirmed=True)
+    )
+    await security.database.execute(query)
+    security.invalidate_principal(registered_user["email"])
+
+    assert (await security.get_current_user(token)).confirmed
+
+
 @pytest.mark.anyio
 async def authenticate_user(registered_user: dict):
     user = await security.authenticate_user(
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+# Generous enough for a loaded CI machine, tight enough to catch an eager
+# import of a heavy dependency or blocking work moved back onto import.
+STARTUP_BUDGET_SECONDS = 5.0
+
+STARTUP_SCRIPT = textwrap.dedent("""
+    import json
+    import sys
+    import time
+
+    started_at = time.perf_counter()
+    from socialmediaapi.database import get_engine
+    from socialmediaapi.main import app
+    imported_at = time.perf_counter()
+    eager = {
+        "b2sdk": "b2sdk" in sys.modules,
+        "engine": get_engine.cache_info().currsize > 0,
+    }
+
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        status_code = client.get("/post").status_code
+    finished_at = time.perf_counter()
+
+    print(json.dumps({
+        "import_s": imported_at - started_at,
+        "first_request_s": finished_at - started_at,
+        "status_code": status_code,
+        "eager": eager,
+    }))
+    """)
+
+
+def test_startup_is_lazy_and_within_budget(tmp_path):
+    # Runs in a fresh interpreter so that modules imported by other tests do
+    # not hide an eager import.
+    env = {
+        **os.environ,
+        "ENV_STATE": "test",
+        "PYTHONPATH": str(Path(__file__).parents[2]),
+        "TEST_DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}",
+        "TEST_DB_FORCE_ROLL_BACK": "false",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=tmp_path,
+        check=True,
+    )
+    startup = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert startup["status_code"] == 200
+    assert startup["eager"] == {"b2sdk": False, "engine": False}
+    assert startup["first_request_s"] < STARTUP_BUDGET_SECONDS
@@ -0,0 +1,128 @@
+import pytest
+import sqlalchemy
+
+from socialmediaapi.config import config
+from socialmediaapi.database import (
+    database,
+    follows_table,
+    post_table,
+    timeline_table,
+    users_table,
+)
+from socialmediaapi.migrations import migrate
+from socialmediaapi.timeline import (
+    TimelineFanout,
+    fan_out_posts,
+    timeline_query,
+    trim_timelines,
+)
+
+
+def query_plan(engine: sqlalchemy.Engine, query) -> str:
+    sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        rows = conn.execute(sqlalchemy.text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row.detail for row in rows)
+
+
+@pytest.mark.parametrize("authors", [[], [5, 6]])
+def test_timeline_query_uses_index_range_scans(tmp_path, authors: list[int]):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'timeline.db'}")
+    migrate(engine)
+
+    plan = query_plan(engine, timeline_query(1, authors, before_id=100, limit=21))
+
+    assert "SEARCH timeline USING COVERING INDEX" in plan
+    assert plan.count("USING INDEX ix_posts_user_id_id") == len(authors)
+    assert "SCAN timeline" not in plan
+    assert "SCAN posts" not in plan
+    engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_fan_out_posts_in_batches(mocker):
+    mocker.patch.object(config, "TIMELINE_FANOUT_BATCH_SIZE", 2)
+    user_ids = [
+        await database.execute(users_table.insert().values(email=f"{n}@example.com"))
+        for n in range(4)
+    ]
+    author_id, followers = user_ids[0], user_ids[1:]
+    await database.execute_many(
+        follows_table.insert(),
+        [{"follower_id": f, "followee_id": author_id} for f in followers],
+    )
+    execute = mocker.spy(database, "execute")
+
+    written = await fan_out_posts(author_id, [10, 11])
+
+    assert written == 6
+    # One insert and one trim per batch of followers.
+    assert execute.call_count == 6
+    query = sqlalchemy.select(timeline_table.c.user_id, timeline_table.c.post_id)
+    rows = await database.fetch_all(query)
+    assert sorted((row.user_id, row.post_id) for row in rows) == [
+        (f, p) for f in followers for p in (10, 11)
+    ]
+
+
+async def create_follower_and_author() -> tuple[int, int]:
+    follower_id, author_id = [
+        await database.execute(users_table.insert().values(email=f"{n}@example.com"))
+        for n in range(2)
+    ]
+    await database.execute(
+        follows_table.insert().values(follower_id=follower_id, followee_id=author_id)
+    )
+    return follower_id, author_id
+
+
+async def timeline_post_ids(user_id: int) -> list[int]:
+    query = (
+        sqlalchemy.select(timeline_table.c.post_id)
+        .where(timeline_table.c.user_id == user_id)
+        .order_by(timeline_table.c.post_id)
+    )
+    return [row.post_id for row in await database.fetch_all(query)]
+
+
+@pytest.mark.anyio
+async def test_trim_timelines_keeps_newest_posts(mocker):
+    mocker.patch.object(config, "TIMELINE_MAX_POSTS", 2)
+    follower_id, author_id = await create_follower_and_author()
+    await database.execute(
+        timeline_table.insert().values(
+            [
+                {"user_id": follower_id, "post_id": post_id, "author_id": author_id}
+                for post_id in (1, 2, 3)
+            ]
+        )
+    )
+
+    await trim_timelines([follower_id])
+
+    assert await timeline_post_ids(follower_id) == [2, 3]
+
+
+@pytest.mark.anyio
+async def test_fan_out_pending_retries_after_failure(mocker):
+    follower_id, author_id = await create_follower_and_author()
+    post_ids = [
+        await database.execute(
+            post_table.insert().values(body=f"Post {n}", user_id=author_id)
+        )
+        for n in range(3)
+    ]
+    fanout = TimelineFanout(batch_size=2)
+    mocker.patch(
+        "socialmediaapi.timeline.fan_out_posts",
+        side_effect=[2, RuntimeError("worker died")],
+    )
+
+    with pytest.raises(RuntimeError):
+        await fanout.fan_out_pending()
+    mocker.stopall()
+
+    # The first batch was recorded before the failure; only the rest is redone.
+    assert await fanout.fan_out_pending() == 1
+    assert await timeline_post_ids(follower_id) == post_ids[2:]
+    assert await fanout.fan_out_pending() == 0
@@ -0,0 +1,89 @@
+import asyncio
+
+import b2sdk.v2 as b2
+import pytest
+
+from socialmediaapi import uploads
+from socialmediaapi.libs import b2 as b2_lib
+
+
+async def iter_chunks(data: bytes, chunk_size: int = 4):
+    for i in range(0, len(data), chunk_size):
+        await asyncio.sleep(0)
+        yield data[i : i + chunk_size]
+
+
+@pytest.mark.anyio
+async def test_upload_deduplicated(fake_b2: b2.Bucket, mocker):
+    upload_bytes = mocker.spy(b2_lib, "b2_upload_bytes")
+    stats = uploads.upload_stats.stats()
+
+    first = await uploads.upload_deduplicated(iter_chunks(b"image"), "a.png")
+    second = await uploads.upload_deduplicated(iter_chunks(b"image"), "b.png")
+
+    assert not first["deduplicated"]
+    assert second["deduplicated"]
+    assert first["file_url"] == second["file_url"]
+    assert upload_bytes.call_count == 1
+    assert uploads.upload_stats.deduplicated == stats["deduplicated"] + 1
+    assert uploads.upload_stats.bytes_saved == stats["bytes_saved"] + len(b"image")
+
+
+@pytest.mark.anyio
+async def test_upload_deduplicated_concurrent(fake_b2: b2.Bucket, mocker):
+    upload_bytes = mocker.spy(b2_lib, "b2_upload_bytes")
+
+    results = await asyncio.gather(
+        *(
+            uploads.upload_deduplicated(iter_chunks(b"same image"), f"{i}.png")
+            for i in range(3)
+        )
+    )
+
+    assert upload_bytes.call_count == 1
+    assert len({result["file_url"] for result in results}) == 1
+    assert sum(result["deduplicated"] for result in results) == 2
+
+
+@pytest.mark.anyio
+async def test_upload_deduplicated_large_file(fake_b2: b2.Bucket, mocker):
+    mocker.patch.object(b2_lib.config, "B2_UPLOAD_PART_SIZE", 4)
+    finish = mocker.spy(b2_lib, "b2_finish_large_file")
+    cancel = mocker.spy(b2_lib, "b2_cancel_large_file")
+    stats = uploads.upload_stats.stats()
+
+    first = await uploads.upload_deduplicated(iter_chunks(b"large image"), "a.png")
+    second = await uploads.upload_deduplicated(iter_chunks(b"large image"), "b.png")
+
+    assert first["file_url"] == second["file_url"]
+    assert finish.call_count == 1
+    assert cancel.call_count == 1
+    assert list(fake_b2.list_unfinished_large_files()) == []
+    assert second["deduplicated"]
+    assert uploads.upload_stats.deduplicated == stats["deduplicated"] + 1
+    assert uploads.upload_stats.bytes_saved == stats["bytes_saved"]
+
+
+@pytest.mark.anyio
+async def test_upload_different_files(fake_b2: b2.Bucket):
+    first = await uploads.upload_deduplicated(iter_chunks(b"one"), "a.png")
+    second = await uploads.upload_deduplicated(iter_chunks(b"two"), "b.png")
+
+    assert first["sha256"] != second["sha256"]
+    assert first["file_url"] != second["file_url"]
+
+
+@pytest.mark.anyio
+async def test_upload_loses_insert_race(fake_b2: b2.Bucket, mocker):
+    winner = await uploads.upload_deduplicated(iter_chunks(b"image"), "a.png")
+    find_upload = uploads.find_upload
+    # The other worker's row is not there yet when this upload checks.
+    mocker.patch.object(
+        uploads, "find_upload", side_effect=[None, await find_upload(winner["sha256"])]
+    )
+
+    loser = await uploads.upload_deduplicated(iter_chunks(b"image"), "b.png")
+
+    assert loser["file_url"] == winner["file_url"]
+    assert loser["deduplicated"]
+    assert [version.file_name for version, _ in fake_b2.ls()] == ["a.png"]
@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+
+from socialmediaapi.utils import call_stats, log
+
+logger = logging.getLogger("socialmediaapi.tests.test_utils")
+
+
+class ReprCounter:
+    calls = 0
+
+    def __repr__(self) -> str:
+        ReprCounter.calls += 1
+        return "ReprCounter()"
+
+
+@log(logger)
+def add(a, b):
+    return a + b
+
+
+@log(logger)
+def echo(value):
+    return value
+
+
+@log(logger)
+async def fail():
+    raise ValueError
+
+
+@log(logger, sample_rate=0)
+def never_sampled():
+    return "result"
+
+
+def stats_for(func) -> dict:
+    return call_stats[f"{func.__module__}.{func.__qualname__}"].stats()
+
+
+def test_sync_call_is_timed():
+    calls = stats_for(add)["calls"]
+
+    assert add(1, 2) == 3
+    stats = stats_for(add)
+    assert stats["calls"] == calls + 1
+    assert stats["latency_ms"]["+Inf"] == stats["calls"]
+
+
+@pytest.mark.anyio
+async def test_async_errors_are_counted():
+    errors = stats_for(fail)["errors"]
+
+    with pytest.raises(ValueError):
+        await fail()
+    assert stats_for(fail)["errors"] == errors + 1
+
+
+def test_args_not_formatted_when_disabled(mocker):
+    mocker.patch.object(logger, "isEnabledFor", return_value=False)
+    ReprCounter.calls = 0
+
+    echo(ReprCounter())
+
+    assert ReprCounter.calls == 0
+
+
+def test_args_logged_when_enabled(caplog):
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        add(1, b=2)
+
+    assert "Function add called with args 1, b=2 took" in caplog.text
+
+
+def test_unsampled_calls_are_not_recorded():
+    assert never_sampled() == "result"
+    assert stats_for(never_sampled)["calls"] == 0
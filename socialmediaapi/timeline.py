@@ -0,0 +1,296 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+import sqlalchemy
+
+from socialmediaapi.config import config
+from socialmediaapi.database import (
+    database,
+    follows_table,
+    insert_ignoring_conflicts,
+    job_state_table,
+    post_table,
+    read_database,
+    timeline_table,
+    users_table,
+)
+from socialmediaapi.export import settled_max_id
+from socialmediaapi.metrics import background_task_duration, timed
+
+logger = logging.getLogger(__name__)
+
+FANOUT_JOB = "timeline_fanout"
+
+FANOUT_POST_BATCH_SIZE = 100
+
+TIMELINE_COLUMNS = (
+    post_table.c.id,
+    post_table.c.body,
+    post_table.c.user_id,
+    post_table.c.like_count.label("likes"),
+)
+
+
+async def fans_out_on_read(author_id: int) -> bool:
+    query = (
+        sqlalchemy.select(users_table.c.fanout_on_read)
+        .where(users_table.c.id == author_id)
+        .execution_options(name="author_fanout")
+    )
+    logger.debug(query)
+    return bool(await database.fetch_val(query))
+
+
+async def trim_timelines(user_ids: list[int]) -> None:
+    # Keeps the newest TIMELINE_MAX_POSTS rows of each timeline. Older pages
+    # are not served from the table once trimmed.
+    newer = timeline_table.alias("newer")
+    cutoff = (
+        sqlalchemy.select(newer.c.post_id)
+        .where(newer.c.user_id == timeline_table.c.user_id)
+        .order_by(newer.c.post_id.desc())
+        .offset(config.TIMELINE_MAX_POSTS - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = (
+        timeline_table.delete()
+        .where(
+            timeline_table.c.user_id.in_(user_ids),
+            timeline_table.c.post_id < cutoff,
+        )
+        .execution_options(name="trim_timeline")
+    )
+    logger.debug(query)
+    await database.execute(query)
+
+
+async def fan_out_posts(author_id: int, post_ids: list[int]) -> int:
+    # Called by TimelineFanout for committed posts. Followers are
+    # walked in keyset batches sized so one INSERT writes at most
+    # TIMELINE_FANOUT_BATCH_SIZE rows. High-follower authors are skipped:
+    # readers merge their posts in at read time instead.
+    with timed(background_task_duration, "timeline_fanout"):
+        if await fans_out_on_read(author_id):
+            logger.debug(f"Skipping fan-out of posts by user {author_id}")
+            return 0
+
+        batch_size = max(1, config.TIMELINE_FANOUT_BATCH_SIZE // len(post_ids))
+        written, after_id = 0, 0
+        while True:
+            query = (
+                sqlalchemy.select(follows_table.c.follower_id)
+                .where(
+                    follows_table.c.followee_id == author_id,
+                    follows_table.c.follower_id > after_id,
+                )
+                .order_by(follows_table.c.follower_id)
+                .limit(batch_size)
+                .execution_options(name="fanout_followers")
+            )
+            logger.debug(query)
+            followers = [row.follower_id for row in await database.fetch_all(query)]
+            if not followers:
+                break
+            rows = [
+                {"user_id": follower_id, "post_id": post_id, "author_id": author_id}
+                for follower_id in followers
+                for post_id in post_ids
+            ]
+            await database.execute(
+                insert_ignoring_conflicts(timeline_table, "user_id", "post_id")
+                .values(rows)
+                .execution_options(name="fanout_timeline")
+            )
+            await trim_timelines(followers)
+            written += len(rows)
+            after_id = followers[-1]
+        logger.debug(f"Fanned out {len(post_ids)} posts into {written} timeline rows")
+        return written
+
+
+async def backfill_timeline(user_id: int, author_id: int) -> None:
+    # A new follow only gets future posts from fan-out, so the author's most
+    # recent posts are copied in straight away.
+    recent = (
+        sqlalchemy.select(
+            sqlalchemy.literal(user_id), post_table.c.id, post_table.c.user_id
+        )
+        .where(post_table.c.user_id == author_id)
+        .order_by(post_table.c.id.desc())
+        .limit(config.TIMELINE_BACKFILL_POSTS)
+    )
+    query = (
+        insert_ignoring_conflicts(timeline_table, "user_id", "post_id")
+        .from_select(["user_id", "post_id", "author_id"], recent)
+        .execution_options(name="backfill_timeline")
+    )
+    logger.debug(query)
+    await database.execute(query)
+    await trim_timelines([user_id])
+
+
+async def pulled_authors(user_id: int) -> list[int]:
+    query = (
+        sqlalchemy.select(follows_table.c.followee_id)
+        .where(follows_table.c.follower_id == user_id, follows_table.c.fanout_on_read)
+        .execution_options(name="pulled_authors")
+    )
+    logger.debug(query)
+    return [row.followee_id for row in await read_database.fetch_all(query)]
+
+
+def timeline_query(
+    user_id: int, authors: list[int], before_id: int | None, limit: int
+) -> sqlalchemy.Select:
+    # The precomputed part is one range scan of the (user_id, post_id)
+    # primary key however many accounts the reader follows. Each
+    # high-follower followee adds a bounded scan of ix_posts_user_id_id.
+    fanned = (
+        sqlalchemy.select(*TIMELINE_COLUMNS)
+        .select_from(
+            timeline_table.join(post_table, post_table.c.id == timeline_table.c.post_id)
+        )
+        .where(timeline_table.c.user_id == user_id)
+        .order_by(timeline_table.c.post_id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        fanned = fanned.where(timeline_table.c.post_id < before_id)
+    if not authors:
+        return fanned.execution_options(name="timeline")
+
+    parts = [fanned]
+    for author_id in authors:
+        pulled = (
+            sqlalchemy.select(*TIMELINE_COLUMNS)
+            .where(post_table.c.user_id == author_id)
+            .order_by(post_table.c.id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            pulled = pulled.where(post_table.c.id < before_id)
+        parts.append(pulled)
+    merged = sqlalchemy.union(
+        *(sqlalchemy.select(part.subquery()) for part in parts)
+    ).subquery()
+    return (
+        sqlalchemy.select(merged)
+        .order_by(merged.c.id.desc())
+        .limit(limit)
+        .execution_options(name="timeline")
+    )
+
+
+async def read_timeline(user_id: int, before_id: int | None, limit: int) -> list:
+    query = timeline_query(user_id, await pulled_authors(user_id), before_id, limit)
+    logger.debug(query)
+    return await read_database.fetch_all(query)
+
+
+async def switch_to_fanout_on_read(author_id: int) -> None:
+    # Called in the follow transaction that takes the author over
+    # TIMELINE_FANOUT_MAX_FOLLOWERS. Posts fanned out so far stay in the
+    # timelines; the read-time merge deduplicates them.
+    logger.info(f"User {author_id} switched to fan-out on read")
+    await database.execute(
+        users_table.update()
+        .where(users_table.c.id == author_id)
+        .values(fanout_on_read=True)
+    )
+    await database.execute(
+        follows_table.update()
+        .where(follows_table.c.followee_id == author_id)
+        .values(fanout_on_read=True)
+    )
+
+
+class TimelineFanout:
+    # Posts are fanned out in id order behind a watermark stored in
+    # job_state, so posts written while no worker was running, or whose
+    # fan-out failed, are picked up by the next pass. Timeline rows are
+    # inserted ignoring conflicts, which makes repeating a batch after a crash
+    # harmless. The watermark only moves up to settled_max_id, so a post that
+    # commits after one with a higher id is not skipped.
+    def __init__(self, batch_size: int = FANOUT_POST_BATCH_SIZE) -> None:
+        self.batch_size = batch_size
+        self.runs = 0
+        self.posts = 0
+        self.rows = 0
+        self.last_post_id = 0
+
+    async def watermark(self) -> int:
+        await database.execute(
+            insert_ignoring_conflicts(job_state_table, "name").values(name=FANOUT_JOB)
+        )
+        query = sqlalchemy.select(job_state_table.c.last_id).where(
+            job_state_table.c.name == FANOUT_JOB
+        )
+        return await database.fetch_val(query)
+
+    async def save_progress(self, last_id: int) -> None:
+        await database.execute(
+            job_state_table.update()
+            .where(job_state_table.c.name == FANOUT_JOB)
+            .values(last_id=last_id)
+        )
+
+    async def fan_out_pending(self) -> int:
+        after_id = await self.watermark()
+        until_id = await settled_max_id(
+            post_table, config.WATERMARK_SETTLE_TIMEOUT_SECONDS
+        )
+        fanned_out = 0
+        while after_id < until_id:
+            query = (
+                sqlalchemy.select(post_table.c.id, post_table.c.user_id)
+                .where(post_table.c.id > after_id, post_table.c.id <= until_id)
+                .order_by(post_table.c.id)
+                .limit(self.batch_size)
+                .execution_options(name="posts_to_fan_out")
+            )
+            logger.debug(query)
+            posts = await database.fetch_all(query)
+            if not posts:
+                break
+            by_author: dict[int, list[int]] = defaultdict(list)
+            for post in posts:
+                by_author[post.user_id].append(post.id)
+            for author_id, post_ids in by_author.items():
+                self.rows += await fan_out_posts(author_id, post_ids)
+            after_id = posts[-1].id
+            await self.save_progress(after_id)
+            fanned_out += len(posts)
+
+        self.runs += 1
+        self.posts += fanned_out
+        self.last_post_id = max(self.last_post_id, after_id)
+        return fanned_out
+
+    async def run(self, stop: asyncio.Event, interval: float | None = None) -> None:
+        interval = interval or config.TIMELINE_FANOUT_INTERVAL_SECONDS
+        logger.info("Timeline fan-out started")
+        while not stop.is_set():
+            try:
+                if await self.fan_out_pending():
+                    continue
+            except Exception:
+                logger.exception("Timeline fan-out iteration failed")
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except TimeoutError:
+                pass
+        logger.info("Timeline fan-out stopped")
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "posts": self.posts,
+            "rows": self.rows,
+            "last_post_id": self.last_post_id,
+        }
+
+
+timeline_fanout = TimelineFanout()
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from socialmediaapi.database import database, insert_ignoring_conflicts, uploads_table
+from socialmediaapi.libs.b2 import b2_delete_file, b2_executor, b2_stream_upload
+from socialmediaapi.metrics import b2_upload_bytes, b2_upload_duration
+
+logger = logging.getLogger(__name__)
+
+in_flight_uploads: dict[str, asyncio.Future] = {}
+
+
+class UploadStats:
+    def __init__(self) -> None:
+        self.uploads = 0
+        self.deduplicated = 0
+        self.bytes_received = 0
+        self.bytes_saved = 0
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "bytes_received": self.bytes_received,
+            "bytes_saved": self.bytes_saved,
+            "dedup_ratio": (
+                round(self.deduplicated / self.uploads, 4) if self.uploads else 0.0
+            ),
+        }
+
+
+upload_stats = UploadStats()
+
+
+def record_upload_metrics(outcome: str, size: int, started_at: float) -> None:
+    b2_upload_bytes.labels(outcome).inc(size)
+    b2_upload_duration.labels(outcome).observe(time.perf_counter() - started_at)
+
+
+async def find_upload(digest: str):
+    query = uploads_table.select().where(uploads_table.c.digest == digest)
+    logger.debug(query)
+    return await database.fetch_one(query)
+
+
+async def discard_file(file_id: str, file_name: str) -> None:
+    logger.info(f"Deleting {file_name}, stored concurrently by another worker")
+    try:
+        await b2_executor.run(b2_delete_file, file_id, file_name)
+    except Exception:
+        logger.exception(f"Could not delete B2 file {file_id}")
+
+
+async def upload_deduplicated(chunks: AsyncIterator[bytes], file_name: str) -> dict:
+    sha256 = hashlib.sha256()
+    size = 0
+    deduplicated = False
+    transferred = False
+
+    async def hashed_chunks() -> AsyncIterator[bytes]:
+        nonlocal size
+        async for chunk in chunks:
+            sha256.update(chunk)
+            size += len(chunk)
+            yield chunk
+
+    async def deduplicate(
+        commit: Callable[[], Awaitable[str]], parts_transferred: bool
+    ) -> str:
+        nonlocal deduplicated, transferred
+        transferred = parts_transferred
+        digest = sha256.hexdigest()
+        while (pending := in_flight_uploads.get(digest)) is not None:
+            logger.debug(f"Waiting for in-flight upload of {digest}")
+            if file_id := await asyncio.shield(pending):
+                deduplicated = True
+                return file_id
+
+        pending = asyncio.get_running_loop().create_future()
+        in_flight_uploads[digest] = pending
+        file_id = None
+        try:
+            if (upload := await find_upload(digest)) is not None:
+                deduplicated = True
+                file_id = upload.file_id
+                return file_id
+
+            file_id = await commit()
+            query = insert_ignoring_conflicts(uploads_table, "digest").values(
+                digest=digest, file_id=file_id, file_name=file_name, size=size
+            )
+            logger.debug(query)
+            await database.execute(query)
+            # Another worker may have stored the same content meanwhile. Its
+            # row won the insert, so its file is kept and this one deleted.
+            winner = await find_upload(digest)
+            if winner.file_id != file_id:
+                await discard_file(file_id, file_name)
+                deduplicated = transferred = True
+                file_id = winner.file_id
+            return file_id
+        finally:
+            pending.set_result(file_id)
+            del in_flight_uploads[digest]
+
+    started_at = time.perf_counter()
+    try:
+        file_url = await b2_stream_upload(
+            hashed_chunks(), file_name, deduplicate=deduplicate
+        )
+    except BaseException:
+        record_upload_metrics("failed", size, started_at)
+        raise
+    # A multipart upload is only deduplicated after its parts went out, so
+    # it saves storage but no transfer and is not counted as bytes saved.
+    skipped = deduplicated and not transferred
+    if skipped:
+        outcome = "deduplicated"
+    elif deduplicated:
+        outcome = "discarded"
+    else:
+        outcome = "stored"
+    record_upload_metrics(outcome, size, started_at)
+
+    upload_stats.uploads += 1
+    upload_stats.bytes_received += size
+    if deduplicated:
+        logger.info(f"Upload of {file_name} deduplicated")
+        upload_stats.deduplicated += 1
+    if skipped:
+        upload_stats.bytes_saved += size
+
+    return {
+        "file_url": file_url,
+        "sha256": sha256.hexdigest(),
+        "deduplicated": deduplicated,
+    }